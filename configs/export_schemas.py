@@ -37,6 +37,8 @@ import pathlib
 import msgspec
 import vllm
 
+from cosmos_reason1_utils.backend import FakeBackendConfig
+from cosmos_reason1_utils.degradation import DegradationConfig
 from cosmos_reason1_utils.vision import VisionConfig
 
 SCRIPT = pathlib.Path(__file__).resolve()
@@ -59,6 +61,16 @@ def main():
     vision_schema = VisionConfig.model_json_schema()
     (output_dir / "vision_config.json").write_text(json.dumps(vision_schema, indent=2))
 
+    degradation_schema = DegradationConfig.model_json_schema()
+    (output_dir / "degradation_ladder.json").write_text(
+        json.dumps(degradation_schema, indent=2)
+    )
+
+    fake_backend_schema = FakeBackendConfig.model_json_schema()
+    (output_dir / "fake_backend.json").write_text(
+        json.dumps(fake_backend_schema, indent=2)
+    )
+
     sampling_params = msgspec.json.schema(vllm.SamplingParams)
     (output_dir / "sampling_params.json").write_bytes(
         msgspec.json.format(msgspec.json.encode(sampling_params), indent=2)
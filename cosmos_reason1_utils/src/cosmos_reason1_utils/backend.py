@@ -0,0 +1,284 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import abc
+import asyncio
+import itertools
+import math
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Mapping
+
+import pydantic
+from pydantic import Field
+
+from cosmos_reason1_utils.status import SAFETY_STATUSES, parse_safety_status
+
+"""Inference backends."""
+
+DEFAULT_FAKE_RESPONSE = "Safety Status: Safe\nIdentified Hazard: None - Normal operation."
+
+# Output token of the fake backend: a word and the whitespace before it
+_TOKEN_PATTERN = re.compile(r"\s*\S+")
+
+
+class InferenceBackend(abc.ABC):
+    """Model backend of the inference services.
+
+    `generate` follows `vllm.LLM.generate` and `stream` follows
+    `vllm.AsyncLLMEngine.generate`. Outputs are `vllm.RequestOutput` objects,
+    or objects with the same attributes.
+    """
+
+    @abc.abstractmethod
+    def generate(self, prompts: list[Any], sampling_params: Any) -> list[Any]:
+        """Run a batch of requests to completion.
+
+        Args:
+            prompts: Prompts (dicts with "prompt" or "prompt_token_ids", and "multi_modal_data").
+            sampling_params: Sampling params of all prompts, or a list with those of each prompt.
+
+        Returns:
+            One output per prompt, in order.
+        """
+
+    @abc.abstractmethod
+    def stream(self, prompt: Any, sampling_params: Any, request_id: str) -> AsyncIterator[Any]:
+        """Submit a request, yielding its outputs as they are produced (see `output_kind`)."""
+
+
+class VllmBackend(InferenceBackend):
+    """Backend on a vLLM engine.
+
+    Args:
+        engine: `vllm.LLM` (for `generate`) or `vllm.AsyncLLMEngine` (for `stream`).
+    """
+
+    def __init__(self, engine: Any):
+        self.engine = engine
+
+    @classmethod
+    def load(cls, engine_kwargs: dict, async_engine: bool = False) -> "VllmBackend":
+        """Load a vLLM engine.
+
+        Args:
+            engine_kwargs: Engine arguments (see `vllm.EngineArgs`).
+            async_engine: Load a `vllm.AsyncLLMEngine` instead of a `vllm.LLM`.
+        """
+        import vllm
+
+        if async_engine:
+            return cls(vllm.AsyncLLMEngine.from_engine_args(vllm.AsyncEngineArgs(**engine_kwargs)))
+        return cls(vllm.LLM(**engine_kwargs))
+
+    def generate(self, prompts: list[Any], sampling_params: Any) -> list[Any]:
+        return self.engine.generate(prompts, sampling_params=sampling_params)
+
+    def stream(self, prompt: Any, sampling_params: Any, request_id: str) -> AsyncIterator[Any]:
+        return self.engine.generate(prompt, sampling_params, request_id)
+
+
+class FakeBackendConfig(pydantic.BaseModel):
+    """Config for the fake backend."""
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    responses: list[str] = Field(
+        default_factory=lambda: [DEFAULT_FAKE_RESPONSE],
+        min_length=1,
+        description="Outputs returned in turn, one per request",
+    )
+    prefill_time_per_token: float = Field(
+        default=0.0, ge=0, description="Prefill cost per prompt token, text or visual (seconds)"
+    )
+    decode_time_per_step: float = Field(
+        default=0.0, ge=0, description="Cost of a decode step (seconds)"
+    )
+    video_token_pixels: int = Field(
+        default=32 * 32 * 2,
+        gt=0,
+        description="Video pixels (frames x height x width) per visual token",
+    )
+    chars_per_token: float = Field(
+        default=4.0, gt=0, description="Characters per token of text prompts"
+    )
+
+
+class FakeCompletionOutput:
+    """Generated sequence of a `FakeRequestOutput` (as `vllm.CompletionOutput`)."""
+
+    def __init__(self, text: str, num_tokens: int, logprobs: list[dict[int, float]] | None, finished: bool):
+        self.index = 0
+        self.text = text
+        self.token_ids = list(range(num_tokens))
+        self.logprobs = logprobs
+        self.finish_reason = "stop" if finished else None
+
+
+class FakeRequestOutput:
+    """Output of a fake request (as `vllm.RequestOutput`)."""
+
+    def __init__(self, request_id: str, num_prompt_tokens: int, output: FakeCompletionOutput, finished: bool):
+        self.request_id = request_id
+        self.prompt_token_ids = [0] * num_prompt_tokens
+        self.num_cached_tokens = 0
+        self.outputs = [output]
+        self.finished = finished
+
+
+class FakeBackend(InferenceBackend):
+    """Deterministic CPU backend: scripted outputs after a modelled latency.
+
+    Requests get the configured responses in turn. Output tokens are words,
+    and outputs are cut at the request's `max_tokens`. Prompt tokens are the
+    text tokens plus the visual tokens of the video tensors.
+
+    A batch takes `prefill_time_per_token` per prompt token, plus
+    `decode_time_per_step` per token of its longest output: its sequences
+    are decoded together, one step per token. A streamed request is timed
+    alone.
+
+    With `status_ids`, requests asking for logprobs get next-token logprobs
+    favouring the status of their response. Classification then follows the
+    scripted responses.
+
+    Thread-safe.
+
+    Args:
+        config: Fake backend config.
+        status_ids: Status token ids (see `cosmos_reason1_utils.status.status_token_ids`).
+        sleep: Sleep function of `generate` (seconds).
+    """
+
+    def __init__(
+        self,
+        config: FakeBackendConfig | None = None,
+        status_ids: Mapping[str, int] | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.config = config or FakeBackendConfig()
+        self.status_ids = dict(status_ids) if status_ids else None
+        self._sleep = sleep
+        self._responses = itertools.cycle(self.config.responses)
+        self._lock = threading.Lock()
+        self._request_count = 0
+        self.busy_time = 0.0
+
+    def _next_response(self) -> tuple[str, str]:
+        with self._lock:
+            self._request_count += 1
+            return f"fake-{self._request_count}", next(self._responses)
+
+    def prompt_tokens(self, prompt: Any) -> int:
+        """Return the modelled prompt length of a request (text and visual tokens)."""
+        if isinstance(prompt, str):
+            prompt = {"prompt": prompt}
+        if prompt.get("prompt_token_ids") is not None:
+            tokens = len(prompt["prompt_token_ids"])
+        else:
+            tokens = math.ceil(len(prompt.get("prompt", "")) / self.config.chars_per_token)
+        for video in (prompt.get("multi_modal_data") or {}).get("video") or []:
+            # A (T, C, H, W) tensor, or (tensor, metadata) with return_video_metadata
+            frames = video[0] if isinstance(video, tuple) else video
+            shape = getattr(frames, "shape", None)
+            if shape is not None and len(shape) == 4:
+                tokens += math.ceil(shape[0] * shape[2] * shape[3] / self.config.video_token_pixels)
+        return tokens
+
+    def _output_tokens(self, text: str, sampling_params: Any) -> list[str]:
+        tokens = _TOKEN_PATTERN.findall(text)
+        max_tokens = getattr(sampling_params, "max_tokens", None)
+        return tokens[:max_tokens] if max_tokens is not None else tokens
+
+    def _logprobs(self, text: str, num_tokens: int, sampling_params: Any) -> list[dict[int, float]] | None:
+        if not self.status_ids or not getattr(sampling_params, "logprobs", None):
+            return None
+        status = parse_safety_status(text)
+        if status not in SAFETY_STATUSES:
+            return None
+        logprobs = {token_id: 0.0 if name == status else -20.0 for name, token_id in self.status_ids.items()}
+        return [logprobs] * num_tokens
+
+    def generate(self, prompts: list[Any], sampling_params: Any) -> list[FakeRequestOutput]:
+        if not isinstance(sampling_params, list):
+            sampling_params = [sampling_params] * len(prompts)
+        outputs = []
+        prompt_tokens = 0
+        decode_steps = 0
+        for prompt, params in zip(prompts, sampling_params):
+            request_id, text = self._next_response()
+            tokens = self._output_tokens(text, params)
+            num_prompt_tokens = self.prompt_tokens(prompt)
+            prompt_tokens += num_prompt_tokens
+            decode_steps = max(decode_steps, len(tokens))
+            output = FakeCompletionOutput("".join(tokens), len(tokens), self._logprobs(text, len(tokens), params), True)
+            outputs.append(FakeRequestOutput(request_id, num_prompt_tokens, output, True))
+        elapsed = prompt_tokens * self.config.prefill_time_per_token + decode_steps * self.config.decode_time_per_step
+        with self._lock:
+            self.busy_time += elapsed
+        self._sleep(elapsed)
+        return outputs
+
+    async def stream(self, prompt: Any, sampling_params: Any, request_id: str) -> AsyncIterator[FakeRequestOutput]:
+        _, text = self._next_response()
+        tokens = self._output_tokens(text, sampling_params)
+        num_prompt_tokens = self.prompt_tokens(prompt)
+        logprobs = self._logprobs(text, len(tokens), sampling_params)
+        # vLLM's RequestOutputKind: CUMULATIVE (default), DELTA or FINAL_ONLY
+        output_kind = getattr(getattr(sampling_params, "output_kind", None), "name", "CUMULATIVE")
+        with self._lock:
+            self.busy_time += (
+                num_prompt_tokens * self.config.prefill_time_per_token
+                + len(tokens) * self.config.decode_time_per_step
+            )
+
+        await asyncio.sleep(num_prompt_tokens * self.config.prefill_time_per_token)
+        if output_kind == "FINAL_ONLY" or not tokens:
+            await asyncio.sleep(len(tokens) * self.config.decode_time_per_step)
+            output = FakeCompletionOutput("".join(tokens), len(tokens), logprobs, True)
+            yield FakeRequestOutput(request_id, num_prompt_tokens, output, True)
+            return
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(self.config.decode_time_per_step)
+            finished = i == len(tokens) - 1
+            if output_kind == "DELTA":
+                output = FakeCompletionOutput(token, 1, logprobs and logprobs[i:i + 1], finished)
+            else:
+                output = FakeCompletionOutput("".join(tokens[:i + 1]), i + 1, logprobs and logprobs[:i + 1], finished)
+            yield FakeRequestOutput(request_id, num_prompt_tokens, output, finished)
+
+
+def load_backend(
+    name: str,
+    engine_kwargs: dict,
+    fake_config: dict | None = None,
+    status_ids: Mapping[str, int] | None = None,
+    async_engine: bool = False,
+) -> InferenceBackend:
+    """Load an inference backend.
+
+    Args:
+        name: "vllm" or "fake".
+        engine_kwargs: vLLM engine arguments (see `vllm.EngineArgs`).
+        fake_config: Fake backend config (see `FakeBackendConfig`).
+        status_ids: Status token ids for the fake backend (see `FakeBackend`).
+        async_engine: Load the vLLM async engine (for `stream`).
+    """
+    if name == "vllm":
+        return VllmBackend.load(engine_kwargs, async_engine=async_engine)
+    if name == "fake":
+        return FakeBackend(FakeBackendConfig.model_validate(fake_config or {}), status_ids=status_ids)
+    raise ValueError(f"Unknown inference backend: {name}")
@@ -0,0 +1,103 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import enum
+
+import pytest
+import torch
+
+from cosmos_reason1_utils.backend import FakeBackend, FakeBackendConfig, InferenceBackend, load_backend
+from cosmos_reason1_utils.status import status_distribution
+
+
+class _SamplingParams:
+    def __init__(self, max_tokens=None, logprobs=None, output_kind=None):
+        self.max_tokens = max_tokens
+        self.logprobs = logprobs
+        self.output_kind = output_kind
+
+
+class _OutputKind(enum.Enum):
+    CUMULATIVE = 0
+    DELTA = 1
+    FINAL_ONLY = 2
+
+
+def test_fake_backend_generate():
+    sleeps = []
+    config = FakeBackendConfig(
+        responses=["Safety Status: Safe\nIdentified Hazard: None", "Safety Status: Danger\nIdentified Hazard: Fire - Smoke near the press"],
+        prefill_time_per_token=0.001,
+        decode_time_per_step=0.01,
+        video_token_pixels=32 * 32 * 2,
+    )
+    backend = FakeBackend(config, sleep=sleeps.append)
+    video = torch.zeros(4, 3, 64, 64)
+    prompts = [
+        {"prompt_token_ids": [0] * 10, "multi_modal_data": {"video": [(video, {})]}},
+        {"prompt": "x" * 40},
+    ]
+    outputs = backend.generate(prompts, _SamplingParams())
+    assert [output.outputs[0].text for output in outputs] == config.responses
+    # 10 text + 4 * 64 * 64 / 2048 visual tokens; 10 text tokens
+    assert [len(output.prompt_token_ids) for output in outputs] == [18, 10]
+    # Prefill of all prompts, then decode steps of the longest output (11 words)
+    assert sleeps == [pytest.approx(28 * 0.001 + 11 * 0.01)]
+    assert backend.busy_time == pytest.approx(sleeps[0])
+
+    # Responses in turn; per-prompt params; outputs cut at max_tokens
+    outputs = backend.generate(prompts, [_SamplingParams(max_tokens=3), _SamplingParams(max_tokens=100)])
+    assert outputs[0].outputs[0].text == "Safety Status: Safe"
+    assert outputs[1].outputs[0].text == config.responses[1]
+
+
+def test_fake_backend_classification():
+    status_ids = {"SAFE": 1, "WARN": 2, "DANGER": 3, "EXTREME": 4}
+    backend = FakeBackend(FakeBackendConfig(responses=["Safety Status: Warn"]), status_ids=status_ids)
+    (output,) = backend.generate([{"prompt": "p"}], _SamplingParams(max_tokens=1, logprobs=20))
+    probs = status_distribution(output.outputs[0].logprobs[0], status_ids)
+    assert max(probs, key=probs.get) == "WARN"
+    (output,) = backend.generate([{"prompt": "p"}], _SamplingParams(max_tokens=1))
+    assert output.outputs[0].logprobs is None
+
+
+def test_fake_backend_stream():
+    backend = FakeBackend(FakeBackendConfig(responses=["Safety Status: Safe"]))
+
+    async def collect(output_kind):
+        params = _SamplingParams(output_kind=output_kind)
+        return [output.outputs[0].text async for output in backend.stream({"prompt": "p"}, params, "r")]
+
+    assert asyncio.run(collect(_OutputKind.DELTA)) == ["Safety", " Status:", " Safe"]
+    assert asyncio.run(collect(_OutputKind.FINAL_ONLY)) == ["Safety Status: Safe"]
+    assert asyncio.run(collect(None)) == ["Safety", "Safety Status:", "Safety Status: Safe"]
+
+
+def test_load_backend():
+    backend = load_backend("fake", {"model": "unused"}, fake_config={"decode_time_per_step": 0.02})
+    assert isinstance(backend, FakeBackend)
+    assert backend.config.decode_time_per_step == 0.02
+    with pytest.raises(ValueError):
+        load_backend("unknown", {})
+
+
+def test_inference_backend_is_abstract():
+    class _GenerateOnly(InferenceBackend):
+        def generate(self, prompts, sampling_params):
+            return []
+
+    with pytest.raises(TypeError):
+        _GenerateOnly()
@@ -0,0 +1,337 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import collections
+import queue
+import threading
+import time
+from typing import Any, Callable
+
+"""Batch formation utilities."""
+
+
+def nested_nbytes(obj: Any, _seen: set[int] | None = None) -> int:
+    """Return the bytes held by arrays/tensors nested in dicts, lists and tuples.
+
+    Arrays referenced more than once are counted once.
+    """
+    if _seen is None:
+        _seen = set()
+    if isinstance(obj, dict):
+        return sum(nested_nbytes(v, _seen) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(nested_nbytes(v, _seen) for v in obj)
+    nbytes = getattr(obj, "nbytes", None)
+    if not isinstance(nbytes, int) or id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    return nbytes
+
+
+class TokenBudget:
+    """Visual token budget of a batch being formed.
+
+    Args:
+        max_tokens: Maximum number of visual tokens per batch.
+        max_items: Optional hard limit on the number of items per batch.
+    """
+
+    def __init__(self, max_tokens: int, max_items: int | None = None):
+        if max_tokens <= 0:
+            raise ValueError(f"max_tokens must be positive: {max_tokens}")
+        self.max_tokens = max_tokens
+        self.max_items = max_items
+        self.tokens = 0
+        self.items = 0
+
+    def fits(self, tokens: int) -> bool:
+        """Return whether an item costing `tokens` can join the batch.
+
+        An empty batch always accepts one item, so that an item larger than the
+        whole budget is still processed (alone) instead of blocking the queue.
+        """
+        if self.items == 0:
+            return True
+        if self.max_items is not None and self.items >= self.max_items:
+            return False
+        return self.tokens + tokens <= self.max_tokens
+
+    def add(self, tokens: int):
+        """Account for an item costing `tokens`."""
+        self.tokens += tokens
+        self.items += 1
+
+    @property
+    def full(self) -> bool:
+        """Whether no further item can join the batch."""
+        if self.max_items is not None and self.items >= self.max_items:
+            return True
+        return self.tokens >= self.max_tokens
+
+
+class ByteBudgetQueue:
+    """FIFO handoff queue bounded by the bytes its items hold.
+
+    Bytes are accounted from `put` until the consumer calls `release`, so that
+    items still in use downstream (e.g. during generation) count against the
+    budget. An item larger than the whole budget is accepted once nothing else
+    is in flight.
+
+    Args:
+        max_bytes: Maximum number of bytes in flight.
+        max_items: Optional maximum number of queued (not yet consumed) items.
+        sizeof: Function returning the bytes held by an item.
+        on_release: Optional function called with every released item
+            (e.g. to recycle its buffers).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_items: int | None = None,
+        sizeof: Callable[[Any], int] = nested_nbytes,
+        on_release: Callable[[Any], None] | None = None,
+    ):
+        if max_bytes <= 0:
+            raise ValueError(f"max_bytes must be positive: {max_bytes}")
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self._sizeof = sizeof
+        self._on_release = on_release
+        self._items: list[tuple[Any, int]] = []
+        self._held: dict[int, int] = {}
+        self._bytes = 0
+        self._cond = threading.Condition()
+
+    @property
+    def bytes_in_flight(self) -> int:
+        """Bytes held by queued and consumed-but-unreleased items."""
+        with self._cond:
+            return self._bytes
+
+    def qsize(self) -> int:
+        """Number of queued items."""
+        with self._cond:
+            return len(self._items)
+
+    def _has_room(self, nbytes: int) -> bool:
+        if self.max_items is not None and len(self._items) >= self.max_items:
+            return False
+        return self._bytes == 0 or self._bytes + nbytes <= self.max_bytes
+
+    def put(self, item: Any, timeout: float | None = None):
+        """Enqueue an item, blocking until its bytes fit into the budget.
+
+        Raises:
+            queue.Full: If the item did not fit within `timeout` seconds.
+        """
+        nbytes = self._sizeof(item)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._has_room(nbytes):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Full
+                self._cond.wait(remaining)
+            self._items.append((item, nbytes))
+            self._bytes += nbytes
+            self._cond.notify_all()
+
+    def get(self, timeout: float | None = None) -> Any:
+        """Dequeue the oldest item. Its bytes stay accounted until `release`.
+
+        Raises:
+            queue.Empty: If no item arrived within `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._items:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._cond.wait(remaining)
+            item, nbytes = self._items.pop(0)
+            self._held[id(item)] = self._held.get(id(item), 0) + nbytes
+            self._cond.notify_all()
+            return item
+
+    def release(self, item: Any):
+        """Release the bytes of an item returned by `get`."""
+        if self._on_release is not None:
+            self._on_release(item)
+        with self._cond:
+            nbytes = self._held.pop(id(item), 0)
+            self._bytes -= nbytes
+            self._cond.notify_all()
+
+
+class ChunkStitcher:
+    """Groups consecutive chunks of the same camera.
+
+    Chunks are held per camera until `size` of them are collected. Partial
+    groups are released by `expired` once their first chunk has been held
+    for `max_wait` seconds, so a camera that stops sending is not stuck.
+
+    Args:
+        size: Number of chunks per group.
+        max_wait: Maximum time a chunk is held (seconds).
+        clock: Monotonic clock (seconds).
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_wait: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if size < 2:
+            raise ValueError(f"size must be at least 2: {size}")
+        self.size = size
+        self.max_wait = max_wait
+        self._clock = clock
+        # key -> (time the first chunk was added, chunks)
+        self._groups: dict[str, tuple[float, list[Any]]] = {}
+
+    def __len__(self) -> int:
+        """Number of held chunks."""
+        return sum(len(chunks) for _, chunks in self._groups.values())
+
+    def add(self, key: str, chunk: Any) -> list[Any] | None:
+        """Hold a chunk of camera `key`; return its group once complete."""
+        _, chunks = self._groups.setdefault(key, (self._clock(), []))
+        chunks.append(chunk)
+        if len(chunks) < self.size:
+            return None
+        del self._groups[key]
+        return chunks
+
+    def release(self, key: str) -> list[Any]:
+        """Remove and return the chunks held for camera `key`."""
+        group = self._groups.pop(key, None)
+        return group[1] if group is not None else []
+
+    def expired(self) -> list[list[Any]]:
+        """Remove and return the partial groups held for `max_wait` or longer."""
+        now = self._clock()
+        keys = [
+            key
+            for key, (started, _) in self._groups.items()
+            if now - started >= self.max_wait
+        ]
+        return [self._groups.pop(key)[1] for key in keys]
+
+
+def _p95(values: list[float]) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * 0.95))]
+
+
+class BatchController:
+    """Tunes the batch formation wait and minimum size against a latency target.
+
+    The wait is adjusted by AIMD on the p95 end-to-end latency, measured over
+    every `min_samples` new latencies: it is halved above `target_latency`,
+    and grows by `step` below `target_latency * (1 - headroom)`. It is capped
+    so that the wait plus the p95 GPU time per batch stays within the target.
+    The minimum batch size is the number of items expected to arrive during
+    the wait, from the smoothed arrival rate.
+
+    Thread-safe.
+
+    Args:
+        target_latency: Target p95 end-to-end latency (seconds).
+        max_size: Maximum batch size.
+        min_wait: Minimum wait (seconds).
+        max_wait: Maximum wait (seconds); also the initial wait.
+        step: Additive wait increase (seconds).
+        headroom: Fraction of the target below which the wait grows.
+        min_samples: Latencies per adjustment.
+        window: Number of recent GPU times kept.
+        clock: Monotonic clock (seconds).
+    """
+
+    def __init__(
+        self,
+        target_latency: float,
+        max_size: int,
+        min_wait: float = 0.01,
+        max_wait: float = 1.0,
+        step: float = 0.05,
+        headroom: float = 0.2,
+        min_samples: int = 20,
+        window: int = 100,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if target_latency <= 0:
+            raise ValueError(f"target_latency must be positive: {target_latency}")
+        if not 0 < min_wait <= max_wait:
+            raise ValueError(f"Invalid wait range: [{min_wait}, {max_wait}]")
+        self.target_latency = target_latency
+        self.max_size = max_size
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.step = step
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._latencies: list[float] = []
+        self._gpu_times: collections.deque[float] = collections.deque(maxlen=window)
+        self._arrivals = 0
+        self._last_update = clock()
+        self.wait = max_wait
+        self.min_size = 1
+        self.arrival_rate = 0.0
+        self.latency_p95: float | None = None
+
+    def record_latency(self, latency: float):
+        """Record the end-to-end latency of an item (seconds)."""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def record_batch(self, gpu_time: float):
+        """Record the GPU time of a batch (seconds)."""
+        with self._lock:
+            self._gpu_times.append(gpu_time)
+
+    def record_arrivals(self, count: int = 1):
+        """Record items taken from the input queue."""
+        with self._lock:
+            self._arrivals += count
+
+    def update(self, smoothing: float = 0.3) -> tuple[float, int]:
+        """Adjust and return (wait, minimum batch size) for the next batch."""
+        now = self._clock()
+        with self._lock:
+            elapsed = now - self._last_update
+            if elapsed > 0:
+                rate = self._arrivals / elapsed
+                self.arrival_rate += smoothing * (rate - self.arrival_rate)
+                self._arrivals = 0
+                self._last_update = now
+            if len(self._latencies) >= self.min_samples:
+                self.latency_p95 = _p95(self._latencies)
+                self._latencies.clear()
+                if self.latency_p95 > self.target_latency:
+                    self.wait /= 2
+                elif self.latency_p95 < self.target_latency * (1 - self.headroom):
+                    self.wait += self.step
+            max_wait = self.max_wait
+            if self._gpu_times:
+                max_wait = min(max_wait, self.target_latency - _p95(list(self._gpu_times)))
+            self.wait = min(max(self.wait, self.min_wait), max(max_wait, self.min_wait))
+            self.min_size = min(max(int(self.arrival_rate * self.wait), 1), self.max_size)
+            return self.wait, self.min_size
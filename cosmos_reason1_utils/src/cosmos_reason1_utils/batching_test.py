@@ -0,0 +1,146 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import queue
+
+import numpy as np
+import pytest
+
+from cosmos_reason1_utils.batching import (
+    BatchController,
+    ByteBudgetQueue,
+    ChunkStitcher,
+    TokenBudget,
+    nested_nbytes,
+)
+
+
+def test_token_budget():
+    budget = TokenBudget(max_tokens=100, max_items=3)
+    assert budget.fits(40)
+    budget.add(40)
+    assert budget.fits(60)
+    assert not budget.fits(61)
+    budget.add(60)
+    assert budget.full
+    assert budget.fits(0)
+    budget.add(0)
+    assert not budget.fits(0)
+
+
+def test_token_budget_oversized_item():
+    budget = TokenBudget(max_tokens=100)
+    assert budget.fits(500)
+    budget.add(500)
+    assert budget.full
+    assert not budget.fits(1)
+
+
+def test_nested_nbytes():
+    batch = {"video": [np.zeros(10, dtype=np.uint8), (np.zeros(5, dtype=np.int32),)]}
+    assert nested_nbytes(batch) == 10 + 20
+    assert nested_nbytes({"prompt": "text"}) == 0
+    # Shared arrays are counted once
+    mm_data = {"video": [np.zeros(10, dtype=np.uint8)]}
+    assert nested_nbytes([{"multi_modal_data": mm_data}, {"multi_modal_data": mm_data}]) == 10
+
+
+def test_byte_budget_queue():
+    q = ByteBudgetQueue(max_bytes=100, sizeof=len)
+    first = b"x" * 60
+    second = b"y" * 60
+    q.put(first)
+    assert q.bytes_in_flight == 60
+    with pytest.raises(queue.Full):
+        q.put(second, timeout=0.01)
+    assert q.get() is first
+    # Still in flight until released
+    with pytest.raises(queue.Full):
+        q.put(second, timeout=0.01)
+    q.release(first)
+    assert q.bytes_in_flight == 0
+    q.put(second)
+    assert q.qsize() == 1
+    assert q.get() is second
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.01)
+
+
+def test_byte_budget_queue_oversized_item():
+    q = ByteBudgetQueue(max_bytes=10, sizeof=len)
+    q.put(b"x" * 50)
+    assert q.bytes_in_flight == 50
+
+
+def test_byte_budget_queue_on_release():
+    released = []
+    q = ByteBudgetQueue(max_bytes=100, sizeof=lambda item: 10, on_release=released.append)
+    q.put("a")
+    item = q.get()
+    assert released == []
+    q.release(item)
+    assert released == ["a"]
+    assert q.bytes_in_flight == 0
+
+
+def test_chunk_stitcher():
+    now = [0.0]
+    stitcher = ChunkStitcher(size=3, max_wait=30, clock=lambda: now[0])
+    assert stitcher.add("cam0", 1) is None
+    assert stitcher.add("cam1", 10) is None
+    assert stitcher.add("cam0", 2) is None
+    assert stitcher.add("cam0", 3) == [1, 2, 3]
+    assert len(stitcher) == 1
+
+    now[0] = 29
+    assert stitcher.expired() == []
+    now[0] = 30
+    assert stitcher.expired() == [[10]]
+    assert len(stitcher) == 0
+
+    stitcher.add("cam0", 4)
+    assert stitcher.release("cam0") == [4]
+    assert stitcher.release("cam0") == []
+
+
+def test_batch_controller():
+    now = [0.0]
+    controller = BatchController(
+        target_latency=2.0, max_size=8, max_wait=1.0, step=0.1, min_samples=3, clock=lambda: now[0]
+    )
+    assert controller.update() == (1.0, 1)
+
+    # 20 items/s, smoothed: about 6 items expected during the wait
+    controller.record_arrivals(20)
+    now[0] += 1
+    assert controller.update() == (1.0, 6)
+
+    # Over target: multiplicative decrease
+    for _ in range(3):
+        controller.record_latency(3.0)
+    assert controller.update() == (0.5, 3)
+    assert controller.latency_p95 == 3.0
+    # Not enough new samples: unchanged
+    controller.record_latency(1.0)
+    assert controller.update() == (0.5, 3)
+
+    # Under target: additive increase
+    for _ in range(2):
+        controller.record_latency(1.0)
+    assert controller.update()[0] == pytest.approx(0.6)
+
+    # Waiting longer than the GPU time leaves is pointless
+    controller.record_batch(1.8)
+    assert controller.update()[0] == pytest.approx(0.2)
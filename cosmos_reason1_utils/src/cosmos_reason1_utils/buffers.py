@@ -0,0 +1,120 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+
+import torch
+
+"""Host buffer utilities."""
+
+
+class PinnedBufferPool:
+    """Pool of recycled (page-locked) host buffers for tensors.
+
+    Buffers are bucketed by size, rounded up to a power of two. A tensor
+    obtained with `copy` or `empty` is a view of a pooled buffer; `release`
+    returns the buffer to the pool for reuse. Free buffers are kept up to
+    `max_cached_bytes`; beyond that, released buffers are dropped (and freed
+    once no view of them is left). Every tensor handed out must be released:
+    the pool holds its buffer until then.
+
+    Thread-safe.
+
+    Args:
+        max_cached_bytes: Maximum bytes of free buffers kept for reuse.
+        pin_memory: Whether buffers are page-locked (requires CUDA).
+        min_bucket_bytes: Smallest buffer size.
+    """
+
+    def __init__(self, max_cached_bytes: int, pin_memory: bool = True, min_bucket_bytes: int = 1 << 16):
+        self.max_cached_bytes = max_cached_bytes
+        self.pin_memory = pin_memory
+        self.min_bucket_bytes = min_bucket_bytes
+        self.hits = 0
+        self.misses = 0
+        self.pinned_bytes = 0
+        self.peak_pinned_bytes = 0
+        self.cached_bytes = 0
+        self._free: dict[int, list[torch.Tensor]] = collections.defaultdict(list)
+        # data_ptr of handed out buffers -> buffer
+        self._in_use: dict[int, torch.Tensor] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def in_use_bytes(self) -> int:
+        """Bytes of buffers handed out and not released."""
+        return self.pinned_bytes - self.cached_bytes
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of requests served by a recycled buffer."""
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    def _bucket(self, nbytes: int) -> int:
+        return max(self.min_bucket_bytes, 1 << max(nbytes - 1, 0).bit_length())
+
+    def empty(self, shape: tuple[int, ...] | torch.Size, dtype: torch.dtype) -> torch.Tensor:
+        """Return an uninitialized tensor backed by a pooled buffer."""
+        nbytes = torch.Size(shape).numel() * torch.empty((), dtype=dtype).element_size()
+        bucket = self._bucket(nbytes)
+        with self._lock:
+            free = self._free[bucket]
+            buffer = free.pop() if free else None
+            if buffer is not None:
+                self.cached_bytes -= bucket
+                self.hits += 1
+            else:
+                self.misses += 1
+                self.pinned_bytes += bucket
+                self.peak_pinned_bytes = max(self.peak_pinned_bytes, self.pinned_bytes)
+        if buffer is None:
+            # Allocated outside the lock: pinning is slow
+            buffer = torch.empty(bucket, dtype=torch.uint8, pin_memory=self.pin_memory)
+        with self._lock:
+            self._in_use[buffer.data_ptr()] = buffer
+        return buffer[:nbytes].view(dtype).view(shape)
+
+    def buffer_nbytes(self, tensor: torch.Tensor) -> int:
+        """Return the size of the pooled buffer backing a tensor from `copy` or `empty` (0 if none).
+
+        This is the memory the tensor holds: its bucket, not just its own bytes.
+        """
+        with self._lock:
+            buffer = self._in_use.get(tensor.data_ptr())
+        return buffer.numel() if buffer is not None else 0
+
+    def copy(self, tensor: torch.Tensor) -> torch.Tensor:
+        """Return a copy of a CPU tensor in a pooled buffer."""
+        pooled = self.empty(tensor.shape, tensor.dtype)
+        pooled.copy_(tensor)
+        return pooled
+
+    def release(self, tensor: torch.Tensor):
+        """Return the buffer of a tensor from `copy` or `empty` to the pool.
+
+        The tensor (and any view of it) must not be used afterwards.
+        """
+        with self._lock:
+            buffer = self._in_use.pop(tensor.data_ptr(), None)
+            if buffer is None:
+                return
+            bucket = buffer.numel()
+            if self.cached_bytes + bucket > self.max_cached_bytes:
+                self.pinned_bytes -= bucket
+                return
+            self._free[bucket].append(buffer)
+            self.cached_bytes += bucket
@@ -0,0 +1,60 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import torch
+
+from cosmos_reason1_utils.buffers import PinnedBufferPool
+
+
+def test_pinned_buffer_pool():
+    pool = PinnedBufferPool(max_cached_bytes=1 << 20, pin_memory=False, min_bucket_bytes=1024)
+    video = torch.rand(4, 3, 10, 10)  # 4800 bytes: 8 KiB bucket
+    pooled = pool.copy(video)
+    assert torch.equal(pooled, video)
+    assert (pool.hits, pool.misses, pool.pinned_bytes) == (0, 1, 8192)
+    assert pool.buffer_nbytes(pooled) == 8192
+    assert pool.buffer_nbytes(video) == 0
+
+    pool.release(pooled)
+    assert pool.cached_bytes == 8192
+    # Same bucket: recycled
+    other = pool.copy(torch.zeros(1500))
+    assert pool.hits == 1 and pool.cached_bytes == 0
+    assert other.data_ptr() == pooled.data_ptr()
+    # Released twice or not pooled: ignored
+    pool.release(other)
+    pool.release(other)
+    pool.release(video)
+    assert pool.cached_bytes == 8192
+    assert pool.buffer_nbytes(other) == 0
+
+    # Different bucket
+    pool.copy(torch.zeros(100, dtype=torch.uint8))
+    assert pool.misses == 2
+    assert pool.hit_rate == 1 / 3
+
+
+def test_pinned_buffer_pool_limits():
+    pool = PinnedBufferPool(max_cached_bytes=1024, pin_memory=False, min_bucket_bytes=1024)
+    a = pool.empty((256,), torch.float32)
+    b = pool.empty((256,), torch.float32)
+    assert pool.peak_pinned_bytes == 2048
+    pool.release(a)
+    # Over max_cached_bytes: freed, not cached
+    pool.release(b)
+    assert pool.cached_bytes == 1024
+    assert pool.pinned_bytes == 1024
+    assert pool.in_use_bytes == 0
+    assert pool.peak_pinned_bytes == 2048
@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+from typing import Any, Callable
+
+"""Result caching utilities."""
+
+
+class CachedResult:
+    """Result of an analysed chunk.
+
+    Args:
+        signature: Perceptual signature of the chunk (see `cosmos_reason1_utils.vision.video_phash`).
+        result: Analysis result.
+        timestamp: Chunk timestamp (seconds).
+        source: Identifier of the analysed chunk.
+    """
+
+    def __init__(self, signature: Any, result: Any, timestamp: float, source: str):
+        self.signature = signature
+        self.result = result
+        self.timestamp = timestamp
+        self.source = source
+
+
+class ResultCache:
+    """Last analysed result per camera, reused for near-duplicate chunks.
+
+    Each camera keeps only its last analysed chunk. A new chunk reuses that
+    result if its signature is within `max_distance` of it and it is at most
+    `max_age` seconds newer. Reused results are not stored again, so every
+    chunk is compared with a chunk that was actually analysed, and a camera
+    is re-analysed at least every `max_age` seconds. Cameras are evicted in
+    least recently used order beyond `max_entries`.
+
+    Thread-safe.
+
+    Args:
+        max_distance: Maximum signature distance for a reuse.
+        max_age: Maximum age of a reused result (seconds).
+        distance: Signature distance function (see `cosmos_reason1_utils.vision.phash_distance`).
+        max_entries: Maximum number of cameras.
+    """
+
+    def __init__(
+        self,
+        max_distance: float,
+        max_age: float,
+        distance: Callable[[Any, Any], float],
+        max_entries: int = 256,
+    ):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive: {max_entries}")
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.distance = distance
+        self.max_entries = max_entries
+        self._entries: collections.OrderedDict[str, CachedResult] = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: str, signature: Any, timestamp: float) -> CachedResult | None:
+        """Return the reusable result of camera `key` for a chunk, if any."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not 0 <= timestamp - entry.timestamp <= self.max_age:
+                if timestamp > entry.timestamp:
+                    # Expired: never reusable again
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        if self.distance(entry.signature, signature) > self.max_distance:
+            return None
+        return entry
+
+    def store(self, key: str, signature: Any, result: Any, timestamp: float, source: str):
+        """Store the result of an analysed chunk of camera `key`."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.timestamp > timestamp:
+                # Results can be published out of order; keep the newest chunk
+                return
+            self._entries[key] = CachedResult(signature, result, timestamp, source)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,54 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from cosmos_reason1_utils.cache import ResultCache
+
+
+def _distance(a, b):
+    return abs(a - b)
+
+
+def test_result_cache():
+    cache = ResultCache(max_distance=2, max_age=30, distance=_distance)
+    assert cache.lookup("cam0", 10, timestamp=100) is None
+
+    cache.store("cam0", 10, "Safe", timestamp=100, source="cam0:100")
+    entry = cache.lookup("cam0", 11, timestamp=105)
+    assert entry is not None
+    assert (entry.result, entry.source) == ("Safe", "cam0:100")
+    # Too different
+    assert cache.lookup("cam0", 20, timestamp=105) is None
+    # Other camera
+    assert cache.lookup("cam1", 10, timestamp=105) is None
+
+    # Older results are not stored over newer ones
+    cache.store("cam0", 50, "Danger", timestamp=90, source="cam0:90")
+    assert cache.lookup("cam0", 10, timestamp=105).result == "Safe"
+
+    # Expired
+    assert cache.lookup("cam0", 10, timestamp=131) is None
+    assert len(cache) == 0
+
+
+def test_result_cache_lru():
+    cache = ResultCache(max_distance=0, max_age=30, distance=_distance, max_entries=2)
+    cache.store("cam0", 0, "a", timestamp=0, source="cam0:0")
+    cache.store("cam1", 0, "b", timestamp=0, source="cam1:0")
+    assert cache.lookup("cam0", 0, timestamp=1) is not None
+    cache.store("cam2", 0, "c", timestamp=0, source="cam2:0")
+    # cam1 was the least recently used
+    assert cache.lookup("cam1", 0, timestamp=1) is None
+    assert cache.lookup("cam0", 0, timestamp=1) is not None
+    assert len(cache) == 2
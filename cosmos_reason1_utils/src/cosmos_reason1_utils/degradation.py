@@ -0,0 +1,139 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import time
+from typing import Callable
+
+import pydantic
+from pydantic import Field
+
+"""Load-adaptive degradation of vision processing."""
+
+
+class DegradationLevel(pydantic.BaseModel):
+    """One rung of the degradation ladder.
+
+    Overrides are applied on top of the base vision config (see
+    `cosmos_reason1_utils.vision.VisionConfig`).
+    """
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    name: str = Field(description="Level name (recorded with each result)")
+    total_pixels_scale: float = Field(
+        default=1.0, gt=0, le=1, description="Multiplier for total_pixels"
+    )
+    fps: float | None = Field(default=None, description="FPS override")
+    max_frames: int | None = Field(default=None, description="Max frames override")
+
+    def apply(self, vision_kwargs: dict) -> dict:
+        """Return a copy of `vision_kwargs` with this level's overrides applied."""
+        kwargs = dict(vision_kwargs)
+        if self.total_pixels_scale != 1.0 and kwargs.get("total_pixels"):
+            kwargs["total_pixels"] = int(kwargs["total_pixels"] * self.total_pixels_scale)
+        if self.fps is not None:
+            kwargs["fps"] = self.fps
+        if self.max_frames is not None:
+            kwargs["max_frames"] = self.max_frames
+        return kwargs
+
+
+class DegradationConfig(pydantic.BaseModel):
+    """Config for the degradation ladder."""
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    levels: list[DegradationLevel] = Field(
+        default_factory=lambda: [DegradationLevel(name="full")],
+        min_length=1,
+        description="Levels ordered from full fidelity to cheapest",
+    )
+    step_down_queue_depth: int = Field(
+        default=40, description="Step down when the queue is deeper than this"
+    )
+    step_down_queue_age: float = Field(
+        default=20.0,
+        description="Step down when the oldest queued item is older than this (seconds)",
+    )
+    step_up_queue_depth: int = Field(
+        default=10, description="Step up when the queue is at most this deep"
+    )
+    step_up_queue_age: float = Field(
+        default=5.0,
+        description="Step up when the oldest queued item is at most this old (seconds)",
+    )
+    min_dwell: float = Field(
+        default=15.0, description="Minimum time between level changes (seconds)"
+    )
+
+
+class DegradationLadder:
+    """Steps through degradation levels based on queue depth and age.
+
+    Moves at most one level per `min_dwell` seconds, so that the level does not
+    oscillate while the queue drains.
+
+    Args:
+        config: Ladder config.
+        clock: Monotonic clock (seconds).
+    """
+
+    def __init__(
+        self,
+        config: DegradationConfig,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.config = config
+        self._clock = clock
+        self._index = 0
+        self._last_change = -float("inf")
+
+    @property
+    def level(self) -> DegradationLevel:
+        """Current level."""
+        return self.config.levels[self._index]
+
+    @property
+    def index(self) -> int:
+        """Index of the current level (0 is full fidelity)."""
+        return self._index
+
+    def update(self, queue_depth: int, queue_age: float) -> DegradationLevel:
+        """Update the level from the current load and return it.
+
+        Args:
+            queue_depth: Number of queued items.
+            queue_age: Age of the oldest queued item (seconds).
+        """
+        config = self.config
+        now = self._clock()
+        if now - self._last_change < config.min_dwell:
+            return self.level
+        overloaded = (
+            queue_depth > config.step_down_queue_depth
+            or queue_age > config.step_down_queue_age
+        )
+        idle = (
+            queue_depth <= config.step_up_queue_depth
+            and queue_age <= config.step_up_queue_age
+        )
+        if overloaded and self._index < len(config.levels) - 1:
+            self._index += 1
+            self._last_change = now
+        elif idle and self._index > 0:
+            self._index -= 1
+            self._last_change = now
+        return self.level
@@ -0,0 +1,55 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from cosmos_reason1_utils.degradation import (
+    DegradationConfig,
+    DegradationLadder,
+    DegradationLevel,
+)
+
+
+def test_degradation_level_apply():
+    vision_kwargs = {"fps": 4, "total_pixels": 1000}
+    level = DegradationLevel(name="low", total_pixels_scale=0.25, fps=2)
+    assert level.apply(vision_kwargs) == {"fps": 2, "total_pixels": 250}
+    assert vision_kwargs == {"fps": 4, "total_pixels": 1000}
+
+
+def test_degradation_ladder():
+    now = 0.0
+    config = DegradationConfig(
+        levels=[
+            DegradationLevel(name="full"),
+            DegradationLevel(name="half", total_pixels_scale=0.5),
+        ],
+        step_down_queue_depth=10,
+        step_down_queue_age=20.0,
+        step_up_queue_depth=2,
+        step_up_queue_age=5.0,
+        min_dwell=10.0,
+    )
+    ladder = DegradationLadder(config, clock=lambda: now)
+    assert ladder.update(queue_depth=5, queue_age=1.0).name == "full"
+    assert ladder.update(queue_depth=5, queue_age=30.0).name == "half"
+    # Bottom of the ladder
+    now = 20.0
+    assert ladder.update(queue_depth=50, queue_age=30.0).name == "half"
+    ladder = DegradationLadder(config, clock=lambda: now)
+    assert ladder.update(queue_depth=50, queue_age=0.0).name == "half"
+    # Load dropped, but the level changed too recently
+    now = 25.0
+    assert ladder.update(queue_depth=0, queue_age=0.0).name == "half"
+    now = 30.0
+    assert ladder.update(queue_depth=0, queue_age=0.0).name == "full"
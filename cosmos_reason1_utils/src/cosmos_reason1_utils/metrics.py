@@ -0,0 +1,71 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import collections
+import threading
+
+"""In-process service metrics."""
+
+
+class Metrics:
+    """Thread-safe registry of gauges, counters and latency summaries.
+
+    Args:
+        window: Number of recent observations kept per summary.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._window = window
+        self._lock = threading.Lock()
+        self._gauges: dict[str, float] = {}
+        self._counters: dict[str, float] = collections.defaultdict(float)
+        self._summaries: dict[str, collections.deque] = {}
+
+    def set(self, name: str, value: float):
+        """Set a gauge."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def incr(self, name: str, value: float = 1):
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float):
+        """Add an observation to a summary."""
+        with self._lock:
+            if name not in self._summaries:
+                self._summaries[name] = collections.deque(maxlen=self._window)
+            self._summaries[name].append(value)
+
+    def snapshot(self) -> dict[str, float]:
+        """Return all metrics as a flat mapping.
+
+        Summaries are reported as `<name>.count`, `<name>.avg`, `<name>.p50`,
+        `<name>.p95` and `<name>.max` over the recent window.
+        """
+        with self._lock:
+            result = dict(self._gauges)
+            result.update(self._counters)
+            summaries = {k: sorted(v) for k, v in self._summaries.items() if v}
+        for name, values in summaries.items():
+            n = len(values)
+            result[f"{name}.count"] = n
+            result[f"{name}.avg"] = sum(values) / n
+            result[f"{name}.p50"] = values[(n - 1) // 2]
+            result[f"{name}.p95"] = values[min(n - 1, int(n * 0.95))]
+            result[f"{name}.max"] = values[-1]
+        return result
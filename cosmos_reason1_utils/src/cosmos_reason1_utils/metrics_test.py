@@ -0,0 +1,41 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from cosmos_reason1_utils.metrics import Metrics
+
+
+def test_metrics_snapshot():
+    metrics = Metrics(window=100)
+    metrics.set("queue_bytes", 10)
+    metrics.set("queue_bytes", 20)
+    metrics.incr("batches")
+    metrics.incr("batches", 2)
+    for i in range(1, 101):
+        metrics.observe("latency", i)
+    snapshot = metrics.snapshot()
+    assert snapshot["queue_bytes"] == 20
+    assert snapshot["batches"] == 3
+    assert snapshot["latency.count"] == 100
+    assert snapshot["latency.avg"] == 50.5
+    assert snapshot["latency.p50"] == 50
+    assert snapshot["latency.p95"] == 96
+    assert snapshot["latency.max"] == 100
+
+
+def test_metrics_window():
+    metrics = Metrics(window=2)
+    for value in [100, 1, 2]:
+        metrics.observe("latency", value)
+    assert metrics.snapshot()["latency.max"] == 2
@@ -0,0 +1,284 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterator
+
+from cosmos_reason1_utils.metrics import Metrics
+
+"""Staged pipeline executor."""
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """A pipeline stage: `workers` threads applying `fn` to queued items.
+
+    The first stage of a pipeline is a source: `fn()` is a generator whose
+    items are pushed downstream. Other stages call `fn(item)` for each item of
+    their input queue and push the result downstream unless it is `None`.
+    Queues with a `release` method (see
+    `cosmos_reason1_utils.batching.ByteBudgetQueue`) are released by the
+    stages in `release_queues` once they have processed an item, and by the
+    stages in `drop_release_queues` if they drop it (see
+    `Pipeline.add_stage`).
+
+    An `ordered` stage emits its results in the order of its input, even
+    with several workers: a worker done early waits for the items taken
+    before its own to be emitted (or dropped).
+
+    Args:
+        name: Stage name (used in metrics).
+        fn: Stage function.
+        workers: Number of worker threads.
+        input_queue: Input queue (`None` for a source stage).
+        metrics: Metrics registry.
+        ordered: Emit results in input order.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        *,
+        workers: int = 1,
+        input_queue: Any = None,
+        metrics: Metrics | None = None,
+        ordered: bool = False,
+    ):
+        if workers < 1:
+            raise ValueError(f"Stage {name} needs at least one worker: {workers}")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.input_queue = input_queue
+        self.output_queue: Any = None
+        self.metrics = metrics
+        self.ordered = ordered
+        self.release_queues: list[Any] = []
+        self.drop_release_queues: list[Any] = []
+        if getattr(input_queue, "release", None) is not None:
+            self.release_queues.append(input_queue)
+        self._lock = threading.Lock()
+        self._busy = 0.0
+        self._reported_busy = 0.0
+        self._reported_at = time.monotonic()
+        # [Ordered] Sequence numbers of the next item to take and to emit
+        self._take_lock = threading.Lock()
+        self._emit_turn = threading.Condition()
+        self._next_take = 0
+        self._next_emit = 0
+
+    def _account(self, elapsed: float):
+        with self._lock:
+            self._busy += elapsed
+        if self.metrics is not None:
+            self.metrics.observe(f"stage.{self.name}.time", elapsed)
+
+    def _emit(self, item: Any):
+        if item is not None and self.output_queue is not None:
+            self.output_queue.put(item)
+
+    def _take(self) -> tuple[Any, int]:
+        if not self.ordered:
+            return self.input_queue.get(), 0
+        with self._take_lock:
+            item = self.input_queue.get()
+            seq = self._next_take
+            self._next_take += 1
+        return item, seq
+
+    def _emit_in_order(self, seq: int, item: Any):
+        if not self.ordered:
+            self._emit(item)
+            return
+        with self._emit_turn:
+            self._emit_turn.wait_for(lambda: self._next_emit == seq)
+        try:
+            self._emit(item)
+        finally:
+            with self._emit_turn:
+                self._next_emit += 1
+                self._emit_turn.notify_all()
+
+    def _source_items(self) -> Iterator[Any]:
+        items = self.fn()
+        while True:
+            start = time.monotonic()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            # Time spent blocked on an empty input (e.g. BLPOP) counts as busy
+            self._account(time.monotonic() - start)
+            yield item
+
+    def run(self):
+        """Run one worker loop in the calling thread (never returns for non-sources)."""
+        if self.input_queue is None:
+            for item in self._source_items():
+                self._emit(item)
+            return
+        while True:
+            item, seq = self._take()
+            start = time.monotonic()
+            result = None
+            try:
+                result = self.fn(item)
+            except Exception:
+                logger.exception(f"[{self.name}] Error processing item")
+            finally:
+                for release_queue in self.release_queues:
+                    release_queue.release(item)
+                if result is None:
+                    # Never reaches the stage that would release it
+                    for release_queue in self.drop_release_queues:
+                        release_queue.release(item)
+                self._account(time.monotonic() - start)
+            self._emit_in_order(seq, result)
+
+    def utilization(self) -> float:
+        """Fraction of worker time spent processing since the previous call."""
+        now = time.monotonic()
+        with self._lock:
+            busy = self._busy - self._reported_busy
+            elapsed = now - self._reported_at
+            self._reported_busy = self._busy
+            self._reported_at = now
+        if elapsed <= 0:
+            return 0.0
+        return min(1.0, busy / (elapsed * self.workers))
+
+
+class Pipeline:
+    """Linear pipeline of stages connected by bounded queues.
+
+    Example:
+
+    ```python
+    pipeline = Pipeline()
+    pipeline.add_stage("fetch", fetch_batches)
+    pipeline.add_stage("decode", decode_batch, workers=4, queue_size=2)
+    pipeline.add_stage("publish", publish_batch)
+    pipeline.start()
+    ```
+
+    Args:
+        metrics: Metrics registry for per-stage timings, utilization and queue occupancy.
+    """
+
+    def __init__(self, metrics: Metrics | None = None):
+        self.metrics = metrics
+        self.stages: list[Stage] = []
+        self._threads: list[threading.Thread] = []
+        # Name of the releasing stage -> (index of the first stage holding the items, queue)
+        self._pending_releases: dict[str, list[tuple[int, Any]]] = {}
+
+    def add_stage(
+        self,
+        name: str,
+        fn: Callable,
+        *,
+        workers: int = 1,
+        queue_size: int = 1,
+        input_queue: Any = None,
+        release_after: str | None = None,
+        ordered: bool = False,
+    ) -> Stage:
+        """Append a stage.
+
+        Args:
+            name: Stage name.
+            fn: Stage function (a generator function for the first stage).
+            workers: Number of worker threads.
+            queue_size: Capacity of the input queue (ignored for the first stage).
+            input_queue: Custom input queue (must provide `put`, `get` and `qsize`).
+            release_after: Name of a later stage. Items of `input_queue` are
+                released once that stage has processed them (or as soon as a
+                stage in between drops them) instead of after this stage, so
+                that a byte budget covers the items until then. The stages
+                in between must pass the same item objects downstream.
+            ordered: Emit results in input order, whatever the number of workers.
+        """
+        if any(stage.name == name for stage in self.stages):
+            raise ValueError(f"Duplicate stage: {name}")
+        if self.stages and input_queue is None:
+            input_queue = queue.Queue(maxsize=queue_size)
+        stage = Stage(
+            name, fn, workers=workers, input_queue=input_queue, metrics=self.metrics, ordered=ordered
+        )
+        if release_after is not None:
+            if not stage.release_queues:
+                raise ValueError(f"Stage {name} has no releasable input queue")
+            stage.release_queues.remove(input_queue)
+            self._pending_releases.setdefault(release_after, []).append((len(self.stages), input_queue))
+        for first, release_queue in self._pending_releases.pop(name, []):
+            for holder in self.stages[first:]:
+                holder.drop_release_queues.append(release_queue)
+            stage.release_queues.append(release_queue)
+        if self.stages:
+            self.stages[-1].output_queue = input_queue
+        self.stages.append(stage)
+        return stage
+
+    def stage(self, name: str) -> Stage:
+        """Return the stage called `name`."""
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    def start(self, exclude: tuple[str, ...] = ()):
+        """Start worker threads for all stages not in `exclude`.
+
+        Excluded stages can be run in a specific thread with `Stage.run`.
+        """
+        if self._pending_releases:
+            raise ValueError(f"Unknown release_after stages: {', '.join(self._pending_releases)}")
+        for stage in self.stages:
+            if stage.name in exclude:
+                continue
+            for i in range(stage.workers):
+                thread = threading.Thread(
+                    target=stage.run, name=f"{stage.name}-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def report(self):
+        """Update per-stage utilization and queue occupancy gauges.
+
+        Queues bounded by bytes (see `cosmos_reason1_utils.batching.ByteBudgetQueue`)
+        also report their bytes in flight.
+        """
+        if self.metrics is None:
+            return
+        for stage in self.stages:
+            self.metrics.set(f"stage.{stage.name}.utilization", stage.utilization())
+            q = stage.input_queue
+            if q is None:
+                continue
+            depth = q.qsize()
+            capacity = getattr(q, "maxsize", None) or getattr(q, "max_items", None)
+            self.metrics.set(f"stage.{stage.name}.queue_depth", depth)
+            if capacity:
+                self.metrics.set(f"stage.{stage.name}.queue_occupancy", depth / capacity)
+            nbytes = getattr(q, "bytes_in_flight", None)
+            if nbytes is not None:
+                self.metrics.set(f"stage.{stage.name}.queue_bytes", nbytes)
@@ -0,0 +1,116 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import queue
+import threading
+import time
+
+from cosmos_reason1_utils.batching import ByteBudgetQueue
+from cosmos_reason1_utils.metrics import Metrics
+from cosmos_reason1_utils.pipeline import Pipeline
+
+
+def _wait_for(condition, timeout=5.0):
+    """Poll until the pipeline has drained (results can arrive before their stage finishes accounting)."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def test_pipeline():
+    results = queue.Queue()
+
+    def source():
+        yield from range(10)
+
+    def drop_odd(item):
+        return item if item % 2 == 0 else None
+
+    metrics = Metrics()
+    pipeline = Pipeline(metrics)
+    pipeline.add_stage("source", source)
+    pipeline.add_stage("square", lambda x: x * x, workers=3, queue_size=2)
+    pipeline.add_stage("filter", drop_odd)
+    pipeline.add_stage("sink", results.put)
+    pipeline.start()
+    assert sorted(results.get(timeout=5) for _ in range(5)) == [0, 4, 16, 36, 64]
+
+    # Odd squares are dropped by the filter: wait until every item went through it
+    _wait_for(lambda: metrics.snapshot().get("stage.filter.time.count") == 10)
+    pipeline.report()
+    snapshot = metrics.snapshot()
+    assert snapshot["stage.square.time.count"] == 10
+    assert 0 <= snapshot["stage.square.utilization"] <= 1
+    assert snapshot["stage.sink.queue_depth"] == 0
+
+
+def test_pipeline_releases_budgeted_items():
+    budget_queue = ByteBudgetQueue(max_bytes=100, sizeof=len)
+    results = queue.Queue()
+    metrics = Metrics()
+    pipeline = Pipeline(metrics)
+    pipeline.add_stage("source", lambda: iter([b"x" * 80, b"y" * 80]))
+    pipeline.add_stage("consume", len, input_queue=budget_queue)
+    pipeline.add_stage("sink", results.put)
+    pipeline.start(exclude=("consume",))
+
+    # Excluded stages run in a thread chosen by the caller
+    threading.Thread(target=pipeline.stage("consume").run, daemon=True).start()
+    assert [results.get(timeout=5), results.get(timeout=5)] == [80, 80]
+    # Released after the stage function returns
+    _wait_for(lambda: budget_queue.bytes_in_flight == 0)
+    pipeline.report()
+    assert metrics.snapshot()["stage.consume.queue_bytes"] == 0
+
+
+
+def test_pipeline_releases_after_later_stage():
+    budget_queue = ByteBudgetQueue(max_bytes=100, sizeof=lambda item: item["nbytes"])
+    in_flight = []
+    results = queue.Queue()
+
+    def check(item):
+        # Still held while the later stage runs
+        in_flight.append(budget_queue.bytes_in_flight)
+        return item
+
+    pipeline = Pipeline()
+    pipeline.add_stage("source", lambda: iter([{"nbytes": 60, "drop": False}, {"nbytes": 60, "drop": True}]))
+    pipeline.add_stage("prepare", lambda item: None if item["drop"] else item, input_queue=budget_queue,
+                       release_after="generate")
+    pipeline.add_stage("generate", check)
+    pipeline.add_stage("sink", results.put)
+    pipeline.start()
+    assert results.get(timeout=5) == {"nbytes": 60, "drop": False}
+    assert in_flight == [60]
+    # Dropped items are released by the dropping stage
+    _wait_for(lambda: budget_queue.bytes_in_flight == 0)
+
+
+def test_pipeline_ordered_stage():
+    results = queue.Queue()
+
+    def slow_first(item):
+        # Earlier items take longer: unordered workers would emit them last
+        time.sleep(0.01 * (10 - item))
+        return item if item != 3 else None
+
+    pipeline = Pipeline()
+    pipeline.add_stage("source", lambda: iter(range(10)))
+    pipeline.add_stage("decode", slow_first, workers=4, queue_size=4, ordered=True)
+    pipeline.add_stage("sink", results.put)
+    pipeline.start()
+    assert [results.get(timeout=5) for _ in range(9)] == [0, 1, 2, 4, 5, 6, 7, 8, 9]
@@ -0,0 +1,117 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Generic, TypeVar
+
+"""Config hot reload utilities."""
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ConfigWatcher(Generic[T]):
+    """Reloads a config when its source files (or an external version token) change.
+
+    `load` builds and validates the whole config, raising on any error. The
+    initial load happens in the constructor, so an invalid config fails at
+    startup. Afterwards, `poll` reloads the config once a watched file's
+    modification time or size, or the `version` token, has changed. A
+    config that fails to load is reported and skipped: the current one stays
+    active until the sources change again.
+
+    Thread-safe.
+
+    Args:
+        load: Function loading the config.
+        paths: Watched files.
+        version: Optional function returning an external version token
+            (e.g. a Redis key bumped to force a reload). Errors count as
+            unchanged.
+        interval: Minimum time between two checks (seconds).
+        clock: Monotonic clock (seconds).
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], T],
+        paths: list[str | Path],
+        version: Callable[[], Any] | None = None,
+        interval: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._load = load
+        self.paths = [Path(path) for path in paths]
+        self._version = version
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._signature: tuple | None = None
+        self._signature = self._current_signature()
+        self._last_check = clock()
+        self.current: T = load()
+        self.generation = 0
+        self.errors = 0
+
+    def _current_signature(self) -> tuple:
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        version = None
+        if self._version is not None:
+            try:
+                version = self._version()
+            except Exception as e:
+                logger.warning(f"Could not read the config version: {e}")
+                version = self._signature[-1] if self._signature else None
+        signature.append(version)
+        return tuple(signature)
+
+    def poll(self, force: bool = False) -> T | None:
+        """Reload the config if its sources changed.
+
+        Args:
+            force: Check even if `interval` has not elapsed.
+
+        Returns:
+            The new config if it was reloaded, None otherwise.
+        """
+        with self._lock:
+            now = self._clock()
+            if not force and now - self._last_check < self.interval:
+                return None
+            self._last_check = now
+            signature = self._current_signature()
+            if signature == self._signature:
+                return None
+            self._signature = signature
+            try:
+                config = self._load()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Invalid config, keeping generation {self.generation}: {e}")
+                return None
+            self.current = config
+            self.generation += 1
+            return config
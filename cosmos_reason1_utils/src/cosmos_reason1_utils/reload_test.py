@@ -0,0 +1,69 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from pathlib import Path
+
+import pytest
+
+from cosmos_reason1_utils.reload import ConfigWatcher
+
+
+def _write(path: Path, text: str, mtime: int):
+    path.write_text(text)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_config_watcher(tmp_path: Path):
+    path = tmp_path / "config.txt"
+    _write(path, "1", mtime=1)
+    now = [0.0]
+    version = [0]
+
+    def load():
+        value = int(path.read_text())
+        if value < 0:
+            raise ValueError("negative")
+        return value
+
+    watcher = ConfigWatcher(load, [path], version=lambda: version[0], interval=5, clock=lambda: now[0])
+    assert watcher.current == 1
+    assert watcher.poll(force=True) is None
+
+    _write(path, "2", mtime=2)
+    # Not checked before the interval
+    assert watcher.poll() is None
+    now[0] += 5
+    assert watcher.poll() == 2
+    assert (watcher.current, watcher.generation) == (2, 1)
+
+    # Invalid: the current config stays active
+    _write(path, "-1", mtime=3)
+    assert watcher.poll(force=True) is None
+    assert (watcher.current, watcher.errors) == (2, 1)
+    # ... and is not retried until the sources change again
+    assert watcher.poll(force=True) is None
+    assert watcher.errors == 1
+
+    # External version bump
+    _write(path, "3", mtime=3)
+    version[0] += 1
+    assert watcher.poll(force=True) == 3
+    assert watcher.generation == 2
+
+
+def test_config_watcher_invalid_at_startup(tmp_path: Path):
+    with pytest.raises(FileNotFoundError):
+        ConfigWatcher(lambda: (tmp_path / "missing.txt").read_text(), [tmp_path / "missing.txt"])
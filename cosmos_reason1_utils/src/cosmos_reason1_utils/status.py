@@ -0,0 +1,226 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import math
+import re
+import threading
+from typing import Any, Mapping
+
+"""Safety status parsing utilities."""
+
+SAFETY_STATUSES = ("SAFE", "WARN", "DANGER", "EXTREME")
+"""Safety status classes, from least to most severe."""
+
+_STATUS_PATTERN = re.compile(
+    r"Safety Status:\s*\[?(Safe|Warn|Danger|Extreme)", re.IGNORECASE
+)
+# Status word followed by a non-letter, i.e. no longer growing while decoding
+_COMPLETE_STATUS_PATTERN = re.compile(
+    r"Safety Status:\s*\[?(Safe|Warn|Danger|Extreme)(?=[^a-zA-Z])", re.IGNORECASE
+)
+_THINK_PATTERN = re.compile(r"<think>.*?</think>", re.DOTALL)
+_TILE_PATTERN = re.compile(r"^\W*Tile\s*(\d+)\W*?[:\-]\s*(.*)$", re.IGNORECASE | re.MULTILINE)
+
+
+def parse_safety_status(text: str) -> str:
+    """Parse 'Safety Status: [Safe/Warn/Danger/Extreme]' from text.
+
+    Returns:
+        Status in upper case (see `SAFETY_STATUSES`), or "UNKNOWN".
+    """
+    match = _STATUS_PATTERN.search(text)
+    if match:
+        return match.group(1).upper()
+    return "UNKNOWN"
+
+
+class StatusStreamParser:
+    """Detects the safety status in a partially decoded output.
+
+    Feed the cumulative output text after every decoding step. Text inside
+    `<think>` blocks is ignored, so that reasoning which mentions a status is
+    not mistaken for the answer.
+    """
+
+    def __init__(self):
+        self.status: str | None = None
+
+    def feed(self, text: str) -> str | None:
+        """Return the status once, as soon as its line is complete in `text`."""
+        if self.status is not None:
+            return None
+        text = _THINK_PATTERN.sub("", text)
+        open_think = text.find("<think>")
+        if open_think != -1:
+            text = text[:open_think]
+        match = _COMPLETE_STATUS_PATTERN.search(text)
+        if match is None:
+            return None
+        self.status = match.group(1).upper()
+        return self.status
+
+
+def safety_output_regex(categories: list[str], max_explanation_chars: int = 160) -> str:
+    """Return a regex for the two-line safety report.
+
+    ```
+    Safety Status: <Safe|Warn|Danger|Extreme>
+    Identified Hazard: <category> - <one sentence>
+    ```
+
+    Use it to constrain decoding (see vLLM structured outputs), so that the
+    output always parses and stays within a bounded number of tokens.
+
+    Args:
+        categories: Allowed hazard categories.
+        max_explanation_chars: Maximum length of the explanation sentence.
+    """
+    if not categories:
+        raise ValueError("At least one hazard category is required.")
+    statuses = "|".join(status.capitalize() for status in SAFETY_STATUSES)
+    hazards = "|".join(re.escape(category) for category in categories)
+    return (
+        f"Safety Status: ({statuses})\n"
+        f"Identified Hazard: ({hazards}) - [^\n]{{1,{max_explanation_chars}}}"
+    )
+
+
+STATUS_PROMPT_PREFIX = "Safety Status:"
+"""Assistant prefix after which the next token is the status class."""
+
+
+def status_token_ids(tokenizer: Any, prefix: str = " ") -> dict[str, int]:
+    """Return the first token id of each status word following `STATUS_PROMPT_PREFIX`.
+
+    Args:
+        tokenizer: Hugging Face tokenizer.
+        prefix: Text between the prefix and the status word.
+
+    Returns:
+        Mapping from status (see `SAFETY_STATUSES`) to token id.
+    """
+    token_ids = {}
+    for status in SAFETY_STATUSES:
+        ids = tokenizer.encode(prefix + status.capitalize(), add_special_tokens=False)
+        if not ids:
+            raise ValueError(f"Cannot tokenize status: {status}")
+        token_ids[status] = ids[0]
+    if len(set(token_ids.values())) != len(token_ids):
+        raise ValueError(f"Status tokens are ambiguous: {token_ids}")
+    return token_ids
+
+
+def status_distribution(
+    logprobs: Mapping[int, Any], token_ids: Mapping[str, int]
+) -> dict[str, float]:
+    """Return the probability of each status from next-token logprobs.
+
+    Args:
+        logprobs: Mapping from token id to logprob (a float or an object with a
+            `logprob` attribute, as returned by vLLM) of the next token.
+        token_ids: Status token ids (see `status_token_ids`).
+
+    Returns:
+        Raw probability of each status token. They are not renormalized
+        over the status tokens: mass on other tokens (e.g. " [") is
+        uncertainty, so the probabilities can sum to less than 1. Statuses
+        missing from `logprobs` get zero probability. Empty if none is present.
+    """
+    probs = {}
+    for status, token_id in token_ids.items():
+        if token_id in logprobs:
+            value = logprobs[token_id]
+            probs[status] = math.exp(getattr(value, "logprob", value))
+    if not probs:
+        return {}
+    return {status: probs.get(status, 0.0) for status in token_ids}
+
+
+def needs_escalation(
+    probs: Mapping[str, float],
+    min_confidence: float,
+    escalate_at: str | None = None,
+) -> bool:
+    """Return whether a classification must be re-done by a stronger method.
+
+    A cheap classification (e.g. a small triage model) is accepted only if it is
+    confident and, when `escalate_at` is set, rates the chunk below that status.
+
+    Args:
+        probs: Status probabilities (see `status_distribution`).
+        min_confidence: Minimum (raw) probability of the top status.
+        escalate_at: Least severe status that is always escalated.
+    """
+    if not probs:
+        return True
+    status = max(probs, key=probs.__getitem__)
+    if probs[status] < min_confidence:
+        return True
+    if escalate_at is None:
+        return False
+    return SAFETY_STATUSES.index(status) >= SAFETY_STATUSES.index(escalate_at.upper())
+
+
+class QuietCameraTracker:
+    """Tracks which cameras are quiet, i.e. their last statuses were all Safe.
+
+    Thread-safe.
+
+    Args:
+        safe_streak: Number of consecutive SAFE statuses after which a camera is quiet.
+    """
+
+    def __init__(self, safe_streak: int = 3):
+        if safe_streak < 1:
+            raise ValueError(f"safe_streak must be positive: {safe_streak}")
+        self.safe_streak = safe_streak
+        self._streaks: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def update(self, key: str, status: str):
+        """Record the latest status of camera `key` (see `parse_safety_status`)."""
+        with self._lock:
+            if status == "SAFE":
+                self._streaks[key] = self._streaks.get(key, 0) + 1
+            else:
+                self._streaks[key] = 0
+
+    def is_quiet(self, key: str) -> bool:
+        """Return whether camera `key` is quiet."""
+        with self._lock:
+            return self._streaks.get(key, 0) >= self.safe_streak
+
+
+def parse_tile_reports(text: str) -> dict[int, str]:
+    """Split a mosaic report into per-tile reports.
+
+    Expects one line per tile:
+
+    ```
+    Tile 1: Safety Status: Safe | Identified Hazard: None - Normal operation.
+    ```
+
+    Returns:
+        Mapping from tile number (1-based) to its report, with " | " turned
+        into line breaks (the single-camera report format). The first report
+        of a tile wins.
+    """
+    reports = {}
+    for match in _TILE_PATTERN.finditer(text):
+        tile = int(match.group(1))
+        if tile not in reports:
+            reports[tile] = match.group(2).strip().replace(" | ", "\n")
+    return reports
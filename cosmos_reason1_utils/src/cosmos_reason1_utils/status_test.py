@@ -0,0 +1,134 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import re
+
+import pytest
+
+from cosmos_reason1_utils.status import (
+    QuietCameraTracker,
+    StatusStreamParser,
+    needs_escalation,
+    parse_safety_status,
+    parse_tile_reports,
+    safety_output_regex,
+    status_distribution,
+    status_token_ids,
+)
+
+
+def test_parse_safety_status():
+    assert parse_safety_status("Safety Status: Danger\nIdentified Hazard: ...") == "DANGER"
+    assert parse_safety_status("safety status: [extreme]") == "EXTREME"
+    assert parse_safety_status("No status") == "UNKNOWN"
+
+
+def test_status_stream_parser():
+    parser = StatusStreamParser()
+    chunks = [
+        "<think>\nThe Safety Status: Safe",
+        " would be wrong.\n</think>\n<answer>\nSafety Status: Ext",
+        "reme",
+        "\nIdentified Hazard: Fire",
+        "/Electric - Flames.\n</answer>",
+    ]
+    text = ""
+    statuses = []
+    for chunk in chunks:
+        text += chunk
+        statuses.append(parser.feed(text))
+    assert statuses == [None, None, None, "EXTREME", None]
+    assert parser.status == "EXTREME"
+
+
+def test_safety_output_regex():
+    pattern = re.compile(safety_output_regex(["Fire/Electric", "ETC.", "None"], 20))
+    assert pattern.fullmatch(
+        "Safety Status: Extreme\nIdentified Hazard: Fire/Electric - Flames."
+    )
+    assert pattern.fullmatch("Safety Status: Safe\nIdentified Hazard: None - Normal.")
+    assert not pattern.fullmatch("Safety Status: Safe\nIdentified Hazard: ETCX - x")
+    assert not pattern.fullmatch(
+        "Safety Status: Safe\nIdentified Hazard: None - " + "x" * 21
+    )
+
+
+class _Tokenizer:
+    vocab = {" Safe": 1, " Warn": 2, " Danger": 3, " Ext": 4, "reme": 5}
+
+    def encode(self, text, add_special_tokens=True):
+        if text == " Extreme":
+            return [4, 5]
+        return [self.vocab[text]]
+
+
+def test_status_token_ids():
+    token_ids = status_token_ids(_Tokenizer())
+    assert token_ids == {"SAFE": 1, "WARN": 2, "DANGER": 3, "EXTREME": 4}
+
+
+def test_status_distribution():
+    token_ids = {"SAFE": 1, "WARN": 2, "DANGER": 3, "EXTREME": 4}
+    # Token 9 is not a status: its mass is not redistributed
+    logprobs = {1: math.log(0.6), 2: math.log(0.2), 9: math.log(0.2)}
+    probs = status_distribution(logprobs, token_ids)
+    assert probs["SAFE"] == pytest.approx(0.6)
+    assert probs["WARN"] == pytest.approx(0.2)
+    assert probs["DANGER"] == 0.0
+    # A lone status token is not confident just because it is the only one in the top-k
+    probs = status_distribution({1: math.log(0.3), 9: math.log(0.7)}, token_ids)
+    assert probs["SAFE"] == pytest.approx(0.3)
+    assert needs_escalation(probs, 0.8)
+    assert status_distribution({9: 0.0}, token_ids) == {}
+
+
+def test_needs_escalation():
+    safe = {"SAFE": 0.9, "WARN": 0.1, "DANGER": 0.0, "EXTREME": 0.0}
+    warn = {"SAFE": 0.05, "WARN": 0.95, "DANGER": 0.0, "EXTREME": 0.0}
+    unsure = {"SAFE": 0.6, "WARN": 0.4, "DANGER": 0.0, "EXTREME": 0.0}
+    assert not needs_escalation(safe, 0.8, "WARN")
+    assert needs_escalation(warn, 0.8, "WARN")
+    assert not needs_escalation(warn, 0.8, "DANGER")
+    assert needs_escalation(unsure, 0.8, "WARN")
+    assert not needs_escalation(unsure, 0.5)
+    assert needs_escalation({}, 0.0)
+
+
+def test_quiet_camera_tracker():
+    tracker = QuietCameraTracker(safe_streak=2)
+    assert not tracker.is_quiet("cam0")
+    tracker.update("cam0", "SAFE")
+    assert not tracker.is_quiet("cam0")
+    tracker.update("cam0", "SAFE")
+    assert tracker.is_quiet("cam0")
+    tracker.update("cam0", "UNKNOWN")
+    assert not tracker.is_quiet("cam0")
+    assert not tracker.is_quiet("cam1")
+
+
+def test_parse_tile_reports():
+    text = (
+        "Tile 1: Safety Status: Safe | Identified Hazard: None - Normal operation.\n"
+        "**Tile 2** - Safety Status: Danger | Identified Hazard: Collision - Hit.\n"
+        "Tile 1: Safety Status: Extreme\n"
+    )
+    reports = parse_tile_reports(text)
+    assert reports == {
+        1: "Safety Status: Safe\nIdentified Hazard: None - Normal operation.",
+        2: "Safety Status: Danger\nIdentified Hazard: Collision - Hit.",
+    }
+    assert parse_safety_status(reports[2]) == "DANGER"
+    assert parse_tile_reports("Safety Status: Safe") == {}
@@ -31,10 +31,22 @@ class PromptConfig(pydantic.BaseModel):
     system_prompt: str = Field(default="", description="System prompt")
     user_prompt: str = Field(default="", description="User prompt")
 
+    max_tokens: int | None = Field(
+        default=None, description="Per-prompt override of sampling max_tokens"
+    )
+    stop: list[str] | None = Field(
+        default=None, description="Per-prompt stop sequences"
+    )
+    hazard_categories: list[str] | None = Field(
+        default=None,
+        description="Hazard categories allowed by the structured output grammar",
+    )
+
 
 def create_conversation(
     *,
     system_prompt: str = "",
+    instruction_prompt: str = "",
     user_prompt: str = "",
     response: str = "",
     images: list[Any] | None = None,
@@ -45,7 +57,9 @@ def create_conversation(
 
     Args:
         system_prompt: System prompt.
-        user_prompt: User prompt.
+        instruction_prompt: User text placed before the media. Keep it identical
+            across requests, so that it extends the cacheable prompt prefix.
+        user_prompt: User prompt, placed after the media.
         response: Assistant response.
         images: List of images.
         videos: List of videos.
@@ -55,6 +69,8 @@ def create_conversation(
         conversation: Chat conversation.
     """
     user_content = []
+    if instruction_prompt:
+        user_content.append({"type": "text", "text": instruction_prompt})
     if images is not None:
         for image in images:
             user_content.append({"type": "image", "image": image})
@@ -93,6 +109,95 @@ def set_vision_kwargs(conversation: list[dict], vision_kwargs: dict):
                 msg |= vision_kwargs
 
 
+def _immutable(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is immutable")
+
+
+class FrozenDict(dict):
+    """Immutable dict.
+
+    A `dict` subclass, so that consumers checking `isinstance(x, dict)` (chat
+    templates, `qwen_vl_utils`) accept it.
+    """
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+class FrozenList(list):
+    """Immutable list.
+
+    A `list` subclass, so that consumers checking `isinstance(x, list)` (chat
+    templates, `qwen_vl_utils`) accept it.
+    """
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+    append = extend = insert = pop = remove = clear = sort = reverse = _immutable
+
+    def __reduce__(self):
+        return type(self), (list(self),)
+
+
+def freeze(obj: Any) -> Any:
+    """Return an immutable copy of nested dicts and lists (frozen parts are shared)."""
+    if isinstance(obj, (FrozenDict, FrozenList)):
+        return obj
+    if isinstance(obj, dict):
+        return FrozenDict({k: freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return FrozenList(freeze(v) for v in obj)
+    return obj
+
+
+class Conversation(FrozenList):
+    """Immutable chat conversation.
+
+    Build the static turns once and add per-request turns with `+`, which
+    returns a new conversation sharing the existing (frozen) turns instead of
+    copying them.
+
+    Example:
+
+    ```python
+    base = Conversation([{"role": "system", "content": "..."}])
+    conversation = base + create_conversation(user_prompt="...", videos=[video])
+    ```
+    """
+
+    def __init__(self, messages: Any = ()):
+        super().__init__(freeze(msg) for msg in messages)
+
+    def __add__(self, messages: Any) -> "Conversation":
+        return Conversation([*self, *messages])
+
+
+def with_vision_kwargs(conversation: list[dict], vision_kwargs: dict) -> Conversation:
+    """Return a conversation with vision kwargs set for all media messages.
+
+    Unlike `set_vision_kwargs`, the input conversation is not modified, and
+    messages without media are shared.
+
+    Args:
+        conversation: Conversation (see `create_conversation`).
+        vision_kwargs: Keyword arguments for vision processor (see `cosmos_reason1_utils.vision.VisionConfig`).
+    """
+
+    def is_media(item: Any) -> bool:
+        return isinstance(item, dict) and item.get("type", None) in ["image", "video"]
+
+    messages = []
+    for msg in conversation:
+        content = msg["content"]
+        if isinstance(content, list) and any(map(is_media, content)):
+            content = [item | vision_kwargs if is_media(item) else item for item in content]
+            msg = {**msg, "content": content}
+        messages.append(msg)
+    return Conversation(messages)
+
+
 def extract_tagged_text(text: str) -> tuple[dict[str, list[str]], list[str]]:
     """Extract text between <key> and </key> tags.
 
@@ -152,3 +257,108 @@ def extract_tagged_text(text: str) -> tuple[dict[str, list[str]], list[str]]:
         result[key].append(text[start:end])
         start = end + len(close_tag)
     return dict(result), remaining
+
+
+DYNAMIC_TEXT_MARKER = "<<<DYNAMIC_TEXT>>>"
+"""Placeholder for the per-request text in a `PretokenizedPrompt` conversation."""
+
+
+class PretokenizedPrompt:
+    """Chat prompt whose static parts are rendered and tokenized once.
+
+    The conversation is rendered with `DYNAMIC_TEXT_MARKER` in place of the
+    per-request text. Per request, only that text is tokenized and spliced
+    between the pre-tokenized head and tail, instead of rendering the chat
+    template and tokenizing the whole prompt again.
+
+    Splicing equals full tokenization only if no token crosses the marker
+    boundaries (e.g. they are next to special tokens); see `is_consistent`.
+
+    Args:
+        processor: Hugging Face processor or tokenizer.
+        conversation: Chat conversation containing the marker exactly once.
+    """
+
+    def __init__(self, processor: Any, conversation: list[dict]):
+        prompt = processor.apply_chat_template(
+            conversation, tokenize=False, add_generation_prompt=True
+        )
+        if prompt.count(DYNAMIC_TEXT_MARKER) != 1:
+            raise ValueError("Conversation must contain the marker exactly once.")
+        self.head, self.tail = prompt.split(DYNAMIC_TEXT_MARKER)
+        self.tokenizer = getattr(processor, "tokenizer", processor)
+        self.head_ids = self.encode_text(self.head)
+        self.tail_ids = self.encode_text(self.tail)
+
+    def encode_text(self, text: str) -> list[int]:
+        """Tokenize text without adding special tokens."""
+        return self.tokenizer.encode(text, add_special_tokens=False)
+
+    def render(self, text: str) -> str:
+        """Return the prompt text for `text`."""
+        return self.head + text + self.tail
+
+    def encode(self, text: str) -> list[int]:
+        """Return the prompt token ids for `text`."""
+        return self.head_ids + self.encode_text(text) + self.tail_ids
+
+    def is_consistent(self, text: str) -> bool:
+        """Return whether `encode` matches tokenizing the rendered prompt."""
+        return self.encode(text) == self.encode_text(self.render(text))
+
+
+def make_instruction_prompt(user_prompt: str) -> str:
+    """Return the static part of a video analysis user turn, placed before the video.
+
+    Prompt layout for prefix caching: system prompt and static instructions
+    first (identical for every request), then the video, then the per-chunk
+    text (see `make_context_prompt`). The model is told that the context is
+    historical and that it must focus on the current video.
+    """
+    return f"""[CURRENT TASK]
+Analyze the provided video clip (Current Situation).
+The Historical Context after the video is just history. Do NOT assume the hazard still exists unless you see it in the video.
+Focus ONLY on what is visible in the video stream currently.
+{user_prompt}
+"""
+
+
+def make_context_prompt(stream_id: str, start_str: str, end_str: str, context_history: str) -> str:
+    """Return the per-chunk part of a video analysis user turn, placed after the video.
+
+    Args:
+        stream_id: Camera of the chunk.
+        start_str: Start time of the chunk.
+        end_str: End time of the chunk.
+        context_history: Recent results of the camera ("" if none).
+    """
+    return f"""
+[Camera Source: {stream_id} | Time: {start_str} ~ {end_str}]
+[Historical Context (For Reference Only)]
+{context_history}
+"""
+
+
+def make_history_context(summaries: list[str]) -> str:
+    """Return the `context_history` of `make_context_prompt` for recent results, oldest first."""
+    if not summaries:
+        return ""
+    return "\n[Recent Context]\n" + "\n".join(summaries) + "\n"
+
+
+def make_video_prompt_template(
+    processor: Any, system_prompt: str, user_prompt: str
+) -> PretokenizedPrompt:
+    """Return the pre-tokenized video analysis prompt.
+
+    The per-request text (e.g. from `make_context_prompt`) goes after the video.
+    """
+    return PretokenizedPrompt(
+        processor,
+        create_conversation(
+            system_prompt=system_prompt,
+            instruction_prompt=make_instruction_prompt(user_prompt),
+            user_prompt=DYNAMIC_TEXT_MARKER,
+            videos=["video"],
+        ),
+    )
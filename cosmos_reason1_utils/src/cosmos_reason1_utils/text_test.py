@@ -13,10 +13,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
+import pickle
+
+import pytest
+
 from cosmos_reason1_utils.text import (
+    DYNAMIC_TEXT_MARKER,
+    Conversation,
+    FrozenDict,
+    PretokenizedPrompt,
     create_conversation,
     extract_tagged_text,
+    make_context_prompt,
+    make_history_context,
+    make_instruction_prompt,
+    make_video_prompt_template,
     set_vision_kwargs,
+    with_vision_kwargs,
 )
 
 
@@ -48,6 +62,55 @@ def test_create_conversation():
     ]
 
 
+def test_create_conversation_instruction_prompt():
+    conversation = create_conversation(
+        system_prompt="System.",
+        instruction_prompt="Static instructions.",
+        user_prompt="Camera 1.",
+        videos=["video1.mp4"],
+    )
+    assert conversation[1]["content"] == [
+        {"type": "text", "text": "Static instructions."},
+        {"type": "video", "video": "video1.mp4"},
+        {"type": "text", "text": "Camera 1."},
+    ]
+
+
+def test_conversation():
+    base = Conversation([{"role": "system", "content": "System."}])
+    assert isinstance(base[0], FrozenDict)
+    with pytest.raises(TypeError):
+        base.append({"role": "user", "content": "Hi"})
+    with pytest.raises(TypeError):
+        base[0]["content"] = "Changed"
+
+    user = create_conversation(user_prompt="Hi", videos=["video.mp4"])
+    conversation = base + user
+    assert isinstance(conversation, Conversation)
+    assert conversation == create_conversation(
+        system_prompt="System.", user_prompt="Hi", videos=["video.mp4"]
+    )
+    # Static turns are shared, not copied
+    assert conversation[0] is base[0]
+    assert len(base) == 1
+
+    assert pickle.loads(pickle.dumps(conversation)) == conversation
+    assert copy.deepcopy(conversation) == conversation
+
+
+def test_with_vision_kwargs():
+    conversation = Conversation(
+        create_conversation(
+            system_prompt="System.", user_prompt="Hi", videos=["video.mp4"]
+        )
+    )
+    vision_kwargs = {"fps": 2}
+    result = with_vision_kwargs(conversation, vision_kwargs)
+    assert result[1]["content"][0] == {"type": "video", "video": "video.mp4", "fps": 2}
+    assert "fps" not in conversation[1]["content"][0]
+    assert result[0] is conversation[0]
+
+
 def test_extract_tagged_text():
     text = """Intro text
 <question>
@@ -65,3 +128,65 @@ End text
         "answer": ["\nParis\n"],
     }
     assert remaining == ["Intro text\n", "\nMiddle text\n", "\nEnd text\n"]
+
+
+class _Tokenizer:
+    """Tokenizes words."""
+
+    def encode(self, text, add_special_tokens=True):
+        return [hash(word) for word in text.split()]
+
+
+class _Processor:
+    """Renders `role: text` lines."""
+
+    tokenizer = _Tokenizer()
+
+    def apply_chat_template(self, conversation, tokenize, add_generation_prompt):
+        lines = []
+        for msg in conversation:
+            content = msg["content"]
+            if isinstance(content, list):
+                content = " ".join(c.get("text", "<video>") for c in content)
+            lines.append(f"{msg['role']}: {content} <end>")
+        return " ".join(lines) + " assistant:"
+
+
+def test_pretokenized_prompt():
+    processor = _Processor()
+    prompt = PretokenizedPrompt(
+        processor,
+        create_conversation(
+            system_prompt="System.",
+            instruction_prompt="Static instructions.",
+            user_prompt=f" {DYNAMIC_TEXT_MARKER} ",
+            videos=["video.mp4"],
+        ),
+    )
+    assert prompt.render("Camera 1.") == (
+        "system: System. <end> "
+        "user: Static instructions. <video>  Camera 1.  <end> assistant:"
+    )
+    tokenizer = processor.tokenizer
+    assert prompt.encode("Camera 1.") == tokenizer.encode(prompt.render("Camera 1."))
+    assert prompt.is_consistent("Camera 1.")
+
+    with pytest.raises(ValueError):
+        PretokenizedPrompt(processor, create_conversation(user_prompt="No marker"))
+
+
+def test_make_video_prompt_template():
+    processor = _Processor()
+    prompt = make_video_prompt_template(processor, "System.", "Report the Safety Status.")
+    history = make_history_context(["Safety Status: Safe"])
+    assert history == "\n[Recent Context]\nSafety Status: Safe\n"
+    assert make_history_context([]) == ""
+    context = make_context_prompt("cam0", "2025-01-01 00:00:00", "2025-01-01 00:00:05", history)
+    conversation = create_conversation(
+        system_prompt="System.",
+        instruction_prompt=make_instruction_prompt("Report the Safety Status."),
+        user_prompt=context,
+        videos=["video"],
+    )
+    rendered = processor.apply_chat_template(conversation, tokenize=False, add_generation_prompt=True)
+    assert prompt.render(context) == rendered
@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import functools
+import math
 import os
 from pathlib import Path
 
@@ -70,6 +71,304 @@ class VisionConfig(pydantic.BaseModel):
     max_frames: int | None = Field(default=None, description="Max frames of the video")
 
 
+# Defaults used by `qwen_vl_utils.fetch_video` when a key is not set.
+_FRAME_FACTOR = 2
+_FPS = 2.0
+_FPS_MIN_FRAMES = 4
+_FPS_MAX_FRAMES = 768
+_VIDEO_MIN_TOKEN_NUM = 128
+_VIDEO_MAX_TOKEN_NUM = 768
+_MODEL_SEQ_LEN = 128000
+
+
+def _round_by_factor(number: float, factor: int) -> int:
+    return round(number / factor) * factor
+
+
+def _ceil_by_factor(number: float, factor: int) -> int:
+    return math.ceil(number / factor) * factor
+
+
+def _floor_by_factor(number: float, factor: int) -> int:
+    return math.floor(number / factor) * factor
+
+
+def _smart_resize(
+    height: int, width: int, factor: int, min_pixels: float, max_pixels: float
+) -> tuple[int, int]:
+    h_bar = max(factor, _round_by_factor(height, factor))
+    w_bar = max(factor, _round_by_factor(width, factor))
+    if h_bar * w_bar > max_pixels:
+        beta = math.sqrt((height * width) / max_pixels)
+        h_bar = max(factor, _floor_by_factor(height / beta, factor))
+        w_bar = max(factor, _floor_by_factor(width / beta, factor))
+    elif h_bar * w_bar < min_pixels:
+        beta = math.sqrt(min_pixels / (height * width))
+        h_bar = _ceil_by_factor(height * beta, factor)
+        w_bar = _ceil_by_factor(width * beta, factor)
+    return h_bar, w_bar
+
+
+def estimate_video_tokens(
+    *,
+    width: int,
+    height: int,
+    duration: float,
+    video_fps: float,
+    vision_config: VisionConfig,
+    patch_size: int = 14,
+    merge_size: int = 2,
+    temporal_patch_size: int = 2,
+) -> int:
+    """Estimate the number of visual tokens of a video without decoding it.
+
+    Mirrors the frame sampling and resizing of `qwen_vl_utils.fetch_video`, so
+    the result matches the processor output up to rounding.
+
+    Args:
+        width: Frame width of the source video.
+        height: Frame height of the source video.
+        duration: Duration of the source video (seconds).
+        video_fps: Frame rate of the source video.
+        vision_config: Vision processing config applied to the video.
+        patch_size: Spatial patch size of the vision encoder.
+        merge_size: Spatial merge size of the vision encoder.
+        temporal_patch_size: Number of frames merged into one temporal patch.
+
+    Returns:
+        Estimated number of visual tokens.
+    """
+    if width <= 0 or height <= 0 or duration <= 0 or video_fps <= 0:
+        raise ValueError(
+            f"Invalid video metadata: {width}x{height}, {duration}s @ {video_fps}fps"
+        )
+    if vision_config.video_start is not None or vision_config.video_end is not None:
+        start = vision_config.video_start or 0.0
+        end = min(vision_config.video_end or duration, duration)
+        duration = max(end - start, 1.0 / video_fps)
+    total_frames = max(1, round(duration * video_fps))
+
+    if vision_config.nframes is not None:
+        nframes = _round_by_factor(vision_config.nframes, _FRAME_FACTOR)
+    else:
+        fps = vision_config.fps or _FPS
+        min_frames = _ceil_by_factor(
+            vision_config.min_frames or _FPS_MIN_FRAMES, _FRAME_FACTOR
+        )
+        max_frames = _floor_by_factor(
+            vision_config.max_frames or min(_FPS_MAX_FRAMES, total_frames),
+            _FRAME_FACTOR,
+        )
+        nframes = total_frames / video_fps * fps
+        nframes = min(min(max(nframes, min_frames), max_frames), total_frames)
+        nframes = _floor_by_factor(nframes, _FRAME_FACTOR)
+    nframes = max(nframes, _FRAME_FACTOR)
+
+    factor = patch_size * merge_size
+    if (
+        vision_config.resized_height is not None
+        and vision_config.resized_width is not None
+    ):
+        resized_height, resized_width = _smart_resize(
+            vision_config.resized_height,
+            vision_config.resized_width,
+            factor,
+            min_pixels=0,
+            max_pixels=math.inf,
+        )
+    else:
+        min_pixels = vision_config.min_pixels or _VIDEO_MIN_TOKEN_NUM * factor**2
+        total_pixels = vision_config.total_pixels or _MODEL_SEQ_LEN * factor**2 * 0.9
+        max_pixels = max(
+            min(_VIDEO_MAX_TOKEN_NUM * factor**2, total_pixels / nframes * _FRAME_FACTOR),
+            int(min_pixels * 1.05),
+        )
+        if vision_config.max_pixels is not None:
+            max_pixels = min(vision_config.max_pixels, max_pixels)
+        resized_height, resized_width = _smart_resize(
+            height, width, factor, min_pixels=min_pixels, max_pixels=max_pixels
+        )
+
+    grid_t = math.ceil(nframes / temporal_patch_size)
+    return grid_t * (resized_height // factor) * (resized_width // factor)
+
+
+def concat_videos(
+    videos: list[tuple[torch.Tensor, dict]],
+) -> tuple[torch.Tensor, dict]:
+    """Concatenate consecutive decoded videos into one video.
+
+    Frame indices are offset by the frame counts of the preceding videos, so
+    that frame timestamps (index / fps) continue across the videos.
+
+    Args:
+        videos: (frames with shape (T, C, H, W), metadata) pairs, as returned by
+            `qwen_vl_utils.process_vision_info(..., return_video_metadata=True)`.
+            All videos must have the same frame size and fps.
+
+    Returns:
+        Frames and metadata of the concatenated video.
+    """
+    if not videos:
+        raise ValueError("No videos to concatenate.")
+    if len({tuple(frames.shape[1:]) for frames, _ in videos}) != 1:
+        raise ValueError("Videos have different frame sizes.")
+    if len({metadata["fps"] for _, metadata in videos}) != 1:
+        raise ValueError("Videos have different frame rates.")
+    frames_indices = []
+    offset = 0
+    for _, metadata in videos:
+        frames_indices.extend(int(i) + offset for i in metadata["frames_indices"])
+        offset += metadata["total_num_frames"]
+    metadata = dict(videos[0][1])
+    metadata["frames_indices"] = frames_indices
+    metadata["total_num_frames"] = offset
+    return torch.cat([frames for frames, _ in videos]), metadata
+
+
+def tile_videos(videos: list[torch.Tensor], rows: int, cols: int) -> torch.Tensor:
+    """Tile videos into a grid video (mosaic).
+
+    Videos fill the grid in row-major order, missing tiles are black. Every
+    video is resized to the frame size of the first one, and all are cut to
+    the length of the shortest.
+
+    Args:
+        videos: Frames with shape (T, C, H, W).
+        rows: Number of grid rows.
+        cols: Number of grid columns.
+
+    Returns:
+        Frames with shape (T, C, rows * H, cols * W).
+    """
+    if not videos:
+        raise ValueError("No videos to tile.")
+    if len(videos) > rows * cols:
+        raise ValueError(f"{len(videos)} videos do not fit a {rows}x{cols} grid.")
+    num_frames = min(len(video) for video in videos)
+    _, channels, height, width = videos[0].shape
+    grid = torch.zeros(
+        (num_frames, channels, rows * height, cols * width), dtype=videos[0].dtype
+    )
+    for i, video in enumerate(videos):
+        video = video[:num_frames]
+        if video.shape[2:] != (height, width):
+            video = torch.nn.functional.interpolate(
+                video.float(), size=(height, width), mode="bilinear", antialias=True
+            ).to(grid.dtype)
+        row, col = divmod(i, cols)
+        grid[:, :, row * height : (row + 1) * height, col * width : (col + 1) * width] = video
+    return grid
+
+
+_MOTION_SIZE = 32
+
+
+def frame_motion_scores(video: torch.Tensor) -> torch.Tensor:
+    """Return the change of every frame from the previous one.
+
+    The change is the mean absolute difference of the grayscale frames,
+    area-resized to 32x32. The first frame gets the score of the second.
+
+    Args:
+        video: Frames with shape (T, C, H, W).
+
+    Returns:
+        Scores with shape (T,).
+    """
+    gray = video.to(torch.float32).mean(dim=1, keepdim=True)
+    small = torch.nn.functional.adaptive_avg_pool2d(gray, _MOTION_SIZE)[:, 0]
+    diffs = (small[1:] - small[:-1]).abs().mean(dim=(1, 2))
+    if len(diffs) == 0:
+        return torch.zeros(len(video))
+    return torch.cat([diffs[:1], diffs])
+
+
+def select_frames(
+    video: torch.Tensor,
+    metadata: dict,
+    num_frames: int,
+    min_segments: int = 1,
+) -> tuple[torch.Tensor, dict]:
+    """Keep the `num_frames` most informative frames of a decoded video.
+
+    Frames are ranked by `frame_motion_scores`. For temporal coverage, the
+    video is split into `min_segments` equal segments and the top frame of
+    each is always kept; the remaining frames are the top frames overall.
+    The selected frames keep their order, and `frames_indices` of the
+    metadata is updated, so that frame timestamps (index / fps) stay correct.
+
+    Args:
+        video: Frames with shape (T, C, H, W).
+        metadata: Video metadata, as returned by
+            `qwen_vl_utils.process_vision_info(..., return_video_metadata=True)`.
+        num_frames: Number of frames to keep. Rounded down to a multiple of
+            2 (frames are merged in pairs by the model), and at least 2.
+        min_segments: Number of segments that must each keep a frame.
+
+    Returns:
+        Selected frames and their metadata.
+    """
+    num_frames = max(_FRAME_FACTOR, _floor_by_factor(num_frames, _FRAME_FACTOR))
+    if num_frames >= len(video):
+        return video, metadata
+    scores = frame_motion_scores(video)
+    min_segments = max(1, min(min_segments, num_frames))
+    bounds = torch.linspace(0, len(video), min_segments + 1).long().tolist()
+    selected = {start + int(scores[start:end].argmax()) for start, end in zip(bounds, bounds[1:])}
+    for i in scores.argsort(descending=True, stable=True).tolist():
+        if len(selected) >= num_frames:
+            break
+        selected.add(i)
+    selected = sorted(selected)
+    metadata = dict(metadata)
+    metadata["frames_indices"] = [metadata["frames_indices"][i] for i in selected]
+    return video[selected], metadata
+
+
+_PHASH_SIZE = 32
+_PHASH_LOW_FREQ = 8
+
+
+@functools.cache
+def _dct_matrix(n: int) -> torch.Tensor:
+    k = torch.arange(n, dtype=torch.float64)[:, None]
+    i = torch.arange(n, dtype=torch.float64)[None, :]
+    return torch.cos(math.pi * (2 * i + 1) * k / (2 * n))
+
+
+def video_phash(video: torch.Tensor) -> list[int]:
+    """Return the 64-bit perceptual hash (pHash) of every frame.
+
+    Frames are converted to grayscale, area-resized to 32x32 and transformed
+    with a 2D DCT. Each bit tells whether one of the 8x8 lowest-frequency
+    coefficients is above their median. Similar frames have hashes with a
+    small Hamming distance (see `phash_distance`).
+
+    Args:
+        video: Frames with shape (T, C, H, W).
+    """
+    gray = video.to(torch.float64).mean(dim=1, keepdim=True)
+    small = torch.nn.functional.adaptive_avg_pool2d(gray, _PHASH_SIZE)[:, 0]
+    dct = _dct_matrix(_PHASH_SIZE)
+    coeffs = (dct @ small @ dct.T)[:, :_PHASH_LOW_FREQ, :_PHASH_LOW_FREQ]
+    coeffs = coeffs.reshape(len(video), -1)
+    # The DC coefficient (mean brightness) is left out of the median
+    median = coeffs[:, 1:].median(dim=1, keepdim=True).values
+    bits = np.packbits((coeffs > median).numpy(), axis=1)
+    return [int.from_bytes(row.tobytes(), "big") for row in bits]
+
+
+def phash_distance(a: list[int], b: list[int]) -> float:
+    """Return the mean per-frame Hamming distance between two `video_phash` results.
+
+    Returns infinity if the frame counts differ.
+    """
+    if len(a) != len(b) or not a:
+        return math.inf
+    return sum(bin(x ^ y).count("1") for x, y in zip(a, b)) / len(a)
+
+
 def _tensor_to_pil_images(tensor: torch.Tensor) -> list[Image.Image]:
     """Convert a tensor to a list of PIL images.
 
@@ -18,7 +18,17 @@ from pathlib import Path
 import pytest
 import torch
 
-from cosmos_reason1_utils.vision import overlay_text_on_tensor, save_tensor
+from cosmos_reason1_utils.vision import (
+    VisionConfig,
+    concat_videos,
+    estimate_video_tokens,
+    overlay_text_on_tensor,
+    phash_distance,
+    save_tensor,
+    select_frames,
+    tile_videos,
+    video_phash,
+)
 
 _FRAMES = 2
 _CHANNELS = 3
@@ -52,3 +62,88 @@ def test_overlay_text_on_tensor(shape):
         assert overlayed.shape[:2] == (_FRAMES, _CHANNELS)
     assert overlayed.shape[-2] >= _WIDTH
     assert overlayed.shape[-1] >= _HEIGHT
+
+
+def test_estimate_video_tokens():
+    config = VisionConfig(fps=4, total_pixels=6422528)
+    tokens = estimate_video_tokens(
+        width=1920,
+        height=1080,
+        duration=10.0,
+        video_fps=30.0,
+        vision_config=config,
+        patch_size=16,
+    )
+    # 40 frames -> 20 temporal patches of 13x23 merged patches
+    assert tokens == 20 * 13 * 23
+    assert tokens <= config.total_pixels // 32**2
+
+    half_pixels = estimate_video_tokens(
+        width=1920,
+        height=1080,
+        duration=10.0,
+        video_fps=30.0,
+        vision_config=VisionConfig(fps=4, total_pixels=6422528 // 2),
+        patch_size=16,
+    )
+    assert half_pixels <= tokens // 2
+
+
+def test_video_phash():
+    generator = torch.Generator().manual_seed(0)
+    video = torch.rand((4, 3, 90, 160), generator=generator) * 255
+    other = torch.rand((4, 3, 90, 160), generator=generator) * 255
+    noisy = video + torch.randn(video.shape, generator=generator)
+
+    hashes = video_phash(video)
+    assert len(hashes) == 4
+    assert all(0 <= h < 2**64 for h in hashes)
+    assert phash_distance(hashes, video_phash(video)) == 0
+    assert phash_distance(hashes, video_phash(noisy)) < 8
+    assert phash_distance(hashes, video_phash(other)) > 16
+    assert phash_distance(hashes, hashes[:2]) == float("inf")
+
+
+def test_concat_videos():
+    metadata = {"fps": 30.0, "frames_indices": [0, 150, 299], "total_num_frames": 300}
+    video = torch.zeros((3, 3, 8, 8))
+    frames, merged = concat_videos([(video, metadata), (video + 1, metadata)])
+    assert frames.shape == (6, 3, 8, 8)
+    assert frames[3].max() == 1
+    assert merged == {
+        "fps": 30.0,
+        "frames_indices": [0, 150, 299, 300, 450, 599],
+        "total_num_frames": 600,
+    }
+    with pytest.raises(ValueError):
+        concat_videos([(video, metadata), (torch.zeros((3, 3, 4, 4)), metadata)])
+
+
+def test_tile_videos():
+    videos = [torch.full((4, 3, 8, 6), 1.0), torch.full((6, 3, 16, 12), 2.0)]
+    grid = tile_videos(videos, rows=2, cols=2)
+    assert grid.shape == (4, 3, 16, 12)
+    assert grid[:, :, :8, :6].eq(1).all()
+    assert grid[:, :, :8, 6:].eq(2).all()
+    # Missing tiles are black
+    assert grid[:, :, 8:].eq(0).all()
+    with pytest.raises(ValueError):
+        tile_videos(videos * 3, rows=2, cols=2)
+
+
+def test_select_frames():
+    video = torch.zeros(16, 3, 32, 32)
+    # The scene changes at frames 10 and 11
+    video[10:, :, :16] = 255
+    video[11:, :, 16:] = 255
+    metadata = {"fps": 4.0, "frames_indices": list(range(0, 64, 4)), "total_num_frames": 64}
+
+    frames, selected_metadata = select_frames(video, metadata, num_frames=5, min_segments=2)
+    # Rounded down to 4: the changed frames, the top frame of the first half and the next best
+    assert selected_metadata["frames_indices"] == [0, 4, 40, 44]
+    assert torch.equal(frames, video[[0, 1, 10, 11]])
+    assert selected_metadata["total_num_frames"] == 64
+    assert metadata["frames_indices"] == list(range(0, 64, 4))
+
+    # Nothing to drop
+    assert select_frames(video, metadata, num_frames=16)[0] is video
@@ -0,0 +1,289 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import json
+import logging
+import time
+from typing import Any, Callable
+
+"""Redis work queues.
+
+Both queues take a `redis.Redis` client (or anything with the same commands)
+and hand out JSON payloads as dicts.
+"""
+
+WORK_ID_KEY = "work_id"
+"""Payload key holding the stream entry id of a `StreamWorkQueue` item."""
+
+CLAIMED_KEY = "claimed"
+"""Payload key set on `StreamWorkQueue` items claimed from a stuck consumer."""
+
+logger = logging.getLogger(__name__)
+
+
+def is_stale(payload: dict, max_age: float, now: float | None = None) -> bool:
+    """Return whether an item started more than `max_age` seconds ago (by its "timestamp").
+
+    Claimed items (see `CLAIMED_KEY`) are never stale: they are the retries
+    of items a consumer lost, and have been idle for `claim_idle` already.
+    """
+    if payload.get(CLAIMED_KEY):
+        return False
+    now = time.time() if now is None else now
+    return now - payload.get("timestamp", now) > max_age
+
+
+def _decode(value: Any) -> Any:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class ListWorkQueue:
+    """Work queue on a Redis list: RPUSH by producers, BLPOP/LPOP by consumers.
+
+    An item is removed when it is popped, so acknowledging is a no-op.
+
+    Args:
+        client: Redis client.
+        name: List key.
+    """
+
+    def __init__(self, client: Any, name: str):
+        self.client = client
+        self.name = name
+
+    def pop(self, timeout: float = 0) -> dict | None:
+        """Pop the oldest item, waiting up to `timeout` seconds (not at all if 0)."""
+        if timeout > 0:
+            # BLPOP blocks forever on a timeout rounding to 0
+            item = self.client.blpop(self.name, timeout=max(timeout, 0.01))
+            data = item[1] if item else None
+        else:
+            data = self.client.lpop(self.name)
+        if not data:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            logger.warning(f"Dropping malformed item: {e}")
+            return None
+
+    def ack(self, client: Any, payloads: list[dict]):
+        """Acknowledge processed items (no-op)."""
+
+    def requeue(self, client: Any, payload: dict):
+        """Put an item back at the head of the queue."""
+        client.lpush(self.name, json.dumps(payload))
+
+    def load(self) -> tuple[int, float]:
+        """Return (depth, age of the oldest item in seconds)."""
+        depth = self.client.llen(self.name)
+        if depth == 0:
+            return 0, 0.0
+        oldest = self.client.lindex(self.name, 0)  # [Oldest, ..., Newest]
+        if not oldest:
+            return depth, 0.0
+        return depth, max(0.0, time.time() - json.loads(oldest).get("timestamp", time.time()))
+
+
+class StreamWorkQueue:
+    """Work queue on a Redis stream, shared by consumers of a consumer group.
+
+    Producers XADD items (payload JSON in the "payload" field). Every item is
+    delivered to one consumer and stays in the group's pending entries list
+    until that consumer acknowledges it, which it should do only once the
+    item's result is published. Items left pending for `claim_idle` seconds
+    (e.g. by a consumer that crashed) are taken over with XCLAIM. Items
+    delivered more than `max_deliveries` times are moved to the
+    `<stream>:dead` stream, so a poison item cannot loop forever.
+
+    The consumer keeps track of the items it holds (read and not yet
+    acknowledged) and never claims those back from itself, however long they
+    stay in flight. `claim_idle` must still exceed the time a healthy
+    consumer holds an item, or other consumers take it over.
+
+    Popped payloads carry their entry id under `WORK_ID_KEY`, and claimed
+    ones are marked with `CLAIMED_KEY`: they sat idle for at least
+    `claim_idle` seconds, so consumers dropping old items should exempt them
+    or they are never retried.
+
+    Args:
+        client: Redis client.
+        stream: Stream key.
+        group: Consumer group, created if missing.
+        consumer: Unique consumer name (e.g. the pod name).
+        claim_idle: Idle time after which pending items are claimed (seconds).
+        max_deliveries: Deliveries after which an item is dead-lettered.
+        claim_interval: Minimum time between two claim attempts (seconds).
+        claim_count: Maximum number of items claimed per round-trip.
+        clock: Time source (seconds).
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        stream: str,
+        group: str,
+        consumer: str,
+        claim_idle: float = 60.0,
+        max_deliveries: int = 3,
+        claim_interval: float = 5.0,
+        claim_count: int = 16,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.client = client
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.claim_idle = claim_idle
+        self.max_deliveries = max_deliveries
+        self.claim_interval = claim_interval
+        self.claim_count = claim_count
+        self.clock = clock
+        self.dead_letter_stream = f"{stream}:dead"
+        self.claimed = 0
+        self.dead_lettered = 0
+        # (entry id, fields, claimed)
+        self._buffer: collections.deque[tuple[str, dict, bool]] = collections.deque()
+        self._held: set[str] = set()
+        self._claim_cursor = "-"
+        self._last_claim: float | None = None
+        try:
+            client.xgroup_create(stream, group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def pop(self, timeout: float = 0) -> dict | None:
+        """Pop the next item, waiting up to `timeout` seconds (not at all if 0).
+
+        Stuck items of other consumers are claimed first.
+        """
+        if not self._buffer:
+            now = self.clock()
+            if self._last_claim is None or now - self._last_claim >= self.claim_interval:
+                self._last_claim = now
+                self._claim()
+        if not self._buffer:
+            # One item at a time: whatever this consumer reads is pending on it
+            # BLOCK 0 blocks forever
+            block = max(int(timeout * 1000), 10) if timeout > 0 else None
+            response = self.client.xreadgroup(self.group, self.consumer, {self.stream: ">"}, count=1, block=block)
+            for _, entries in response or []:
+                for entry_id, fields in entries:
+                    entry_id = _decode(entry_id)
+                    self._held.add(entry_id)
+                    self._buffer.append((entry_id, fields, False))
+        while self._buffer:
+            entry_id, fields, claimed = self._buffer.popleft()
+            payload = self._parse(entry_id, fields)
+            if payload is not None:
+                if claimed:
+                    payload[CLAIMED_KEY] = True
+                return payload
+        return None
+
+    def _parse(self, entry_id: str, fields: dict | None) -> dict | None:
+        fields = {_decode(k): v for k, v in (fields or {}).items()}
+        try:
+            payload = json.loads(fields["payload"])
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Dropping malformed entry {entry_id}: {e}")
+            self.client.xack(self.stream, self.group, entry_id)
+            self._held.discard(entry_id)
+            return None
+        payload[WORK_ID_KEY] = entry_id
+        return payload
+
+    def _claim(self):
+        min_idle_time = int(self.claim_idle * 1000)
+        pending = self.client.xpending_range(
+            self.stream,
+            self.group,
+            min=self._claim_cursor,
+            max="+",
+            count=self.claim_count,
+            idle=min_idle_time,
+        )
+        # Next page of the pending entries list, or back to its start once it is exhausted
+        self._claim_cursor = f"({_decode(pending[-1]['message_id'])}" if len(pending) == self.claim_count else "-"
+        times_delivered = {}
+        for info in pending:
+            entry_id = _decode(info["message_id"])
+            if _decode(info["consumer"]) == self.consumer and entry_id in self._held:
+                # Still in flight here (e.g. held by the stitcher), not stuck
+                continue
+            # Taken over by another consumer, or left by a previous run under the same name
+            self._held.discard(entry_id)
+            times_delivered[entry_id] = info["times_delivered"]
+        if not times_delivered:
+            return
+        # XCLAIM checks the idle time again: entries another consumer claimed meanwhile are skipped
+        response = self.client.xclaim(
+            self.stream, self.group, self.consumer, min_idle_time=min_idle_time, message_ids=list(times_delivered)
+        )
+        # Entries trimmed from the stream come back without fields
+        entries = [(_decode(entry_id), fields) for entry_id, fields in response if fields]
+        dead = []
+        for entry_id, fields in entries:
+            # Claiming counts as a delivery
+            if times_delivered[entry_id] + 1 > self.max_deliveries:
+                dead.append((entry_id, fields))
+            else:
+                self._held.add(entry_id)
+                self._buffer.append((entry_id, fields, True))
+        self.claimed += len(entries) - len(dead)
+        if dead:
+            logger.warning(f"Dead-lettering {len(dead)} entries delivered more than {self.max_deliveries} times")
+            pipe = self.client.pipeline(transaction=False)
+            for entry_id, fields in dead:
+                pipe.xadd(self.dead_letter_stream, {**fields, "entry_id": entry_id}, maxlen=1000, approximate=True)
+            pipe.xack(self.stream, self.group, *(entry_id for entry_id, _ in dead))
+            pipe.execute()
+            self.dead_lettered += len(dead)
+
+    def ack(self, client: Any, payloads: list[dict]):
+        """Acknowledge processed items, through `client` (a client or pipeline)."""
+        entry_ids = [payload[WORK_ID_KEY] for payload in payloads if WORK_ID_KEY in payload]
+        if entry_ids:
+            client.xack(self.stream, self.group, *entry_ids)
+            self._held.difference_update(entry_ids)
+
+    def requeue(self, client: Any, payload: dict):
+        """Add a processed item back as a new item, through `client` (a client or pipeline).
+
+        The original item still has to be acknowledged.
+        """
+        payload = {k: v for k, v in payload.items() if k not in (WORK_ID_KEY, CLAIMED_KEY)}
+        client.xadd(self.stream, {"payload": json.dumps(payload)})
+
+    def load(self) -> tuple[int, float]:
+        """Return (undelivered items, age of the oldest undelivered item in seconds)."""
+        for info in self.client.xinfo_groups(self.stream):
+            info = {_decode(k): _decode(v) for k, v in info.items()}
+            if info["name"] == self.group:
+                break
+        else:
+            return 0, 0.0
+        entries = self.client.xrange(self.stream, min=f"({info['last-delivered-id']}", max="+", count=1)
+        if not entries:
+            return 0, 0.0
+        depth = info.get("lag")
+        if depth is None:
+            # Before Redis 7: upper bound
+            depth = self.client.xlen(self.stream)
+        # Entry ids start with their creation time in milliseconds
+        created = int(_decode(entries[0][0]).split("-")[0]) / 1000
+        return depth, max(0.0, time.time() - created)
@@ -0,0 +1,212 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+
+from cosmos_reason1_utils.workqueue import CLAIMED_KEY, WORK_ID_KEY, ListWorkQueue, StreamWorkQueue, is_stale
+
+
+class _FakeRedis:
+    """In-memory subset of the Redis list and stream commands used by the work queues."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.lists = {}
+        self.streams = {}
+        self.pending = {}  # entry id -> [consumer, delivery time, times delivered]
+        self.last_delivered = "0-0"
+        self._seq = 0
+
+    def pipeline(self, transaction=True):
+        client = self
+
+        class _Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.calls.append(getattr(client, name)(*args, **kwargs))
+
+            def execute(self):
+                return self.calls
+
+        return _Pipeline()
+
+    # Lists
+    def rpush(self, name, value):
+        self.lists.setdefault(name, []).append(value)
+
+    def lpush(self, name, value):
+        self.lists.setdefault(name, []).insert(0, value)
+
+    def lpop(self, name):
+        items = self.lists.get(name)
+        return items.pop(0) if items else None
+
+    def blpop(self, name, timeout):
+        value = self.lpop(name)
+        return (name, value) if value is not None else None
+
+    def llen(self, name):
+        return len(self.lists.get(name, []))
+
+    def lindex(self, name, index):
+        return self.lists[name][index]
+
+    # Streams (single stream and group)
+    def xgroup_create(self, stream, group, id, mkstream):
+        if stream in self.streams:
+            raise Exception("BUSYGROUP Consumer Group name already exists")
+        self.streams[stream] = []
+
+    def xadd(self, stream, fields, maxlen=None, approximate=True):
+        self._seq += 1
+        entry_id = f"{int(self.now * 1000)}-{self._seq}"
+        self.streams.setdefault(stream, []).append((entry_id.encode(), {self._bytes(k): self._bytes(v) for k, v in fields.items()}))
+        return entry_id
+
+    def xreadgroup(self, group, consumer, streams, count, block):
+        ((stream, _),) = streams.items()
+        entries = [e for e in self.streams[stream] if self._key(e[0]) > self._key(self.last_delivered)][:count]
+        for entry_id, _ in entries:
+            self.last_delivered = entry_id.decode()
+            self.pending[entry_id.decode()] = [consumer, self.now, 1]
+        return [(stream.encode(), entries)] if entries else []
+
+    def xpending_range(self, stream, group, min, max, count, idle=0):
+        start = (0, 0) if min == "-" else self._key(min.lstrip("("))
+        entries = []
+        for entry_id, info in sorted(self.pending.items(), key=lambda item: self._key(item[0])):
+            key = self._key(entry_id)
+            if (key > start or (key == start and not min.startswith("("))) and (self.now - info[1]) * 1000 >= idle:
+                entries.append({"message_id": entry_id.encode(), "consumer": info[0].encode(),
+                                "time_since_delivered": int((self.now - info[1]) * 1000), "times_delivered": info[2]})
+        return entries[:count]
+
+    def xclaim(self, stream, group, consumer, min_idle_time, message_ids):
+        fields = {entry_id.decode(): fields for entry_id, fields in self.streams[stream]}
+        claimed = []
+        for entry_id in message_ids:
+            info = self.pending.get(entry_id)
+            if info and (self.now - info[1]) * 1000 >= min_idle_time:
+                self.pending[entry_id] = [consumer, self.now, info[2] + 1]
+                claimed.append((entry_id.encode(), fields[entry_id]))
+        return claimed
+
+    def xack(self, stream, group, *entry_ids):
+        for entry_id in entry_ids:
+            self.pending.pop(entry_id, None)
+
+    def xinfo_groups(self, stream):
+        undelivered = [e for e in self.streams[stream] if self._key(e[0]) > self._key(self.last_delivered)]
+        return [{"name": b"inference", "last-delivered-id": self.last_delivered.encode(), "lag": len(undelivered)}]
+
+    def xrange(self, stream, min, max, count):
+        start = self._key(min.lstrip("("))
+        return [e for e in self.streams[stream] if self._key(e[0]) > start][:count]
+
+    @staticmethod
+    def _bytes(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    @staticmethod
+    def _key(entry_id):
+        entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        return tuple(map(int, entry_id.split("-")))
+
+
+def test_list_work_queue():
+    client = _FakeRedis()
+    queue = ListWorkQueue(client, "queue")
+    assert queue.pop(timeout=1) is None
+    client.rpush("queue", json.dumps({"stream_id": "cam0", "timestamp": 1.0}))
+    client.rpush("queue", json.dumps({"stream_id": "cam1", "timestamp": 2.0}))
+    assert queue.load()[0] == 2
+    payload = queue.pop(timeout=1)
+    assert payload == {"stream_id": "cam0", "timestamp": 1.0}
+    queue.requeue(client, payload)
+    assert queue.pop() == payload
+
+
+def test_stream_work_queue():
+    client = _FakeRedis()
+    clock = [0.0]
+    replica0 = StreamWorkQueue(client, "work", "inference", "replica0", claim_idle=30, clock=lambda: clock[0])
+    replica1 = StreamWorkQueue(client, "work", "inference", "replica1", claim_idle=30, clock=lambda: clock[0])
+    assert replica0.pop(timeout=1) is None
+
+    # Entry ids carry the wall-clock creation time
+    client.now = time.time() - 5
+    client.xadd("work", {"payload": json.dumps({"stream_id": "cam0"})})
+    client.xadd("work", {"payload": json.dumps({"stream_id": "cam1", "timestamp": client.now})})
+    depth, age = replica0.load()
+    assert depth == 2 and 4 < age < 10
+    payload = replica0.pop(timeout=1)
+    assert payload["stream_id"] == "cam0"
+    assert list(client.pending) == [payload[WORK_ID_KEY]]
+    assert replica0.load()[0] == 1
+    replica0.ack(client, [payload])
+    assert not client.pending
+    fresh = replica0.pop()
+    assert fresh["stream_id"] == "cam1" and CLAIMED_KEY not in fresh
+    assert replica0.load() == (0, 0.0)
+
+    # replica0 crashes with cam1 pending: replica1 claims it once it is idle long enough
+    client.now += 10
+    clock[0] += 10
+    assert replica1.pop() is None
+    client.now += 30
+    clock[0] += 30
+    claimed = replica1.pop()
+    assert claimed["stream_id"] == "cam1" and claimed[CLAIMED_KEY]
+    assert replica1.claimed == 1
+    # Idle for longer than the stale cutoff, but claimed: processed, not dropped
+    assert is_stale({**claimed, CLAIMED_KEY: False}, max_age=30, now=client.now)
+    assert not is_stale(claimed, max_age=30, now=client.now)
+    assert client.pending[claimed[WORK_ID_KEY]][0] == "replica1"
+
+    # replica1 holds the claimed item: neither replica takes it over while it is in flight
+    client.now += 20
+    clock[0] += 20
+    assert replica1.pop() is None
+    assert client.pending[claimed[WORK_ID_KEY]][2] == 2
+
+    # Requeued items are new entries; the original is acknowledged separately
+    replica1.requeue(client, claimed)
+    replica1.ack(client, [claimed])
+    assert not client.pending
+    requeued = replica1.pop()
+    assert requeued["stream_id"] == "cam1" and CLAIMED_KEY not in requeued
+
+
+def test_stream_work_queue_dead_letter():
+    client = _FakeRedis()
+    clock = [0.0]
+    replicas = [
+        StreamWorkQueue(client, "work", "inference", f"replica{i}", claim_idle=1, max_deliveries=2,
+                        claim_interval=0, clock=lambda: clock[0])
+        for i in range(2)
+    ]
+    client.xadd("work", {"payload": json.dumps({"stream_id": "cam0"})})
+    assert replicas[0].pop() is not None  # Delivery 1
+    client.now += 2
+    assert replicas[0].pop() is None  # Held by replica0: not claimed back
+    assert replicas[1].pop() is not None  # Delivery 2
+    client.now += 2
+    assert replicas[0].pop() is None  # Delivery 3: dead-lettered
+    assert replicas[0].dead_lettered == 1
+    assert not client.pending
+    assert len(client.streams["work:dead"]) == 1
@@ -15,6 +15,11 @@ REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 RTSP_URLS = os.getenv("RTSP_URLS", "").split(",")
 QUEUE_NAME = "video_stream_queue"
+# Work queue of the inference service: "list" (RPUSH to QUEUE_NAME) or "stream" (XADD to WORK_STREAM_KEY)
+WORK_QUEUE = os.getenv("WORK_QUEUE", "list")
+WORK_STREAM_KEY = os.getenv("WORK_STREAM_KEY", "video_work_stream")
+# Approximate cap on the stream length (chunks older than that are stale anyway)
+WORK_STREAM_MAXLEN = int(os.getenv("WORK_STREAM_MAXLEN", 10000))
 BUFFER_DURATION = float(os.getenv("BUFFER_DURATION", "10"))  # seconds
 TEMP_VIDEO_DIR = "/videos/temp_video"
 
@@ -168,10 +173,19 @@ def process_stream(stream_url, redis_client, display_stream_id):
                         "stream_id": stream_id,
                         "timestamp": start_time,
                         "duration": elapsed,
-                        "video_path": final_file_path
+                        "video_path": final_file_path,
+                        # Video metadata (used by inference for visual token budgeting)
+                        "fps": fps,
+                        "width": width,
+                        "height": height,
+                        "frame_count": frame_count
                     }
                     if redis_client:
-                        redis_client.rpush(QUEUE_NAME, json.dumps(payload))
+                        if WORK_QUEUE == "stream":
+                            redis_client.xadd(WORK_STREAM_KEY, {"payload": json.dumps(payload)},
+                                              maxlen=WORK_STREAM_MAXLEN, approximate=True)
+                        else:
+                            redis_client.rpush(QUEUE_NAME, json.dumps(payload))
                         logger.info(f"Pushed {elapsed:.2f}s from {stream_id} to Redis. File: {final_filename}")
                 except Exception as e:
                     logger.error(f"Error processing chunk: {e}")
@@ -16,6 +16,7 @@ app = FastAPI()
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 ALERT_HISTORY_KEY = "Alert_History"
+INFERENCE_METRICS_KEY = "inference_metrics"
 VIDEO_DIR = "/videos"
 ACCIDENT_DIR = "/videos/accident_clips"
 
@@ -118,6 +119,17 @@ async def get_events():
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """
+    Returns the latest metrics snapshot published by the inference service.
+    """
+    try:
+        r = get_redis_client()
+        return {k: float(v) for k, v in r.hgetall(INFERENCE_METRICS_KEY).items()}
+    except Exception as e:
+        return {"error": str(e)}
+
 @app.get("/video/{filename}")
 async def get_video(filename: str):
     # ... existing code ...
@@ -0,0 +1,105 @@
+"""Benchmark the per-item CPU cost of prompt construction.
+
+Compares, for one batch:
+- full: create_conversation + apply_chat_template + tokenizing the whole prompt
+  (the tokenization vLLM does for a text prompt)
+- pretokenized: tokenizing only the per-chunk text and splicing it into the
+  pre-tokenized static prompt (PRETOKENIZE_PROMPT in main_qwen3.py)
+
+Prompts are built with the same functions as main_qwen3.py, with three recent results per camera.
+"""
+
+import argparse
+import os
+import pathlib
+import sys
+import time
+
+import yaml
+
+# Set up path to import project utils
+project_root = pathlib.Path(__file__).parents[2].resolve()
+sys.path.append(str(project_root))
+
+from cosmos_reason1_utils.script import init_script
+init_script()
+
+import transformers
+from cosmos_reason1_utils.text import (
+    PromptConfig,
+    create_conversation,
+    make_context_prompt,
+    make_history_context,
+    make_instruction_prompt,
+    make_video_prompt_template,
+)
+
+MODEL_PATH = os.getenv("MODEL_PATH", str(project_root / "models/Qwen3-VL-2B-Instruct-NVFP4"))
+PROMPTS_DIR = project_root / "prompts"
+
+
+def make_chunk_text(i):
+    """Per-chunk text of camera i, as main_qwen3.template_batch builds it."""
+    history = make_history_context([f"Safety Status: Safe\nIdentified Hazard: None - Normal operation {j}." for j in range(3)])
+    return make_context_prompt(f"cam{i}", f"2025-01-01 00:00:{i:02d}", f"2025-01-01 00:00:{i + 5:02d}", history)
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument("--batch-size", type=int, default=20, help="Items per batch")
+    args.add_argument("--repeat", type=int, default=20, help="Number of timed batches")
+    args.add_argument("--prompt-file", type=str, default="industrial_safety_short.yaml", help="Prompt config")
+    args = args.parse_args()
+
+    prompt_config = PromptConfig.model_validate(yaml.safe_load(open(PROMPTS_DIR / args.prompt_file, "rb")))
+    # As main_qwen3.load_service_config
+    system_prompts = [open(PROMPTS_DIR / "addons/english.txt").read()]
+    if prompt_config.system_prompt:
+        system_prompts.append(prompt_config.system_prompt)
+    system_prompt = "\n\n".join(map(str.rstrip, system_prompts))
+    user_prompt = prompt_config.user_prompt
+
+    processor = transformers.AutoProcessor.from_pretrained(MODEL_PATH)
+    tokenizer = processor.tokenizer
+    texts = [make_chunk_text(i) for i in range(args.batch_size)]
+
+    def full():
+        for text in texts:
+            conversation = create_conversation(
+                system_prompt=system_prompt,
+                instruction_prompt=make_instruction_prompt(user_prompt),
+                user_prompt=text,
+                videos=["video.mp4"],
+            )
+            prompt = processor.apply_chat_template(conversation, tokenize=False, add_generation_prompt=True)
+            tokenizer.encode(prompt, add_special_tokens=False)
+
+    start = time.perf_counter()
+    prompt_template = make_video_prompt_template(processor, system_prompt, user_prompt)
+    setup_time = time.perf_counter() - start
+    if not all(prompt_template.is_consistent(text) for text in texts):
+        print("WARNING: spliced token ids differ from the full tokenization")
+
+    def pretokenized():
+        for text in texts:
+            prompt_template.encode(text)
+
+    results = {}
+    for name, fn in (("full", full), ("pretokenized", pretokenized)):
+        fn()  # Warm up
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        elapsed = time.perf_counter() - start
+        results[name] = elapsed / (args.repeat * args.batch_size)
+
+    print(f"Static prefix: {len(prompt_template.head_ids)} head + {len(prompt_template.tail_ids)} tail tokens "
+          f"(one-time setup {setup_time * 1e3:.1f} ms)")
+    for name, per_item in results.items():
+        print(f"{name:>12}: {per_item * 1e6:8.1f} us/item, {per_item * args.batch_size * 1e3:7.2f} ms/batch of {args.batch_size}")
+    saved = results["full"] - results["pretokenized"]
+    print(f"{'saved':>12}: {saved * 1e6:8.1f} us/item ({saved / results['full']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,7 @@ init_script()
 import qwen_vl_utils
 import transformers
 import vllm
+from cosmos_reason1_utils.backend import load_backend
 from cosmos_reason1_utils.text import (
     PromptConfig,
     create_conversation,
@@ -42,6 +43,10 @@ CONFIG_DIR = project_root / "configs"
 PROMPTS_DIR = project_root / "prompts"
 MAX_BATCH_SIZE = 20
 
+# Model backend: "vllm", or "fake" (scripted outputs on CPU with a modelled latency, see FAKE_BACKEND_CONFIG_PATH)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "vllm")
+FAKE_BACKEND_CONFIG_PATH = os.getenv("FAKE_BACKEND_CONFIG_PATH", str(CONFIG_DIR / "fake_backend.yaml"))
+
 # Pipeline Configuration
 PREPARED_QUEUE_SIZE = 1
 
@@ -67,13 +72,14 @@ def setup_model():
     if not user_prompt:
         raise ValueError("No user prompt provided.")
     
-    print(f"Loading Model from {MODEL_PATH}...")
-    llm = vllm.LLM(
+    print(f"Loading Model from {MODEL_PATH} ({INFERENCE_BACKEND} backend)...")
+    fake_config = yaml.safe_load(open(FAKE_BACKEND_CONFIG_PATH, "rb")) if INFERENCE_BACKEND == "fake" else None
+    llm = load_backend(INFERENCE_BACKEND, dict(
         model=MODEL_PATH,
         enable_prefix_caching=True,
         limit_mm_per_prompt={"video": 1},
         gpu_memory_utilization=0.5,
-    )
+    ), fake_config=fake_config)
     
     processor = transformers.AutoProcessor.from_pretrained(MODEL_PATH)
     
@@ -9,6 +9,7 @@ import json
 import base64
 import tempfile
 import time
+import math
 import textwrap
 import redis
 import yaml
@@ -16,6 +17,10 @@ import collections
 import datetime
 import threading
 import queue
+import functools
+import asyncio
+import uuid
+import cv2
 from rich import print
 from rich.pretty import pprint
 
@@ -29,12 +34,45 @@ init_script()
 import qwen_vl_utils
 import transformers
 import vllm
+from vllm.sampling_params import RequestOutputKind
+from cosmos_reason1_utils.backend import load_backend
 from cosmos_reason1_utils.text import (
     PromptConfig,
     create_conversation,
     extract_tagged_text,
+    make_context_prompt,
+    make_history_context,
+    make_instruction_prompt,
+    make_video_prompt_template,
 )
-from cosmos_reason1_utils.vision import VisionConfig
+from cosmos_reason1_utils.vision import (
+    VisionConfig,
+    concat_videos,
+    estimate_video_tokens,
+    phash_distance,
+    select_frames,
+    tile_videos,
+    video_phash,
+)
+from cosmos_reason1_utils.cache import ResultCache
+from cosmos_reason1_utils.buffers import PinnedBufferPool
+from cosmos_reason1_utils.batching import BatchController, ByteBudgetQueue, ChunkStitcher, TokenBudget, nested_nbytes
+from cosmos_reason1_utils.degradation import DegradationConfig, DegradationLadder
+from cosmos_reason1_utils.metrics import Metrics
+from cosmos_reason1_utils.pipeline import Pipeline
+from cosmos_reason1_utils.reload import ConfigWatcher
+from cosmos_reason1_utils.status import (
+    STATUS_PROMPT_PREFIX,
+    QuietCameraTracker,
+    StatusStreamParser,
+    needs_escalation,
+    parse_safety_status,
+    parse_tile_reports,
+    safety_output_regex,
+    status_distribution,
+    status_token_ids,
+)
+from cosmos_reason1_utils.workqueue import ListWorkQueue, StreamWorkQueue, is_stale
 
 import torch
 
@@ -42,29 +80,203 @@ import torch
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 QUEUE_NAME = "video_stream_queue"
+# Chunks that started more than this many seconds ago when fetched are dropped (claimed retries excepted)
+STALE_CHUNK_AGE = 60.0
+# Input work queue:
+# - "list": QUEUE_NAME list, popped with BLPOP/LPOP (an item is lost if the replica crashes before publishing)
+# - "stream": WORK_STREAM_KEY stream shared by the replicas through the WORK_GROUP consumer group.
+#             Items are acknowledged once their result is published; items pending on a replica for
+#             WORK_CLAIM_IDLE seconds are claimed by another one (XCLAIM), and dead-lettered to
+#             "<WORK_STREAM_KEY>:dead" after WORK_MAX_DELIVERIES deliveries.
+#             WORK_CLAIM_IDLE must exceed the time an item spends in a replica (incl. QUIET_STRATEGY holding),
+#             hence the default of twice STALE_CHUNK_AGE: a replica never claims back its own items.
+#             Claimed items are processed however old they are (they are exempt from the stale drop).
+#             The capture service must use the same WORK_QUEUE.
+WORK_QUEUE = os.getenv("WORK_QUEUE", "list")
+WORK_STREAM_KEY = os.getenv("WORK_STREAM_KEY", "video_work_stream")
+WORK_GROUP = os.getenv("WORK_GROUP", "inference")
+WORK_CONSUMER = os.getenv("WORK_CONSUMER") or os.getenv("HOSTNAME") or f"inference-{uuid.uuid4().hex[:8]}"
+WORK_CLAIM_IDLE = float(os.getenv("WORK_CLAIM_IDLE", 2 * STALE_CHUNK_AGE))
+WORK_MAX_DELIVERIES = int(os.getenv("WORK_MAX_DELIVERIES", 3))
+OUTPUT_STREAM_KEY = "vlm_inference_stream"
+OUTPUT_STREAM_MAXLEN = int(os.getenv("OUTPUT_STREAM_MAXLEN", 1000))
+# Trim with "MAXLEN ~": Redis only drops whole stream nodes, which is much cheaper than exact trimming
+OUTPUT_STREAM_APPROX_TRIM = os.getenv("OUTPUT_STREAM_APPROX_TRIM", "true").lower() in ("1", "true", "yes")
 MODEL_PATH = os.getenv("MODEL_PATH", str(project_root / "models/Qwen3-VL-2B-Instruct-NVFP4"))
 # SPECULATIVE_MODEL_PATH = os.getenv("SPECULATIVE_MODEL_PATH", str(project_root / "models/Qwen3-VL-2B-Instruct-NVFP4"))
 CONFIG_DIR = project_root / "configs"
 PROMPTS_DIR = project_root / "prompts"
-MAX_BATCH_SIZE = 20
+PROMPT_FILE = os.getenv("PROMPT_FILE", "industrial_safety_short.yaml")
+# Load-adaptive vision resolution (set to "" to always use vision_config.yaml as is)
+DEGRADATION_LADDER_PATH = os.getenv("DEGRADATION_LADDER_PATH", str(CONFIG_DIR / "degradation_ladder.yaml"))
+# Batches are closed on a visual token budget (see estimate_video_tokens) or on BATCH_TIMEOUT.
+# MAX_BATCH_SIZE is only a safety ceiling on the number of sequences per batch.
+MAX_BATCH_TOKENS = int(os.getenv("MAX_BATCH_TOKENS", 131072))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 64))
 MIN_BATCH_SIZE = int(os.getenv("MIN_BATCH_SIZE", 1))
 BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", 1.0))
+# Latency-targeting batch formation: with a p95 end-to-end latency target (seconds, chunk end to publish),
+# the batch wait (up to BATCH_TIMEOUT) and minimum size are tuned from the measured latency, GPU time per
+# batch and arrival rate instead of using BATCH_TIMEOUT / MIN_BATCH_SIZE as is (exported as batch_wait /
+# min_batch_size).
+BATCH_LATENCY_TARGET = float(os.getenv("BATCH_LATENCY_TARGET", 0))
+
+# Output mode
+# - "generate": free-form decoding; only the prompt text enforces the report format
+# - "structured": decoding is constrained to the two-line
+#                 "Safety Status: ..." / "Identified Hazard: <category> - <sentence>" grammar
+# - "classify": prefill up to "Safety Status:" and score the four class tokens from the
+#               next-token logprobs (one decode step); low-confidence items fall back to "generate"
+OUTPUT_MODE = os.getenv("OUTPUT_MODE", "generate")
+CLASSIFY_MIN_CONFIDENCE = float(os.getenv("CLASSIFY_MIN_CONFIDENCE", 0.8))
+CLASSIFY_TOP_LOGPROBS = int(os.getenv("CLASSIFY_TOP_LOGPROBS", 20))
+
+# Cascade: a small triage model classifies every chunk (as in "classify" mode), and only
+# chunks rated CASCADE_ESCALATE_AT or above, or below CASCADE_MIN_CONFIDENCE, are
+# generated in full by the large escalation model. Both must share the processor family.
+CASCADE_MODE = os.getenv("CASCADE_MODE", "false").lower() in ("1", "true", "yes")
+TRIAGE_MODEL_PATH = os.getenv("TRIAGE_MODEL_PATH", MODEL_PATH)
+ESCALATION_MODEL_PATH = os.getenv("ESCALATION_MODEL_PATH", str(project_root / "models/Qwen3-VL-32B-Instruct-NVFP4"))
+TRIAGE_GPU_MEMORY_UTILIZATION = float(os.getenv("TRIAGE_GPU_MEMORY_UTILIZATION", 0.2))
+ESCALATION_GPU_MEMORY_UTILIZATION = float(os.getenv("ESCALATION_GPU_MEMORY_UTILIZATION", 0.6))
+CASCADE_ESCALATE_AT = os.getenv("CASCADE_ESCALATE_AT", "WARN").upper()
+CASCADE_MIN_CONFIDENCE = float(os.getenv("CASCADE_MIN_CONFIDENCE", 0.9))
+
+# Prompts share a byte-identical leading prefix (system prompt + instructions), per-chunk text comes last
+ENABLE_PREFIX_CACHING = os.getenv("ENABLE_PREFIX_CACHING", "true").lower() in ("1", "true", "yes")
+# Render and tokenize the static prompt once and submit token ids (only the per-chunk text is tokenized)
+PRETOKENIZE_PROMPT = os.getenv("PRETOKENIZE_PROMPT", "true").lower() in ("1", "true", "yes")
+
+# Generation mode
+# - "batch": blocking llm.generate per batch (a batch waits for its slowest sequence)
+# - "async": continuous batching on vLLM's async engine; every prepared item is submitted
+#            immediately and published the moment it finishes
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "batch")
+# Model backend:
+# - "vllm": vLLM engine
+# - "fake": scripted outputs on CPU with a modelled latency (FAKE_BACKEND_CONFIG_PATH),
+#           to measure batching, scheduling and the preparer without a GPU
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "vllm")
+FAKE_BACKEND_CONFIG_PATH = os.getenv("FAKE_BACKEND_CONFIG_PATH", str(CONFIG_DIR / "fake_backend.yaml"))
+MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", 64))
+# [Async mode] Publish an early "status" event as soon as the Safety Status line is decoded
+# (for these levels), followed by the usual "final" event with the full output.
+# Set to "" to disable streaming.
+EARLY_STATUS_LEVELS = [s.strip().upper() for s in os.getenv("EARLY_STATUS_LEVELS", "DANGER,EXTREME").split(",") if s.strip()]
+
+# Near-duplicate reuse: a chunk whose per-frame pHash is within RESULT_REUSE_MAX_DISTANCE bits (mean over frames)
+# of the camera's last analysed chunk, at most RESULT_REUSE_MAX_AGE seconds older, re-publishes that result.
+# Opt-in: a small hazard in an otherwise static view changes few low-frequency bits.
+RESULT_REUSE = os.getenv("RESULT_REUSE", "false").lower() in ("1", "true", "yes")
+RESULT_REUSE_MAX_DISTANCE = float(os.getenv("RESULT_REUSE_MAX_DISTANCE", 2.0))
+RESULT_REUSE_MAX_AGE = float(os.getenv("RESULT_REUSE_MAX_AGE", 30.0))
+RESULT_REUSE_MAX_CAMERAS = int(os.getenv("RESULT_REUSE_MAX_CAMERAS", 256))
+
+# Motion-weighted frame selection: of the frames sampled at the configured fps, keep the
+# FRAME_SELECT_RATIO most changed from their previous frame (and visual tokens in proportion).
+# The top frame of each of FRAME_SELECT_SEGMENTS equal segments is always kept for temporal coverage.
+# Timestamps follow the kept frames' original indices.
+FRAME_SELECTION = os.getenv("FRAME_SELECTION", "false").lower() in ("1", "true", "yes")
+FRAME_SELECT_RATIO = float(os.getenv("FRAME_SELECT_RATIO", 0.5))
+FRAME_SELECT_SEGMENTS = int(os.getenv("FRAME_SELECT_SEGMENTS", 4))
+
+# Quiet cameras (last QUIET_SAFE_STREAK results Safe) can be analysed more cheaply:
+# - "none": every chunk is a separate request
+# - "stitch": STITCH_CHUNKS consecutive chunks become one video at 1/STITCH_CHUNKS of the fps and
+#             total_pixels (about the visual tokens of a single chunk); the result is published for every chunk
+# - "mosaic": chunks of up to MOSAIC_ROWS x MOSAIC_COLS quiet cameras are tiled into one grid video, each tile
+#             at 1/(rows*cols) of total_pixels; the per-tile reports are published to each camera, and a tile
+#             reported as anything other than Safe is re-queued to be analysed alone at full resolution
+QUIET_STRATEGY = os.getenv("QUIET_STRATEGY", "none")
+QUIET_SAFE_STREAK = int(os.getenv("QUIET_SAFE_STREAK", 3))
+STITCH_CHUNKS = int(os.getenv("STITCH_CHUNKS", 3))
+STITCH_MAX_WAIT = float(os.getenv("STITCH_MAX_WAIT", 30.0))
+MOSAIC_ROWS = int(os.getenv("MOSAIC_ROWS", 2))
+MOSAIC_COLS = int(os.getenv("MOSAIC_COLS", 2))
+MOSAIC_MAX_WAIT = float(os.getenv("MOSAIC_MAX_WAIT", 5.0))
 
 # Pipeline Configuration
-PREPARED_QUEUE_SIZE = 1
+# Stages: fetch -> decode -> template -> generate (GPU) -> publish.
+# Each stage has its own worker count and bounded input queue (in batches).
+# Decode, template and publish emit batches in fetch order whatever their worker count, so a camera's
+# chunks are published in order (quiet camera tracking, result reuse and the logic service's history
+# and alert transitions rely on it). The trade-off: a worker done early waits for the batches fetched
+# before its own, so one slow batch (e.g. a long decode) holds back the ones behind it.
+DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", 2))
+DECODE_QUEUE_SIZE = int(os.getenv("DECODE_QUEUE_SIZE", 2))
+TEMPLATE_WORKERS = int(os.getenv("TEMPLATE_WORKERS", 1))
+TEMPLATE_QUEUE_SIZE = int(os.getenv("TEMPLATE_QUEUE_SIZE", 2))
+PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", 1))
+PUBLISH_QUEUE_SIZE = int(os.getenv("PUBLISH_QUEUE_SIZE", 4))
+# Decoded batches are bounded by the bytes held in video tensors, from the decode stage's output
+# until generate finishes with them (template queue and workers, GPU handoff, generation),
+# so prefetch depth can grow without risking host OOM.
+PREPARED_QUEUE_BYTES = int(os.getenv("PREPARED_QUEUE_BYTES", 8 * 1024**3))
+# Video tensors are copied into recycled, size-bucketed pinned buffers instead of freshly pinned
+# per request; up to PINNED_POOL_CACHED_BYTES of free buffers are kept for reuse.
+# Buffers in use count against PREPARED_QUEUE_BYTES at their bucket size, so pinned host memory
+# stays within PREPARED_QUEUE_BYTES + PINNED_POOL_CACHED_BYTES (plus the batches being decoded).
+PINNED_POOL = os.getenv("PINNED_POOL", "true").lower() in ("1", "true", "yes")
+PINNED_POOL_CACHED_BYTES = int(os.getenv("PINNED_POOL_CACHED_BYTES", 1024**3))
+PREPARED_QUEUE_SIZE = int(os.getenv("PREPARED_QUEUE_SIZE", 4))
 
-def setup_model():
+# Hot reload: the prompt file (and addon), sampling_params.yaml and vision_config.yaml are checked every
+# CONFIG_RELOAD_INTERVAL seconds (0 disables) and reloaded when one changes or when the CONFIG_VERSION_KEY
+# Redis key changes (e.g. `redis-cli INCR inference_config_version`). A new version is validated in full
+# before it is activated for the next batch; the model stays loaded.
+CONFIG_RELOAD_INTERVAL = float(os.getenv("CONFIG_RELOAD_INTERVAL", 5.0))
+CONFIG_VERSION_KEY = "inference_config_version"
+
+# Metrics (published to a Redis hash for the dashboard)
+# Per-stage utilization, queue occupancy and decoded bytes in flight (stage.template.queue_bytes)
+METRICS_KEY = "inference_metrics"
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", 10.0))
+metrics = Metrics()
+pinned_pool = PinnedBufferPool(PINNED_POOL_CACHED_BYTES, pin_memory=torch.cuda.is_available()) if PINNED_POOL else None
+batch_controller = BatchController(BATCH_LATENCY_TARGET, MAX_BATCH_SIZE, max_wait=BATCH_TIMEOUT) if BATCH_LATENCY_TARGET > 0 else None
+
+class ServiceConfig:
+    """
+    Hot-reloadable configuration: prompts, sampling params and vision kwargs.
+    Each batch carries the version it was formed with (batch["config"]).
+    """
+    def __init__(self, sampling_params, vision_kwargs, system_prompt, user_prompt, prompt_template=None):
+        self.sampling_params = sampling_params
+        self.vision_kwargs = vision_kwargs
+        self.system_prompt = system_prompt
+        self.user_prompt = user_prompt
+        self.prompt_template = prompt_template
+        self.mosaic_params = make_mosaic_sampling_params(sampling_params) if QUIET_STRATEGY == "mosaic" else None
+
+def config_paths():
+    """
+    Files the service config is loaded from.
+    """
+    return [
+        CONFIG_DIR / "vision_config.yaml",
+        CONFIG_DIR / "sampling_params.yaml",
+        PROMPTS_DIR / PROMPT_FILE,
+        PROMPTS_DIR / "addons/english.txt",
+    ]
+
+def load_service_config(processor=None):
+    """
+    Loads and validates the service config. Raises on any invalid part.
+    The pre-tokenized prompt needs the processor.
+    """
     print(f"Loading Vision Config from {CONFIG_DIR}/vision_config.yaml")
     vision_kwargs = yaml.safe_load(open(CONFIG_DIR / "vision_config.yaml", "rb"))
+    VisionConfig.model_validate(vision_kwargs)
     
     print(f"Loading Sampling Params from {CONFIG_DIR}/sampling_params.yaml")
     sampling_kwargs = yaml.safe_load(open(CONFIG_DIR / "sampling_params.yaml", "rb"))
-    sampling_params = vllm.SamplingParams(**sampling_kwargs)
     
-    print(f"Loading Prompt Config from {PROMPTS_DIR}/industrial_safety_short.yaml")
-    prompt_kwargs = yaml.safe_load(open(PROMPTS_DIR / "industrial_safety_short.yaml", "rb"))
+    print(f"Loading Prompt Config from {PROMPTS_DIR}/{PROMPT_FILE}")
+    prompt_kwargs = yaml.safe_load(open(PROMPTS_DIR / PROMPT_FILE, "rb"))
     prompt_config = PromptConfig.model_validate(prompt_kwargs)
     
+    sampling_params = make_sampling_params(sampling_kwargs, prompt_config)
+    
     # System Prompt construction
     system_prompts = [open(f"{project_root}/prompts/addons/english.txt").read()]
     if prompt_config.system_prompt:
@@ -75,119 +287,415 @@ def setup_model():
     if not user_prompt:
         raise ValueError("No user prompt provided.")
     
-    print(f"Loading Model from {MODEL_PATH}...")
+    prompt_template = None
+    if PRETOKENIZE_PROMPT and processor is not None:
+        prompt_template = make_prompt_template(processor, system_prompt, user_prompt)
+    return ServiceConfig(sampling_params, vision_kwargs, system_prompt, user_prompt, prompt_template)
+
+def setup_model():
+    if DEGRADATION_LADDER_PATH:
+        print(f"Loading Degradation Ladder from {DEGRADATION_LADDER_PATH}")
+        degradation_config = DegradationConfig.model_validate(yaml.safe_load(open(DEGRADATION_LADDER_PATH, "rb")))
+    else:
+        degradation_config = DegradationConfig()
+    
+    # Fail fast on an invalid config, before loading the model
+    load_service_config()
+    
+    # Use generic AutoProcessor for Qwen3 compatibility
+    processor = transformers.AutoProcessor.from_pretrained(TRIAGE_MODEL_PATH if CASCADE_MODE else MODEL_PATH)
+    
+    if CASCADE_MODE:
+        llm = load_model(TRIAGE_MODEL_PATH, TRIAGE_GPU_MEMORY_UTILIZATION, processor)
+        escalation_llm = load_model(ESCALATION_MODEL_PATH, ESCALATION_GPU_MEMORY_UTILIZATION, processor)
+    else:
+        llm = load_model(MODEL_PATH, float(os.getenv("GPU_MEMORY_UTILIZATION", 0.6)), processor)
+        escalation_llm = None
+    
+    return llm, escalation_llm, processor, degradation_config
+
+def load_model(model_path, gpu_memory_utilization, processor):
+    """
+    Loads the model backend (INFERENCE_BACKEND).
+    The fake backend answers classification requests with the status of its scripted outputs.
+    """
+    print(f"Loading Model from {model_path} ({INFERENCE_MODE} mode, {INFERENCE_BACKEND} backend)...")
+    engine_kwargs = dict(
+        model=model_path,
+        limit_mm_per_prompt={"video": 1},
+        enable_prefix_caching=ENABLE_PREFIX_CACHING,
+        gpu_memory_utilization=gpu_memory_utilization,
+        trust_remote_code=True,
+        max_model_len=int(os.getenv("MAX_MODEL_LEN", 262144)),
+    )
+    fake_config = status_ids = None
+    if INFERENCE_BACKEND == "fake":
+        fake_config = yaml.safe_load(open(FAKE_BACKEND_CONFIG_PATH, "rb"))
+        status_ids = status_token_ids(processor.tokenizer)
     try:
-        llm = vllm.LLM(
-            model=MODEL_PATH,
-            limit_mm_per_prompt={"video": 1},
-            enable_prefix_caching=False,
-            gpu_memory_utilization=float(os.getenv("GPU_MEMORY_UTILIZATION", 0.6)),
-            trust_remote_code=True,
-            max_model_len=int(os.getenv("MAX_MODEL_LEN", 262144)),
-        )
+        return load_backend(INFERENCE_BACKEND, engine_kwargs, fake_config=fake_config, status_ids=status_ids,
+                            async_engine=INFERENCE_MODE == "async")
     except Exception as e:
         print(f"Error loading model: {e}")
         raise
+
+def make_sampling_params(sampling_kwargs, prompt_config):
+    """
+    Builds the sampling params, applying the per-prompt decode budget
+    and (in structured mode) the output grammar.
+    """
+    sampling_kwargs = dict(sampling_kwargs)
+    if prompt_config.max_tokens is not None:
+        sampling_kwargs["max_tokens"] = prompt_config.max_tokens
+    if prompt_config.stop is not None:
+        sampling_kwargs["stop"] = prompt_config.stop
     
-    # Use generic AutoProcessor for Qwen3 compatibility
-    processor = transformers.AutoProcessor.from_pretrained(MODEL_PATH)
+    if OUTPUT_MODE != "structured":
+        return vllm.SamplingParams(**sampling_kwargs)
     
-    return llm, processor, sampling_params, vision_kwargs, system_prompt, user_prompt
+    if not prompt_config.hazard_categories:
+        raise ValueError(f"OUTPUT_MODE=structured requires hazard_categories in {PROMPT_FILE}.")
+    regex = safety_output_regex(prompt_config.hazard_categories)
+    print(f"Structured output grammar: {regex}")
+    try:
+        from vllm.sampling_params import StructuredOutputsParams
+        return vllm.SamplingParams(**sampling_kwargs, structured_outputs=StructuredOutputsParams(regex=regex))
+    except ImportError:
+        # Older vLLM releases
+        from vllm.sampling_params import GuidedDecodingParams
+        return vllm.SamplingParams(**sampling_kwargs, guided_decoding=GuidedDecodingParams(regex=regex))
 
-def pin_memory_recursive(obj):
+def pin_memory_recursive(obj, pooled):
     """
     Recursively pin tensors in memory.
     This enables faster Host-to-Device transfer (or Zero-Copy on Unified Memory).
+    With the pinned buffer pool, tensors are copied into pooled buffers, collected in pooled
+    until they are released (see release_pooled).
     """
     if torch.is_tensor(obj):
         if obj.device.type == 'cpu' and not obj.is_pinned():
+            if pinned_pool is not None:
+                obj = pinned_pool.copy(obj)
+                pooled.append(obj)
+                return obj
             return obj.pin_memory()
         return obj
     elif isinstance(obj, dict):
-        return {k: pin_memory_recursive(v) for k, v in obj.items()}
+        return {k: pin_memory_recursive(v, pooled) for k, v in obj.items()}
     elif isinstance(obj, list):
-        return [pin_memory_recursive(v) for v in obj]
+        return [pin_memory_recursive(v, pooled) for v in obj]
     elif isinstance(obj, tuple):
-        return tuple(pin_memory_recursive(v) for v in obj)
+        return tuple(pin_memory_recursive(v, pooled) for v in obj)
     else:
         return obj
 
-def batch_preparer_worker(redis_client, processor, vision_kwargs, system_prompt, user_prompt, output_queue):
+def decoded_nbytes(batch):
     """
-    Producer thread:
-    1. Fetches data from Redis.
-    2. Decodes video and prepares model inputs (CPU intensive).
-    3. Puts ready batches into output_queue.
+    Returns the bytes held by a decoded batch, for the byte budget.
+    Pooled tensors count their whole pinned buffer (rounded up to its bucket), not just their own bytes.
     """
-    print("Batch Preparer Thread Started.")
+    pooled = batch.get("pooled") or []
+    return nested_nbytes(batch) + sum(pinned_pool.buffer_nbytes(tensor) - tensor.nbytes for tensor in pooled)
+
+def release_pooled(batch):
+    """
+    Returns the pooled buffers of a batch to the pinned buffer pool.
+    """
+    for tensor in batch.pop("pooled", None) or []:
+        pinned_pool.release(tensor)
+
+def get_video_metadata(payload):
+    """
+    Returns (width, height, duration, fps) of a chunk.
+    Uses the metadata published by the capture service, probing the file header as a fallback.
+    """
+    width = payload.get("width")
+    height = payload.get("height")
+    fps = payload.get("fps")
+    frame_count = payload.get("frame_count")
     
-    # Helper for hashing dicts (vLLM workaround)
-    class HashableDict(dict):
-        def __hash__(self):
-            return hash(tuple(sorted(self.items())))
+    if not (width and height and fps and frame_count):
+        cap = cv2.VideoCapture(payload["video_path"])
+        try:
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        finally:
+            cap.release()
     
-    def make_hashable(obj):
-        if isinstance(obj, dict):
-            return HashableDict({k: make_hashable(v) for k, v in obj.items()})
-        elif isinstance(obj, list):
-            return tuple(make_hashable(i) for i in obj)
-        return obj
+    if fps and frame_count:
+        duration = frame_count / fps
+    else:
+        duration = payload.get("duration", 0)
+    return width, height, duration, fps
+
+def stitch_payloads(chunks):
+    """
+    Merges consecutive chunk payloads of one camera into a single item payload
+    spanning all of them. A single chunk is returned as is.
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    first, last = chunks[0], chunks[-1]
+    return {
+        "stream_id": first.get("stream_id"),
+        "video_path": first.get("video_path"),
+        "timestamp": first["timestamp"],
+        "duration": last["timestamp"] + last.get("duration", 0) - first["timestamp"],
+        "chunks": chunks,
+    }
+
+def stitch_vision_kwargs(vision_kwargs, num_chunks):
+    """
+    Vision kwargs for each of num_chunks stitched chunks:
+    the stitched video costs about as many visual tokens as a single chunk.
+    """
+    vision_kwargs = dict(vision_kwargs)
+    if vision_kwargs.get("fps"):
+        vision_kwargs["fps"] = vision_kwargs["fps"] / num_chunks
+    if vision_kwargs.get("total_pixels"):
+        vision_kwargs["total_pixels"] = vision_kwargs["total_pixels"] // num_chunks
+    if vision_kwargs.get("max_frames"):
+        vision_kwargs["max_frames"] = max(2, vision_kwargs["max_frames"] // num_chunks)
+    return vision_kwargs
+
+def mosaic_payloads(tiles):
+    """
+    Merges chunk payloads of several cameras into a single mosaic item payload.
+    """
+    return {
+        "stream_id": "mosaic",
+        "video_path": tiles[0].get("video_path"),
+        "timestamp": min(tile["timestamp"] for tile in tiles),
+        "duration": max(tile.get("duration", 0) for tile in tiles),
+        "tiles": tiles,
+    }
+
+def mosaic_vision_kwargs(vision_kwargs):
+    """
+    Vision kwargs for each tile of a mosaic:
+    the grid video costs about as many visual tokens as a single chunk.
+    """
+    vision_kwargs = dict(vision_kwargs)
+    if vision_kwargs.get("total_pixels"):
+        vision_kwargs["total_pixels"] = vision_kwargs["total_pixels"] // (MOSAIC_ROWS * MOSAIC_COLS)
+    return vision_kwargs
+
+def estimate_item_tokens(payload, vision_config, image_patch_size):
+    """
+    Estimates the visual token count of a queued chunk from its metadata.
+    Falls back to the worst case allowed by total_pixels if the metadata is unusable.
+    """
+    if "chunks" in payload:
+        # Stitched chunks: every chunk at the reduced fps / total_pixels
+        chunk_config = VisionConfig.model_validate(
+            stitch_vision_kwargs(vision_config.model_dump(exclude_none=True), len(payload["chunks"])))
+        return sum(estimate_item_tokens(chunk, chunk_config, image_patch_size) for chunk in payload["chunks"])
+    if "tiles" in payload:
+        # Mosaic: every cell at the size of the largest tile (tiles are resized to the first one)
+        tile_config = VisionConfig.model_validate(mosaic_vision_kwargs(vision_config.model_dump(exclude_none=True)))
+        tile_tokens = max(estimate_item_tokens(tile, tile_config, image_patch_size) for tile in payload["tiles"])
+        return tile_tokens * MOSAIC_ROWS * MOSAIC_COLS
+    try:
+        width, height, duration, fps = get_video_metadata(payload)
+        tokens = estimate_video_tokens(
+            width=width,
+            height=height,
+            duration=duration,
+            video_fps=fps,
+            vision_config=vision_config,
+            patch_size=image_patch_size,
+        )
+        if FRAME_SELECTION:
+            tokens = math.ceil(tokens * FRAME_SELECT_RATIO)
+        return tokens
+    except Exception as e:
+        print(f"[Preparer] Could not estimate tokens for {payload.get('video_path')}: {e}")
+        if vision_config.total_pixels:
+            return vision_config.total_pixels // (image_patch_size * 2) ** 2
+        return MAX_BATCH_TOKENS
+
+def make_work_queue(redis_client):
+    """
+    Creates the input work queue (WORK_QUEUE).
+    """
+    if WORK_QUEUE == "stream":
+        print(f"Consuming {WORK_STREAM_KEY} as {WORK_CONSUMER} of consumer group {WORK_GROUP}")
+        return StreamWorkQueue(redis_client, WORK_STREAM_KEY, WORK_GROUP, WORK_CONSUMER,
+                               claim_idle=WORK_CLAIM_IDLE, max_deliveries=WORK_MAX_DELIVERIES)
+    return ListWorkQueue(redis_client, QUEUE_NAME)
+
+def payload_parts(payload):
+    """
+    Returns the queue items an item payload is made of (stitched chunks, mosaic tiles or itself).
+    """
+    return payload.get("chunks") or payload.get("tiles") or [payload]
+
+def metrics_reporter_worker(redis_client, pipeline, work_queue=None):
+    """
+    Periodically publishes a snapshot of the service metrics to Redis.
+    """
+    while True:
+        time.sleep(METRICS_INTERVAL)
+        try:
+            pipeline.report()
+            if pinned_pool is not None:
+                metrics.set("pinned_pool_hit_rate", pinned_pool.hit_rate)
+                metrics.set("pinned_bytes", pinned_pool.pinned_bytes)
+                metrics.set("pinned_peak_bytes", pinned_pool.peak_pinned_bytes)
+                metrics.set("pinned_in_use_bytes", pinned_pool.in_use_bytes)
+            if isinstance(work_queue, StreamWorkQueue):
+                metrics.set("work_claimed", work_queue.claimed)
+                metrics.set("work_dead_lettered", work_queue.dead_lettered)
+            snapshot = metrics.snapshot()
+            snapshot["updated_at"] = time.time()
+            redis_client.hset(METRICS_KEY, mapping=snapshot)
+        except Exception as e:
+            print(f"Error publishing metrics: {e}")
+
+# Helper for hashing dicts (vLLM workaround)
+class HashableDict(dict):
+    def __hash__(self):
+        return hash(tuple(sorted(self.items())))
+
+def make_hashable(obj):
+    if isinstance(obj, dict):
+        return HashableDict({k: make_hashable(v) for k, v in obj.items()})
+    elif isinstance(obj, list):
+        return tuple(make_hashable(i) for i in obj)
+    return obj
+
+# -----------------------------------------------------------------------------
+# Pipeline stages: fetch -> decode -> template -> generate -> publish
+#
+# A batch is a dict flowing through all stages:
+#   {"items": [{"payload": ..., ...}], "config": ServiceConfig, "vision_level": str, "vision_kwargs": dict,
+#    "tokens": int}
+# Each stage adds its results to the items.
+# -----------------------------------------------------------------------------
+
+def fetch_batches(work_queue, processor, config_watcher, degradation_config, quiet_tracker=None):
+    """
+    Fetch stage (source):
+    Pops chunks from the work queue and groups them into batches on a visual token budget.
+    Dropped chunks are acknowledged here, all others by the publish stage.
+    Chunks of quiet cameras are held and stitched (QUIET_STRATEGY=stitch)
+    or tiled into mosaics (QUIET_STRATEGY=mosaic).
+    Config reloads take effect here, between batches: every batch carries its config version.
+    """
+    print("Fetch Stage Started.")
+    
+    # Qwen3 specific handling
+    image_patch_size = processor.image_processor.patch_size if hasattr(processor, "image_processor") else 14
+    ladder = DegradationLadder(degradation_config)
+    vision_level = ladder.level
+    
+    # Item popped from Redis that did not fit into the previous batch: (payload, tokens)
+    carry_over = None
+    
+    # [Quiet cameras] Chunks held per camera (stitch) or in a single group (mosaic),
+    # and merged payloads ready to be batched
+    if QUIET_STRATEGY == "stitch":
+        stitcher = ChunkStitcher(STITCH_CHUNKS, STITCH_MAX_WAIT)
+        merge_payloads = stitch_payloads
+    elif QUIET_STRATEGY == "mosaic":
+        stitcher = ChunkStitcher(MOSAIC_ROWS * MOSAIC_COLS, MOSAIC_MAX_WAIT)
+        merge_payloads = mosaic_payloads
+    else:
+        stitcher = None
+    ready = collections.deque()
 
     while True:
         # Prepare batch of valid items
         batch_data = []
+        budget = TokenBudget(MAX_BATCH_TOKENS, max_items=MAX_BATCH_SIZE)
         start_wait_time = None
         
-        # [OPTIMIZATION] Backlog Clearing (Freshness First)
-        # If queue is too long, we drop old items to process only the latest.
+        if carry_over is not None:
+            payload, item_tokens = carry_over
+            carry_over = None
+            batch_data.append(payload)
+            budget.add(item_tokens)
+            start_wait_time = time.time()
+        
+        # [OPTIMIZATION] Load-adaptive resolution
+        # Under backlog we step down the degradation ladder (fewer pixels / frames per item)
+        # instead of trimming the queue, and step back up once it drains.
         try:
-            q_len = redis_client.llen(QUEUE_NAME)
-            if q_len > MAX_BATCH_SIZE * 2:
-                # Keep only the last MAX_BATCH_SIZE items (Newest)
-                # Redis List: [Oldest, ..., Newest]
-                # LTRIM key -N -1 keeps the tail.
-                redis_client.ltrim(QUEUE_NAME, -MAX_BATCH_SIZE, -1)
-                print(f"[Preparer] Queue backlog ({q_len}) detected. Trimmed to latest {MAX_BATCH_SIZE}.")
+            q_len, q_age = work_queue.load()
+            new_level = ladder.update(q_len, q_age)
+            if new_level is not vision_level:
+                print(f"[Fetch] Queue load (depth={q_len}, age={q_age:.1f}s): vision level {vision_level.name} -> {new_level.name}")
+                vision_level = new_level
         except Exception as e:
-            print(f"Error checking/trimming queue: {e}")
+            print(f"Error checking queue load: {e}")
+        if config_watcher.poll() is not None:
+            print(f"[Fetch] Config reloaded (generation {config_watcher.generation})")
+            metrics.set("config_generation", config_watcher.generation)
+        config = config_watcher.current
+        vision_kwargs = vision_level.apply(config.vision_kwargs)
+        vision_config = VisionConfig.model_validate(vision_kwargs)
+        
+        if batch_controller is not None:
+            batch_wait, min_batch_size = batch_controller.update()
+            metrics.set("batch_wait", batch_wait)
+            metrics.set("min_batch_size", min_batch_size)
+        else:
+            batch_wait, min_batch_size = BATCH_TIMEOUT, MIN_BATCH_SIZE
 
-        # 1. Fetch Loop
-        while len(batch_data) < MAX_BATCH_SIZE:
+        # 1. Fetch Loop (until the token budget is used up or the batch timeout expires)
+        while not budget.full:
+            if stitcher is not None:
+                ready.extend(merge_payloads(group) for group in stitcher.expired())
+            if ready:
+                payload = ready[0]
+                item_tokens = estimate_item_tokens(payload, vision_config, image_patch_size)
+                if not budget.fits(item_tokens):
+                    break
+                ready.popleft()
+                batch_data.append(payload)
+                budget.add(item_tokens)
+                if "chunks" in payload:
+                    metrics.incr("stitched_requests")
+                    metrics.incr("stitched_chunks", len(payload["chunks"]))
+                if "tiles" in payload:
+                    metrics.incr("mosaic_requests")
+                    metrics.incr("mosaic_tiles", len(payload["tiles"]))
+                if start_wait_time is None:
+                    start_wait_time = time.time()
+                continue
+            
             if len(batch_data) == 0:
                 # Blocking pop for first item to avoid busy wait
-                item = redis_client.blpop(QUEUE_NAME, timeout=1) 
-                if not item:
+                payload = work_queue.pop(timeout=1)
+                if not payload:
                     continue # Try again
-                data_json = item[1]
                 start_wait_time = time.time() # Start timeout timer after first item
             else:
-                # Non-blocking pop for subsequent items
-                data_json = redis_client.lpop(QUEUE_NAME)
+                # Subsequent items: wait until the batch deadline while the batch is too small,
+                # then only take what is already queued
+                remaining = 0
+                if len(batch_data) < min_batch_size:
+                    remaining = start_wait_time + batch_wait - time.time()
+                payload = work_queue.pop(timeout=remaining) if remaining > 0 else work_queue.pop()
                 
-                if not data_json:
-                    # Check if we should wait more or break
-                    if len(batch_data) < MIN_BATCH_SIZE:
-                        # Check timeout
-                        if time.time() - start_wait_time > BATCH_TIMEOUT:
-                            break
-                        time.sleep(0.01) # Short sleep to avoid busy wait
-                        continue
-                    else:
-                        break
+                if not payload:
+                    break
+            if batch_controller is not None:
+                batch_controller.record_arrivals()
             
             # 2. Validation & Filtering Loop
             try:
-                payload = json.loads(data_json)
                 stream_id = payload.get("stream_id")
                 video_path = payload.get("video_path")
-                timestamp = payload.get("timestamp")
                 
                 # Check latency
-                current_time = time.time()
-                latency = current_time - timestamp
-                
-                if latency > 60.0:
+                # Mosaic tiles re-queued for a full-resolution re-run, and items claimed from a stuck replica,
+                # are never dropped
+                if is_stale(payload, STALE_CHUNK_AGE) and not payload.get("mosaic_exempt"):
                     # Drop stale message
+                    work_queue.ack(work_queue.client, [payload])
                     if video_path and os.path.exists(video_path):
                         try:
                             os.remove(video_path)
@@ -197,9 +705,36 @@ def batch_preparer_worker(redis_client, processor, vision_kwargs, system_prompt,
                 
                 if not video_path or not os.path.exists(video_path):
                     print(f"Video file missing for {stream_id}: {video_path}")
+                    work_queue.ack(work_queue.client, [payload])
                     continue
+                
+                if QUIET_STRATEGY == "mosaic":
+                    if quiet_tracker.is_quiet(stream_id) and not payload.get("mosaic_exempt"):
+                        group = stitcher.add("mosaic", payload)
+                        if group is not None:
+                            ready.append(mosaic_payloads(group))
+                        continue
+                elif stitcher is not None:
+                    if quiet_tracker.is_quiet(stream_id):
+                        group = stitcher.add(stream_id, payload)
+                        if group is not None:
+                            ready.append(stitch_payloads(group))
+                        continue
+                    # No longer quiet: held chunks go first, in order
+                    held = stitcher.release(stream_id)
+                    if held:
+                        ready.append(stitch_payloads(held))
+                        ready.append(payload)
+                        continue
+                
+                item_tokens = estimate_item_tokens(payload, vision_config, image_patch_size)
+                if not budget.fits(item_tokens):
+                    # Close the batch; this item opens the next one
+                    carry_over = (payload, item_tokens)
+                    break
                     
                 batch_data.append(payload)
+                budget.add(item_tokens)
                 
             except Exception as e:
                 print(f"Error parsing item: {e}")
@@ -208,125 +743,638 @@ def batch_preparer_worker(redis_client, processor, vision_kwargs, system_prompt,
         if not batch_data:
             continue
             
-        print(f"[Preparer] Prepared batch of {len(batch_data)} videos. Processing inputs...")
-        batch_process_start = time.time()
-        
-        # 3. Processing Loop (Heavy CPU/IO)
-        llm_inputs_batch = []
-        original_payloads = []
-        temp_files = []
-        
+        print(f"[Fetch] Batch of {len(batch_data)} videos (~{budget.tokens} visual tokens, "
+              f"wait {batch_wait:.2f}s / min size {min_batch_size}).")
+        metrics.observe("batch_tokens", budget.tokens)
+        yield {
+            "items": [{"payload": payload} for payload in batch_data],
+            "config": config,
+            "vision_level": vision_level.name,
+            "vision_kwargs": vision_kwargs,
+            "tokens": budget.tokens,
+        }
+
+def decode_batch(batch, processor, result_cache=None, publish_queue=None):
+    """
+    Decode stage (CPU/IO heavy, parallel workers):
+    Decodes and preprocesses the video of every item.
+    With a result cache, near-duplicates of the camera's last analysed chunk
+    skip the model and go straight to the publish stage.
+    With FRAME_SELECTION, only the most changed frames of each video are kept.
+    """
+    # Qwen3 specific handling
+    image_patch_size = processor.image_processor.patch_size if hasattr(processor, "image_processor") else 14
+    
+    items = []
+    reused = []
+    for item in batch["items"]:
+        video_path = item["payload"].get("video_path")
+        chunks = item["payload"].get("chunks")
+        tiles = item["payload"].get("tiles")
         try:
-            for payload in batch_data:
-                try:
-                    stream_id = payload.get("stream_id")
-                    video_path = payload.get("video_path")
-                    timestamp = payload.get("timestamp")
-                    duration = payload.get("duration", 0)
-                    
-                    # Calculate time range
-                    start_dt = datetime.datetime.fromtimestamp(timestamp)
-                    end_dt = datetime.datetime.fromtimestamp(timestamp + duration)
-                    start_str = start_dt.strftime('%Y-%m-%d %H:%M:%S')
-                    end_str = end_dt.strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    # Store file path for passthrough (Deletion handled by Capture Service now)
-                    temp_files.append(video_path)
-                    
-                    # ---------------------------------------------------------
-                    # [NEW] Context Injection from Redis
-                    # ---------------------------------------------------------
-                    context_history = ""
-                    try:
-                        # Fetch last 3 summaries from Channel_History
-                        # Key: channel_history:{stream_id}
-                        history_key = f"channel_history:{stream_id}"
-                        recent_logs = redis_client.lrange(history_key, 0, 2)
-                        if recent_logs:
-                            context_lines = []
-                            for log_bytes in reversed(recent_logs): # Oldest first
-                                if isinstance(log_bytes, bytes):
-                                    log_str = log_bytes.decode('utf-8')
-                                    context_lines.append(log_str)
-                            
-                            if context_lines:
-                                context_history = "\n[Recent Context]\n" + "\n".join(context_lines) + "\n"
-                    except Exception as e:
-                        print(f"Failed to fetch context: {e}")
-                    
-                    # Inject Context into User Prompt (Clarified)
-                    # We explicitly tell the model that context is historical and it must focus on the CURRENT video.
-                    current_user_prompt = f"""
-[Historical Context (For Reference Only)]
-{context_history}
---------------------------------------------------
-[CURRENT TASK]
-Analyze the provided video clip (Current Situation).
-The Context above is just history. Do NOT assume the hazard still exists unless you see it in the video.
-Focus ONLY on what is visible in the video stream currently.
-[Camera Source: {stream_id} | Time: {start_str} ~ {end_str}]
-{user_prompt}
+            if chunks:
+                # [Stitching] Every chunk at the reduced fps / total_pixels, then one video spanning all of them
+                vision_kwargs = stitch_vision_kwargs(batch["vision_kwargs"], len(chunks))
+                videos = [chunk["video_path"] for chunk in chunks]
+            elif tiles:
+                # [Mosaic] Every tile at the reduced total_pixels, then one grid video
+                vision_kwargs = mosaic_vision_kwargs(batch["vision_kwargs"])
+                videos = [tile["video_path"] for tile in tiles]
+            else:
+                vision_kwargs = batch["vision_kwargs"]
+                videos = [video_path]
+            video_conversation = create_conversation(videos=videos, vision_kwargs=vision_kwargs)
+            image_inputs, video_inputs, video_kwargs = qwen_vl_utils.process_vision_info(
+                video_conversation, 
+                return_video_kwargs=True, 
+                return_video_metadata=True,
+                image_patch_size=image_patch_size
+            )
+            if chunks:
+                video_inputs = [concat_videos(video_inputs)]
+            elif tiles:
+                frames = tile_videos([frames for frames, _ in video_inputs], MOSAIC_ROWS, MOSAIC_COLS)
+                metadata = dict(video_inputs[0][1])
+                metadata["frames_indices"] = list(metadata["frames_indices"])[:len(frames)]
+                video_inputs = [(frames, metadata)]
+            if (chunks or tiles) and isinstance(video_kwargs.get("fps"), list):
+                video_kwargs["fps"] = video_kwargs["fps"][:1]
+            
+            if result_cache is not None and video_inputs and not (chunks or tiles):
+                video = video_inputs[0][0] if isinstance(video_inputs[0], tuple) else video_inputs[0]
+                signature = video_phash(video)
+                stream_id = item["payload"].get("stream_id")
+                entry = result_cache.lookup(stream_id, signature, item["payload"].get("timestamp"))
+                if entry is not None:
+                    metrics.incr("reuse_hits")
+                    reused.append({"payload": item["payload"], "output_text": entry.result, "reused_from": entry.source})
+                    continue
+                metrics.incr("reuse_misses")
+                item["signature"] = signature
+            
+            if FRAME_SELECTION:
+                # After the reuse check: signatures compare uniformly sampled frames
+                selected = []
+                for frames, metadata in video_inputs:
+                    num_frames = math.ceil(len(frames) * FRAME_SELECT_RATIO)
+                    selected.append(select_frames(frames, metadata, num_frames, FRAME_SELECT_SEGMENTS))
+                    metrics.observe("selected_frames_ratio", len(selected[-1][0]) / len(frames))
+                video_inputs = selected
+            
+            # Optimization: Pin memory to speed up transfer (Unified Memory optimization)
+            # The preprocessed frames go straight into (pooled) pinned buffers, released after generate
+            item["image_inputs"] = image_inputs
+            item["video_inputs"] = pin_memory_recursive(video_inputs, batch.setdefault("pooled", []))
+            item["video_kwargs"] = video_kwargs
+            items.append(item)
+        except Exception as e:
+            print(f"[Decode] Error decoding {video_path}: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    if reused:
+        print(f"[Decode] Reusing previous results for {len(reused)} near-duplicate chunks")
+        publish_queue.put({**{k: v for k, v in batch.items() if k not in ("items", "pooled")}, "items": reused})
+    if not items:
+        release_pooled(batch)
+        return None
+    batch["items"] = items
+    return batch
+
+def make_mosaic_prompt(tiles):
+    """
+    Per-request part of the user turn of a mosaic, placed after the video:
+    which camera is in which tile, and the per-tile report format.
+    """
+    tile_lines = []
+    for i, tile in enumerate(tiles):
+        row, col = divmod(i, MOSAIC_COLS)
+        start_str = datetime.datetime.fromtimestamp(tile["timestamp"]).strftime('%Y-%m-%d %H:%M:%S')
+        tile_lines.append(f"Tile {i + 1} (row {row + 1}, column {col + 1}): Camera Source: {tile.get('stream_id')} | Time: {start_str}")
+    tile_list = "\n".join(tile_lines)
+    return f"""
+[MOSAIC]
+The video is a {MOSAIC_ROWS}x{MOSAIC_COLS} grid of independent cameras (black tiles are empty):
+{tile_list}
+Analyze every tile separately and answer with exactly one line per tile, in tile order:
+Tile <n>: Safety Status: [Safe/Warn/Danger/Extreme] | Identified Hazard: [Category] - [Brief description]
 """
-                    
-                    conversation = create_conversation(
-                        system_prompt=system_prompt,
-                        user_prompt=current_user_prompt,
-                        videos=[video_path],
-                        vision_kwargs=vision_kwargs,
-                    )
-                    
-                    start_process = time.time()
-                    # Tokenization and Vision Processing (CPU)
-                    prompt = processor.apply_chat_template(conversation, tokenize=False, add_generation_prompt=True)
-                    
-                    # Qwen3 specific handling
-                    image_patch_size = processor.image_processor.patch_size if hasattr(processor, "image_processor") else 14
-                    
-                    _image_inputs, video_inputs, video_kwargs = qwen_vl_utils.process_vision_info(
-                        conversation, 
-                        return_video_kwargs=True, 
-                        return_video_metadata=True,
-                        image_patch_size=image_patch_size
-                    )
-                    
-                    # Optimization: Pin memory to speed up transfer (Unified Memory optimization)
-                    if video_inputs is not None:
-                        video_inputs = pin_memory_recursive(video_inputs)
 
-                    # Apply workaround to video_kwargs
-                    if video_kwargs:
-                        video_kwargs = make_hashable(video_kwargs)
-                    
-                    mm_data = {}
-                    if _image_inputs is not None:
-                        mm_data['image'] = _image_inputs
-                    if video_inputs is not None:
-                        mm_data['video'] = video_inputs
-                    
-                    llm_inputs = {
-                        "prompt": prompt,
-                        "multi_modal_data": mm_data,
-                        "mm_processor_kwargs": video_kwargs,
-                    }
-                    
-                    llm_inputs_batch.append(llm_inputs)
-                    original_payloads.append(payload)
-                    
-                except Exception as e:
-                    print(f"[Preparer] Error preparing item in batch: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    continue
+def make_mosaic_sampling_params(sampling_params):
+    """
+    Sampling params for mosaics: a decode budget for one report per tile,
+    and no output grammar (it only allows a single report).
+    """
+    sampling_params = sampling_params.clone()
+    sampling_params.max_tokens *= MOSAIC_ROWS * MOSAIC_COLS
+    for name in ("structured_outputs", "guided_decoding"):
+        if getattr(sampling_params, name, None) is not None:
+            setattr(sampling_params, name, None)
+    return sampling_params
+
+def make_prompt_template(processor, system_prompt, user_prompt):
+    """
+    Renders and tokenizes the static prompt once.
+    Returns None if splicing the per-chunk text would not match tokenizing the full prompt.
+    """
+    prompt_template = make_video_prompt_template(processor, system_prompt, user_prompt)
+    sample = make_context_prompt("cam0", "2025-01-01 00:00:00", "2025-01-01 00:00:05",
+                                 make_history_context(["Safety Status: Safe"]))
+    if not prompt_template.is_consistent(sample):
+        print("[Template] Pre-tokenized prompt does not match the full tokenization, submitting prompt text instead.")
+        return None
+    print(f"[Template] Pre-tokenized prompt: {len(prompt_template.head_ids)} head + {len(prompt_template.tail_ids)} tail tokens")
+    return prompt_template
+
+def fetch_history_contexts(redis_client, stream_ids):
+    """
+    Fetches the last 3 summaries from Channel_History of every stream
+    in one pipelined round-trip.
+    Returns {stream_id: context text} for the streams with history.
+    """
+    stream_ids = list(dict.fromkeys(stream_ids))
+    try:
+        # Key: channel_history:{stream_id}
+        pipe = redis_client.pipeline(transaction=False)
+        for stream_id in stream_ids:
+            pipe.lrange(f"channel_history:{stream_id}", 0, 2)
+        results = pipe.execute()
+    except Exception as e:
+        print(f"Failed to fetch context: {e}")
+        return {}
+    
+    history_contexts = {}
+    for stream_id, recent_logs in zip(stream_ids, results):
+        context_lines = [log.decode('utf-8') for log in reversed(recent_logs) if isinstance(log, bytes)] # Oldest first
+        if context_lines:
+            history_contexts[stream_id] = make_history_context(context_lines)
+    return history_contexts
+
+def template_batch(batch, redis_client, processor):
+    """
+    Template stage:
+    Injects history context and renders the chat template (or splices the per-chunk text
+    into the pre-tokenized prompt).
+    Without a Redis client (offline re-analysis), items get no history context.
+    """
+    config = batch["config"]
+    system_prompt, user_prompt, prompt_template = config.system_prompt, config.user_prompt, config.prompt_template
+    classify = OUTPUT_MODE == "classify" or CASCADE_MODE
+    if classify and prompt_template is not None:
+        status_prefix_ids = prompt_template.encode_text(STATUS_PROMPT_PREFIX)
+    llm_inputs_batch = []
+    classify_inputs_batch = []
+    items = []
+    
+    history_contexts = {}
+    if redis_client is not None:
+        fetch_start = time.time()
+        history_contexts = fetch_history_contexts(
+            redis_client, [item["payload"].get("stream_id") for item in batch["items"] if "tiles" not in item["payload"]])
+        metrics.observe("history_fetch_time", time.time() - fetch_start)
+    for item in batch["items"]:
+        payload = item["payload"]
+        try:
+            stream_id = payload.get("stream_id")
+            video_path = payload.get("video_path")
+            timestamp = payload.get("timestamp")
+            duration = payload.get("duration", 0)
+            
+            # Calculate time range
+            start_dt = datetime.datetime.fromtimestamp(timestamp)
+            end_dt = datetime.datetime.fromtimestamp(timestamp + duration)
+            start_str = start_dt.strftime('%Y-%m-%d %H:%M:%S')
+            end_str = end_dt.strftime('%Y-%m-%d %H:%M:%S')
             
-            if llm_inputs_batch:
-                # Put ready batch into queue
-                output_queue.put((llm_inputs_batch, original_payloads, temp_files))
-                print(f"[Preparer] Batch enqueued. Queue size: {output_queue.qsize()}")
+            # Context Injection from Redis (fetched for the whole batch above)
+            context_history = history_contexts.get(stream_id, "")
+            
+            if "tiles" in payload:
+                current_user_prompt = make_mosaic_prompt(payload["tiles"])
             else:
-                 pass
-                    
+                current_user_prompt = make_context_prompt(stream_id, start_str, end_str, context_history)
+            
+            if prompt_template is not None:
+                # Tokenization (CPU): only the per-chunk text, spliced into the pre-tokenized prompt
+                prompt_inputs = {"prompt_token_ids": prompt_template.encode(current_user_prompt)}
+                if classify:
+                    classify_prompt = {"prompt_token_ids": prompt_inputs["prompt_token_ids"] + status_prefix_ids}
+            else:
+                conversation = create_conversation(
+                    system_prompt=system_prompt,
+                    instruction_prompt=make_instruction_prompt(user_prompt),
+                    user_prompt=current_user_prompt,
+                    videos=[video_path],
+                    vision_kwargs=batch["vision_kwargs"],
+                )
+                
+                # Tokenization (CPU)
+                prompt = processor.apply_chat_template(conversation, tokenize=False, add_generation_prompt=True)
+                prompt_inputs = {"prompt": prompt}
+                if classify:
+                    classify_prompt = {"prompt": prompt + STATUS_PROMPT_PREFIX}
+            
+            # Pinned by the decode stage
+            video_inputs = item["video_inputs"]
+
+            # Apply workaround to video_kwargs
+            video_kwargs = item["video_kwargs"]
+            if video_kwargs:
+                video_kwargs = make_hashable(video_kwargs)
+            
+            mm_data = {}
+            if item["image_inputs"] is not None:
+                mm_data['image'] = item["image_inputs"]
+            if video_inputs is not None:
+                mm_data['video'] = video_inputs
+            
+            llm_inputs = {
+                **prompt_inputs,
+                "multi_modal_data": mm_data,
+                "mm_processor_kwargs": video_kwargs,
+            }
+            llm_inputs_batch.append(llm_inputs)
+            if classify:
+                # Prefills the assistant turn up to the status, so the next token is the class
+                # (not for mosaics: they need a report per tile)
+                classify_inputs_batch.append(None if "tiles" in payload else {**llm_inputs, **classify_prompt})
+            # Tensors now live in llm_inputs
+            item["video_inputs"] = None
+            item["image_inputs"] = None
+            items.append(item)
+            
+        except Exception as e:
+            print(f"[Template] Error preparing item in batch: {e}")
+            import traceback
+            traceback.print_exc()
+            continue
+    
+    if not items:
+        release_pooled(batch)
+        return None
+    batch["items"] = items
+    batch["llm_inputs"] = llm_inputs_batch
+    if classify:
+        batch["classify_inputs"] = classify_inputs_batch
+    return batch
+
+def record_prefix_cache(outputs):
+    """
+    Records the prefix cache hit rate and the prefill tokens it saved.
+    Returns (cached tokens, prompt tokens).
+    """
+    cached_tokens = prompt_tokens = 0
+    for output in outputs:
+        if output.prompt_token_ids is None:
+            continue
+        prompt_tokens += len(output.prompt_token_ids)
+        cached_tokens += output.num_cached_tokens or 0
+    if prompt_tokens:
+        metrics.observe("prefix_cache_hit_rate", cached_tokens / prompt_tokens)
+        metrics.incr("prefix_cached_tokens", cached_tokens)
+        metrics.incr("prompt_tokens", prompt_tokens)
+    return cached_tokens, prompt_tokens
+
+def make_classify_params():
+    """
+    Sampling params for classification: a single greedy step returning the top logprobs.
+    """
+    return vllm.SamplingParams(max_tokens=1, temperature=0.0, logprobs=CLASSIFY_TOP_LOGPROBS)
+
+def apply_classification(item, output, status_ids):
+    """
+    Sets the item's output from a classification output.
+    Returns False if full generation is needed: the raw probability of the top status
+    is below the confidence threshold or, in cascade mode, the chunk is severe enough for the escalation model.
+    """
+    logprobs = output.outputs[0].logprobs
+    probs = status_distribution(logprobs[0], status_ids) if logprobs else {}
+    item["status_probs"] = probs
+    if CASCADE_MODE:
+        escalate = needs_escalation(probs, CASCADE_MIN_CONFIDENCE, CASCADE_ESCALATE_AT)
+    else:
+        escalate = needs_escalation(probs, CLASSIFY_MIN_CONFIDENCE)
+    if escalate:
+        return False
+    status = max(probs, key=probs.get)
+    item["output_text"] = f"{STATUS_PROMPT_PREFIX} {status.capitalize()}"
+    if CASCADE_MODE:
+        item["decided_by"] = "triage"
+    return True
+
+def generate_batch(batch, llm, classify_params=None, status_ids=None, escalation_llm=None):
+    """
+    Generate stage (GPU):
+    Runs the batch through the model. Nothing else runs in this thread,
+    so parsing and publishing never delay the next llm.generate.
+    Mosaics skip classification and are generated on the (triage) llm with the mosaic params.
+    """
+    sampling_params, mosaic_params = batch["config"].sampling_params, batch["config"].mosaic_params
+    llm_inputs_batch = batch.pop("llm_inputs")
+    classify_inputs_batch = batch.pop("classify_inputs", None)
+    items = batch["items"]
+    print(f"[Generate] Processing batch of {len(llm_inputs_batch)} on GPU...")
+    
+    gen_start = time.time()
+    pending = list(range(len(items)))
+    all_outputs = []
+    mosaics = [i for i in pending if "tiles" in items[i]["payload"]]
+    if OUTPUT_MODE == "classify" or CASCADE_MODE:
+        candidates = [i for i in pending if "tiles" not in items[i]["payload"]]
+        outputs = llm.generate([classify_inputs_batch[i] for i in candidates], sampling_params=classify_params) if candidates else []
+        all_outputs.extend(outputs)
+        fallbacks = [i for i, output in zip(candidates, outputs) if not apply_classification(items[i], output, status_ids)]
+        metrics.incr("classify_items", len(candidates))
+        metrics.incr("classify_fallbacks", len(fallbacks))
+        if fallbacks:
+            print(f"[Generate] {len(fallbacks)}/{len(candidates)} low-confidence classifications, generating full output...")
+        pending = sorted(fallbacks + mosaics)
+    
+    # Requests per engine: mosaics are a coarse check on the (triage) llm
+    runs = collections.defaultdict(list)
+    for i in pending:
+        runs[llm if i in mosaics else escalation_llm or llm].append(i)
+    for generate_llm, indices in runs.items():
+        params = [mosaic_params if i in mosaics else sampling_params for i in indices]
+        outputs = generate_llm.generate([llm_inputs_batch[i] for i in indices], sampling_params=params)
+        all_outputs.extend(outputs)
+        for i, output in zip(indices, outputs):
+            items[i]["output_text"] = output.outputs[0].text
+            if CASCADE_MODE and i not in mosaics:
+                items[i]["decided_by"] = "escalation"
+    
+    gen_time = time.time() - gen_start
+    metrics.observe("gpu_time", gen_time)
+    if batch_controller is not None:
+        batch_controller.record_batch(gen_time)
+    metrics.observe("batch_size", len(llm_inputs_batch))
+    print(f"[Generate] GPU Inference time: {gen_time:.4f}s")
+    
+    cached_tokens, prompt_tokens = record_prefix_cache(all_outputs)
+    if prompt_tokens:
+        print(f"[Generate] Prefix cache: {cached_tokens}/{prompt_tokens} prompt tokens cached ({cached_tokens / prompt_tokens:.1%})")
+    return batch
+
+async def async_generate_loop(engine, prepared_queue, publish_queue, decoded_queue, classify_params=None,
+                              status_ids=None, escalation_engine=None):
+    """
+    Generate stage in async mode (continuous batching):
+    Every prepared item is submitted to the engine as soon as it is dequeued,
+    and each result is handed to the publish stage the moment it finishes,
+    so short answers are not held back by long ones.
+    A batch is released from the byte budget of decoded_queue once all its items are done.
+    """
+    loop = asyncio.get_running_loop()
+    inflight = asyncio.Semaphore(MAX_INFLIGHT_REQUESTS)
+    tasks = set()
+    
+    if classify_params is not None:
+        classify_params = classify_params.clone()
+        classify_params.output_kind = RequestOutputKind.FINAL_ONLY
+    
+    # Sampling params of the current config version: (config, sampling params, mosaic params)
+    current_params = [None, None, None]
+    
+    def get_params(config):
+        if current_params[0] is not config:
+            # Stream tokens only when early status events are wanted
+            sampling_params = config.sampling_params.clone()
+            if EARLY_STATUS_LEVELS:
+                sampling_params.output_kind = RequestOutputKind.DELTA
+            else:
+                sampling_params.output_kind = RequestOutputKind.FINAL_ONLY
+            mosaic_params = None
+            if config.mosaic_params is not None:
+                mosaic_params = config.mosaic_params.clone()
+                mosaic_params.output_kind = RequestOutputKind.FINAL_ONLY
+            current_params[:] = [config, sampling_params, mosaic_params]
+        return current_params[1], current_params[2]
+    
+    def make_result(batch, item):
+        result = {k: v for k, v in batch.items() if k not in ("items", "llm_inputs", "classify_inputs")}
+        result["items"] = [item]
+        return result
+    
+    async def generate_one(batch, item, llm_inputs, classify_inputs, remaining):
+        try:
+            request_id = f"{item['payload'].get('stream_id')}-{uuid.uuid4().hex[:8]}"
+            gen_start = time.time()
+            mosaic = "tiles" in item["payload"]
+            sampling_params, mosaic_params = get_params(batch["config"])
+            
+            if (OUTPUT_MODE == "classify" or CASCADE_MODE) and not mosaic:
+                classify_output = None
+                async for output in engine.stream(classify_inputs, classify_params, f"{request_id}-cls"):
+                    classify_output = output
+                record_prefix_cache([classify_output])
+                metrics.incr("classify_items")
+                if apply_classification(item, classify_output, status_ids):
+                    metrics.observe("request_time", time.time() - gen_start)
+                    await loop.run_in_executor(None, publish_queue.put, make_result(batch, item))
+                    return
+                metrics.incr("classify_fallbacks")
+            
+            output_text = ""
+            status_parser = StatusStreamParser()
+            if mosaic:
+                generate_engine, params = engine, mosaic_params
+            else:
+                generate_engine, params = escalation_engine or engine, sampling_params
+                if CASCADE_MODE:
+                    item["decided_by"] = "escalation"
+            first_output = True
+            async for output in generate_engine.stream(llm_inputs, params, request_id):
+                if first_output:
+                    record_prefix_cache([output])
+                    first_output = False
+                output_text += output.outputs[0].text
+                if not EARLY_STATUS_LEVELS or mosaic:
+                    continue
+                status = status_parser.feed(output_text)
+                if status in EARLY_STATUS_LEVELS:
+                    metrics.observe("early_status_time", time.time() - gen_start)
+                    early_item = {
+                        "payload": item["payload"],
+                        "output_text": f"Safety Status: {status.capitalize()}",
+                        "event_type": "status",
+                        **({"decided_by": item["decided_by"]} if "decided_by" in item else {}),
+                    }
+                    await loop.run_in_executor(None, publish_queue.put, make_result(batch, early_item))
+            metrics.observe("request_time", time.time() - gen_start)
+            if batch_controller is not None:
+                # Continuous batching: the time a request occupies the engine
+                batch_controller.record_batch(time.time() - gen_start)
+            
+            item["output_text"] = output_text
+            await loop.run_in_executor(None, publish_queue.put, make_result(batch, item))
         except Exception as e:
-            print(f"[Preparer] Critical Error: {e}")
+            print(f"[Generate] Error generating for {item['payload'].get('stream_id')}: {e}")
+        finally:
+            inflight.release()
+            metrics.set("inflight_requests", len(tasks) - 1)
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                # Video tensors of the whole batch are no longer needed
+                decoded_queue.release(batch)
+    
+    while True:
+        batch = await loop.run_in_executor(None, prepared_queue.get)
+        llm_inputs_batch = batch["llm_inputs"]
+        print(f"[Generate] Submitting {len(llm_inputs_batch)} requests to the async engine...")
+        classify_inputs_batch = batch.get("classify_inputs") or [None] * len(llm_inputs_batch)
+        remaining = [len(llm_inputs_batch)]
+        for item, llm_inputs, classify_inputs in zip(batch["items"], llm_inputs_batch, classify_inputs_batch):
+            await inflight.acquire()
+            task = asyncio.create_task(generate_one(batch, item, llm_inputs, classify_inputs, remaining))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            metrics.set("inflight_requests", len(tasks))
+
+def record_latency(payload):
+    """
+    Records the end-to-end latency (chunk end to publish) of the chunks of an item payload.
+    """
+    now = time.time()
+    for part in payload_parts(payload):
+        latency = now - part.get("timestamp", now) - part.get("duration", 0)
+        metrics.observe("e2e_latency", latency)
+        if batch_controller is not None:
+            batch_controller.record_latency(latency)
+
+def queue_event(pipe, event_data):
+    """
+    Queues the XADD of an output event on the publish pipeline.
+    The fields are encoded here rather than when the pipeline executes, so an event Redis
+    would reject (e.g. a None field) is reported and skipped alone instead of failing the whole batch.
+    Returns True if the event was queued.
+    """
+    encoder = pipe.connection_pool.get_encoder()
+    try:
+        fields = {key: encoder.encode(value) for key, value in event_data.items()}
+    except Exception as e:
+        print(f"Error publishing to Redis Stream ({event_data.get('stream_id')}): {e}")
+        metrics.incr("publish_errors")
+        return False
+    pipe.xadd(OUTPUT_STREAM_KEY, fields, maxlen=OUTPUT_STREAM_MAXLEN, approximate=OUTPUT_STREAM_APPROX_TRIM)
+    return True
+
+def publish_mosaic(pipe, item, vision_level, work_queue, quiet_tracker=None):
+    """
+    Fans the per-tile reports of a mosaic out to the tiles' cameras.
+    A tile reported as anything other than Safe (or missing from the output) is not published:
+    it is put back into the work queue, to be analysed alone at full resolution.
+    Returns the number of published events.
+    """
+    tiles = item["payload"]["tiles"]
+    reports = parse_tile_reports(item["output_text"])
+    print("--- Mosaic Result ---")
+    print(item["output_text"])
+    print("---------------------")
+    num_events = 0
+    for i, tile in enumerate(tiles):
+        report = reports.get(i + 1)
+        status = parse_safety_status(report) if report else None
+        if status != "SAFE":
+            print(f"[Publish] Mosaic tile {i + 1} ({tile.get('stream_id')}) reported {status}, re-running alone")
+            work_queue.requeue(pipe, {**tile, "mosaic_exempt": True})
+            metrics.incr("mosaic_reruns")
+            continue
+        if quiet_tracker is not None:
+            quiet_tracker.update(tile.get("stream_id"), status)
+        event_data = {
+            "stream_id": tile.get("stream_id"),
+            "timestamp": tile.get("timestamp"),
+            "vlm_output": report,
+            "video_path": tile.get("video_path"),
+            "vision_level": vision_level,
+            "event_type": "final",
+            "processed_at": time.time(),
+            # [Mosaic] Tile of the grid the result comes from
+            "mosaic": f"{i + 1}/{len(tiles)}",
+        }
+        if queue_event(pipe, event_data):
+            num_events += 1
+        record_latency(tile)
+    return num_events
+
+def publish_batch(batch, output_redis, work_queue, result_cache=None, quiet_tracker=None):
+    """
+    Publish stage:
+    Prints the results and publishes them to the Redis output stream
+    in a single pipelined round-trip per batch.
+    A stitched item is published once per chunk, attributed to the whole stitched range,
+    and a mosaic once per Safe tile (see publish_mosaic).
+    Work queue items are acknowledged in the same pipeline, after their results.
+    """
+    pipe = output_redis.pipeline(transaction=False)
+    num_events = 0
+    for item in batch["items"]:
+        input_payload = item["payload"]
+        if "tiles" in input_payload:
+            num_events += publish_mosaic(pipe, item, batch["vision_level"], work_queue, quiet_tracker)
+            work_queue.ack(pipe, payload_parts(input_payload))
+            continue
+        output_text = item["output_text"]
+        stream_id = input_payload.get("stream_id")
+        timestamp = input_payload.get("timestamp")
+        vision_level = batch["vision_level"]
+        chunks = input_payload.get("chunks")
+        # "status": early Safety Status only (async mode), "final": full output
+        event_type = item.get("event_type", "final")
+        
+        if event_type == "final":
+            print("--- Analysis Result ---")
+            print(f"Stream: {stream_id} (vision level: {vision_level}{f', {len(chunks)} stitched chunks' if chunks else ''})")
+            print(output_text)
+            print("-----------------------")
+            if quiet_tracker is not None:
+                quiet_tracker.update(stream_id, parse_safety_status(output_text))
+        else:
+            print(f"[Publish] Early status for {stream_id}: {output_text}")
+        
+        if event_type == "final" and result_cache is not None and "signature" in item:
+            result_cache.store(stream_id, item["signature"], output_text, timestamp, source=f"{stream_id}:{timestamp}")
+        
+        # Publish to Redis Stream
+        for chunk in chunks or [input_payload]:
+            event_data = {
+                "stream_id": stream_id,
+                "timestamp": chunk.get("timestamp"),
+                "vlm_output": output_text,
+                "video_path": chunk.get("video_path"),
+                "vision_level": vision_level,
+                "event_type": event_type,
+                "processed_at": time.time()
+            }
+            if chunks:
+                # [Stitching] Time range covered by the result
+                event_data["stitched_range"] = f"{timestamp}-{timestamp + input_payload['duration']}"
+            if "status_probs" in item:
+                # [Classify mode] Raw status probabilities from the next-token logprobs
+                # (not renormalized: the rest of the mass went to non-status tokens)
+                event_data["status_probs"] = json.dumps(item["status_probs"])
+            if "decided_by" in item:
+                # [Cascade mode] "triage" or "escalation"
+                event_data["decided_by"] = item["decided_by"]
+            if "reused_from" in item:
+                # [Result reuse] Chunk whose result was re-published
+                event_data["reused_from"] = item["reused_from"]
+            if queue_event(pipe, event_data):
+                num_events += 1
+        if event_type == "final":
+            work_queue.ack(pipe, payload_parts(input_payload))
+            record_latency(input_payload)
+    
+    publish_start = time.time()
+    try:
+        pipe.execute()
+        metrics.incr("published_events", num_events)
+    except Exception as e:
+        print(f"Error publishing to Redis Stream: {e}")
+    metrics.observe("publish_time", time.time() - publish_start)
+    
+    # Cleanup
+    # [MODIFIED] Do NOT delete temp files here. Retention is handled by Capture Service.
 
 
 def main():
@@ -341,72 +1389,90 @@ def main():
             print("Waiting for Redis...")
             time.sleep(2)
             
-    llm, processor, sampling_params, vision_kwargs, system_prompt, user_prompt = setup_model()
+    llm, escalation_llm, processor, degradation_config = setup_model()
+    
+    # Redis for Output
+    output_redis = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0)
+    work_queue = make_work_queue(redis_client)
+    
+    def config_version():
+        return redis_client.get(CONFIG_VERSION_KEY)
+    
+    config_watcher = ConfigWatcher(
+        functools.partial(load_service_config, processor),
+        config_paths(),
+        version=config_version,
+        interval=CONFIG_RELOAD_INTERVAL if CONFIG_RELOAD_INTERVAL > 0 else float("inf"),
+    )
     
     # Setup Pipeline
-    batch_queue = queue.Queue(maxsize=PREPARED_QUEUE_SIZE)
+    quiet_tracker = QuietCameraTracker(QUIET_SAFE_STREAK) if QUIET_STRATEGY != "none" else None
+    result_cache = None
+    if RESULT_REUSE:
+        result_cache = ResultCache(RESULT_REUSE_MAX_DISTANCE, RESULT_REUSE_MAX_AGE, phash_distance,
+                                   max_entries=RESULT_REUSE_MAX_CAMERAS)
+    # Created upfront: the decode stage hands reused results directly to the publish stage
+    publish_queue = queue.Queue(maxsize=PUBLISH_QUEUE_SIZE)
     
-    # Start Producer Thread
-    t = threading.Thread(
-        target=batch_preparer_worker,
-        args=(redis_client, processor, vision_kwargs, system_prompt, user_prompt, batch_queue)
+    pipeline = Pipeline(metrics)
+    pipeline.add_stage(
+        "fetch",
+        functools.partial(fetch_batches, work_queue, processor, config_watcher, degradation_config, quiet_tracker),
     )
-    t.daemon = True
-    t.start()
+    pipeline.add_stage(
+        "decode",
+        functools.partial(decode_batch, processor=processor, result_cache=result_cache, publish_queue=publish_queue),
+        workers=DECODE_WORKERS,
+        queue_size=DECODE_QUEUE_SIZE,
+        ordered=True,
+    )
+    # Decoded batches count against the byte budget until generate is done with them
+    # (released by the generate stage); pooled buffers are recycled then
+    decoded_queue = ByteBudgetQueue(PREPARED_QUEUE_BYTES, max_items=TEMPLATE_QUEUE_SIZE, sizeof=decoded_nbytes,
+                                    on_release=release_pooled if pinned_pool is not None else None)
+    pipeline.add_stage(
+        "template",
+        functools.partial(template_batch, redis_client=redis_client, processor=processor),
+        workers=TEMPLATE_WORKERS,
+        input_queue=decoded_queue,
+        release_after="generate",
+        ordered=True,
+    )
+    classify_params = status_ids = None
+    if OUTPUT_MODE == "classify" or CASCADE_MODE:
+        classify_params = make_classify_params()
+        status_ids = status_token_ids(processor.tokenizer)
     
-    print("Inference Main Loop Started (Consuming Batches)...")
+    pipeline.add_stage(
+        "generate",
+        functools.partial(generate_batch, llm=llm, classify_params=classify_params, status_ids=status_ids,
+                          escalation_llm=escalation_llm),
+        queue_size=PREPARED_QUEUE_SIZE,
+    )
+    pipeline.add_stage(
+        "publish",
+        functools.partial(publish_batch, output_redis=output_redis, work_queue=work_queue, result_cache=result_cache,
+                          quiet_tracker=quiet_tracker),
+        workers=PUBLISH_WORKERS,
+        input_queue=publish_queue,
+        ordered=True,
+    )
     
-    # Redis for Output
-    output_redis = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0)
-    OUTPUT_STREAM_KEY = "vlm_inference_stream"
-
-    while True:
-        # Get ready batch from queue
-        try:
-            # Blocking get
-            llm_inputs_batch, original_payloads, temp_files = batch_queue.get()
-            
-            print(f"[Main] Processing batch of {len(llm_inputs_batch)} on GPU...")
-            
-            # Generate (GPU)
-            gen_start = time.time()
-            outputs = llm.generate(llm_inputs_batch, sampling_params=sampling_params)
-            print(f"[Main] GPU Inference time: {time.time() - gen_start:.4f}s")
-            
-            # Process outputs
-            for i, output in enumerate(outputs):
-                output_text = output.outputs[0].text
-                input_payload = original_payloads[i]
-                stream_id = input_payload.get("stream_id")
-                timestamp = input_payload.get("timestamp")
-                video_path = input_payload.get("video_path")
-                
-                print("--- Analysis Result ---")
-                print(f"Stream: {stream_id}")
-                print(output_text)
-                print("-----------------------")
-                
-                # Publish to Redis Stream
-                try:
-                    event_data = {
-                        "stream_id": stream_id,
-                        "timestamp": timestamp,
-                        "vlm_output": output_text,
-                        "video_path": video_path,
-                        "processed_at": time.time()
-                    }
-                    output_redis.xadd(OUTPUT_STREAM_KEY, event_data, maxlen=1000)
-                except Exception as e:
-                    print(f"Error publishing to Redis Stream: {e}")
-
-            # Cleanup
-            # [MODIFIED] Do NOT delete temp files here. Retention is handled by Capture Service.
-            # print("[Main] Cleaning up temp files... (SKIPPED - Handled by Capture Service)")
-                    
-        except KeyboardInterrupt:
-            break
-        except Exception as e:
-            print(f"[Main] Error: {e}")
+    # GPU stage runs in the main thread
+    pipeline.start(exclude=("generate",))
+    threading.Thread(target=metrics_reporter_worker, args=(redis_client, pipeline, work_queue), daemon=True).start()
+    
+    print("Inference Main Loop Started (Consuming Batches)...")
+    try:
+        generate_stage = pipeline.stage("generate")
+        if INFERENCE_MODE == "async":
+            asyncio.run(async_generate_loop(llm, generate_stage.input_queue, generate_stage.output_queue,
+                                            decoded_queue, classify_params=classify_params, status_ids=status_ids,
+                                            escalation_engine=escalation_llm))
+        else:
+            generate_stage.run()
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == "__main__":
     main()
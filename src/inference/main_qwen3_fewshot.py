@@ -29,10 +29,15 @@ init_script()
 import qwen_vl_utils
 import transformers
 import vllm
+from cosmos_reason1_utils.backend import load_backend
 from cosmos_reason1_utils.text import (
+    DYNAMIC_TEXT_MARKER,
+    Conversation,
+    PretokenizedPrompt,
     PromptConfig,
     create_conversation,
     extract_tagged_text,
+    with_vision_kwargs,
 )
 from cosmos_reason1_utils.vision import VisionConfig
 
@@ -45,9 +50,16 @@ CONFIG_DIR = project_root / "configs"
 PROMPTS_DIR = project_root / "prompts"
 MAX_BATCH_SIZE = 20
 
+# Model backend: "vllm", or "fake" (scripted outputs on CPU with a modelled latency, see FAKE_BACKEND_CONFIG_PATH)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "vllm")
+FAKE_BACKEND_CONFIG_PATH = os.getenv("FAKE_BACKEND_CONFIG_PATH", str(CONFIG_DIR / "fake_backend.yaml"))
+
 # Pipeline Configuration
 PREPARED_QUEUE_SIZE = 1
 
+# Render and tokenize the system + few-shot prompt once and submit token ids (only the per-item text is tokenized)
+PRETOKENIZE_PROMPT = os.getenv("PRETOKENIZE_PROMPT", "true").lower() in ("1", "true", "yes")
+
 def setup_model():
     print(f"Loading Vision Config from {CONFIG_DIR}/vision_config.yaml")
     vision_kwargs = yaml.safe_load(open(CONFIG_DIR / "vision_config.yaml", "rb"))
@@ -75,19 +87,35 @@ def setup_model():
     if not user_prompt:
         raise ValueError("No user prompt provided.")
     
-    print("Loading Model...")
-    llm = vllm.LLM(
+    print(f"Loading Model ({INFERENCE_BACKEND} backend)...")
+    fake_config = yaml.safe_load(open(FAKE_BACKEND_CONFIG_PATH, "rb")) if INFERENCE_BACKEND == "fake" else None
+    llm = load_backend(INFERENCE_BACKEND, dict(
         model=MODEL_PATH,
+        # Every few-shot example video plus the current one
+        limit_mm_per_prompt={"video": sum("video" in example for example in few_shot_examples) + 1},
         enable_prefix_caching=True,
         enable_chunked_prefill=True,
         gpu_memory_utilization=0.5,
-    )
+    ), fake_config=fake_config)
     
     # Use generic AutoProcessor for Qwen3 compatibility
     processor = transformers.AutoProcessor.from_pretrained(MODEL_PATH)
     
     return llm, processor, sampling_params, vision_kwargs, system_prompt, user_prompt, few_shot_examples
 
+def merge_video_kwargs(prefix_kwargs, video_kwargs):
+    """
+    Merges the video kwargs of the cached few-shot videos with those of the current video.
+    Per-video values (lists) are concatenated in prompt order, shared values are taken from the current video.
+    """
+    merged = dict(prefix_kwargs or {})
+    for key, value in (video_kwargs or {}).items():
+        if isinstance(value, list) and isinstance(merged.get(key), list):
+            merged[key] = merged[key] + value
+        else:
+            merged[key] = value
+    return merged
+
 def batch_preparer_worker(redis_client, processor, vision_kwargs, system_prompt, user_prompt, few_shot_examples, output_queue):
     """
     Producer thread:
@@ -130,18 +158,40 @@ def batch_preparer_worker(redis_client, processor, vision_kwargs, system_prompt,
         if "assistant" in example:
             base_conversation.append({"role": "assistant", "content": [{"type": "text", "text": example["assistant"]}]})
 
-    # Apply vision_kwargs to base conversation once
+    # Apply vision_kwargs to base conversation once.
+    # The result is immutable, so every item shares it instead of copying it.
+    base_conversation = Conversation(base_conversation)
     if vision_kwargs:
-        def apply_kwargs_to_msg(msg):
-             if isinstance(msg["content"], list):
-                for item in msg["content"]:
-                    if isinstance(item, dict) and item.get("type") in ["video", "image"]:
-                        item.update(vision_kwargs)
+        base_conversation = with_vision_kwargs(base_conversation, vision_kwargs)
 
-        for msg in base_conversation:
-            apply_kwargs_to_msg(msg)
+    # Qwen3 specific handling
+    image_patch_size = processor.image_processor.patch_size if hasattr(processor, "image_processor") else 14
 
-    import copy
+    # Decode and preprocess the few-shot videos once. They are identical for every request,
+    # so the tensors are reused as is (which also keeps vLLM's multimodal hashes, and thus
+    # the cached prefix of system prompt + examples, identical across requests).
+    print(f"[Preparer] Preprocessing {len(few_shot_examples)} few-shot examples...")
+    prefix_image_inputs, prefix_video_inputs, prefix_video_kwargs = qwen_vl_utils.process_vision_info(
+        base_conversation,
+        return_video_kwargs=True,
+        return_video_metadata=True,
+        image_patch_size=image_patch_size
+    )
+    prefix_image_inputs = prefix_image_inputs or []
+    prefix_video_inputs = prefix_video_inputs or []
+
+    # Render and tokenize the static prompt (system + few-shot examples) once
+    prompt_template = None
+    if PRETOKENIZE_PROMPT:
+        prompt_template = PretokenizedPrompt(processor, base_conversation + [{
+            "role": "user",
+            "content": [{"type": "video", "video": "video"}, {"type": "text", "text": DYNAMIC_TEXT_MARKER}],
+        }])
+        if prompt_template.is_consistent(f"[Camera Source: cam0 | Time: 2025-01-01 00:00:00 ~ 2025-01-01 00:00:05]\n{user_prompt}"):
+            print(f"[Preparer] Pre-tokenized prompt: {len(prompt_template.head_ids)} head + {len(prompt_template.tail_ids)} tail tokens")
+        else:
+            print("[Preparer] Pre-tokenized prompt does not match the full tokenization, submitting prompt text instead.")
+            prompt_template = None
 
     while True:
         # Prepare batch of valid items
@@ -222,48 +272,48 @@ def batch_preparer_worker(redis_client, processor, vision_kwargs, system_prompt,
                     # Inject Metadata into Prompt
                     current_user_prompt = f"[Camera Source: {stream_id} | Time: {start_str} ~ {end_str}]\n{user_prompt}"
                     
-                    # Clone base conversation (Deepcopy to avoid side effects across threads/iterations)
-                    conversation = copy.deepcopy(base_conversation)
-
-                    # 3. Current Input (User)
-                    current_usr_content = []
-                    current_usr_content.append({"type": "video", "video": video_path})
-                    current_usr_content.append({"type": "text", "text": current_user_prompt})
-                    
-                    # Create message dict
-                    current_msg = {"role": "user", "content": current_usr_content}
+                    # 3. Current Input (User), with vision_kwargs
+                    current_msg = {"role": "user", "content": [
+                        {"type": "video", "video": video_path, **(vision_kwargs or {})},
+                        {"type": "text", "text": current_user_prompt},
+                    ]}
                     
-                    # Apply vision_kwargs to current input
-                    if vision_kwargs:
-                        apply_kwargs_to_msg(current_msg)
+                    if prompt_template is not None:
+                        # Tokenization (CPU): only the per-item text, spliced into the pre-tokenized prompt
+                        prompt_inputs = {"prompt_token_ids": prompt_template.encode(current_user_prompt)}
+                    else:
+                        # Static turns are shared, only the current turn is added
+                        conversation = base_conversation + [current_msg]
                         
-                    conversation.append(current_msg)
-                    
-                    # Tokenization and Vision Processing (CPU)
-                    prompt = processor.apply_chat_template(conversation, tokenize=False, add_generation_prompt=True)
-                    
-                    # Qwen3 specific handling
-                    image_patch_size = processor.image_processor.patch_size if hasattr(processor, "image_processor") else 14
+                        # Tokenization (CPU)
+                        prompt = processor.apply_chat_template(conversation, tokenize=False, add_generation_prompt=True)
+                        prompt_inputs = {"prompt": prompt}
                     
+                    # Only the current video is decoded; the few-shot ones come from the cache
                     _image_inputs, video_inputs, video_kwargs = qwen_vl_utils.process_vision_info(
-                        conversation, 
+                        [current_msg], 
                         return_video_kwargs=True, 
                         return_video_metadata=True,
                         image_patch_size=image_patch_size
                     )
+                    video_kwargs = merge_video_kwargs(prefix_video_kwargs, video_kwargs)
                     
                     # Apply workaround to video_kwargs
                     if video_kwargs:
                         video_kwargs = make_hashable(video_kwargs)
                     
+                    # Media in prompt order: few-shot examples first, then the current input
+                    image_inputs = prefix_image_inputs + (_image_inputs or [])
+                    video_inputs = prefix_video_inputs + (video_inputs or [])
+                    
                     mm_data = {}
-                    if _image_inputs is not None:
-                        mm_data['image'] = _image_inputs
-                    if video_inputs is not None:
+                    if image_inputs:
+                        mm_data['image'] = image_inputs
+                    if video_inputs:
                         mm_data['video'] = video_inputs
                     
                     llm_inputs = {
-                        "prompt": prompt,
+                        **prompt_inputs,
                         "multi_modal_data": mm_data,
                         "mm_processor_kwargs": video_kwargs,
                     }
@@ -29,6 +29,7 @@ init_script()
 import qwen_vl_utils
 import transformers
 import vllm
+from cosmos_reason1_utils.backend import load_backend
 from cosmos_reason1_utils.text import (
     PromptConfig,
     create_conversation,
@@ -52,9 +53,20 @@ MAX_BATCH_SIZE = 20
 MIN_BATCH_SIZE = int(os.getenv("MIN_BATCH_SIZE", 1))
 BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", 1.0))
 
+# Model backend: "vllm", or "fake" (scripted outputs on CPU with a modelled latency, see FAKE_BACKEND_CONFIG_PATH)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "vllm")
+FAKE_BACKEND_CONFIG_PATH = os.getenv("FAKE_BACKEND_CONFIG_PATH", str(CONFIG_DIR / "fake_backend.yaml"))
+
 # Pipeline Configuration
 PREPARED_QUEUE_SIZE = 1
 
+OUTPUT_STREAM_MAXLEN = int(os.getenv("OUTPUT_STREAM_MAXLEN", 1000))
+# Trim with "MAXLEN ~": Redis only drops whole stream nodes, which is much cheaper than exact trimming
+OUTPUT_STREAM_APPROX_TRIM = os.getenv("OUTPUT_STREAM_APPROX_TRIM", "true").lower() in ("1", "true", "yes")
+
+# Prompts share a byte-identical leading prefix (system prompt + instructions), the video comes last
+ENABLE_PREFIX_CACHING = os.getenv("ENABLE_PREFIX_CACHING", "true").lower() in ("1", "true", "yes")
+
 def setup_model():
     print(f"Loading Vision Config from {CONFIG_DIR}/vision_config.yaml")
     vision_kwargs = yaml.safe_load(open(CONFIG_DIR / "vision_config.yaml", "rb"))
@@ -77,16 +89,17 @@ def setup_model():
     if not user_prompt:
         raise ValueError("No user prompt provided.")
     
-    print(f"Loading Model from {MODEL_PATH}...")
+    print(f"Loading Model from {MODEL_PATH} ({INFERENCE_BACKEND} backend)...")
+    fake_config = yaml.safe_load(open(FAKE_BACKEND_CONFIG_PATH, "rb")) if INFERENCE_BACKEND == "fake" else None
     try:
-        llm = vllm.LLM(
+        llm = load_backend(INFERENCE_BACKEND, dict(
             model=MODEL_PATH,
             limit_mm_per_prompt={"video": 1},
-            enable_prefix_caching=False,
+            enable_prefix_caching=ENABLE_PREFIX_CACHING,
             gpu_memory_utilization=float(os.getenv("GPU_MEMORY_UTILIZATION", 0.6)),
             trust_remote_code=True,
             max_model_len=int(os.getenv("MAX_MODEL_LEN", 262144)),
-        )
+        ), fake_config=fake_config)
     except Exception as e:
         print(f"Error loading model: {e}")
         raise
@@ -252,36 +265,12 @@ def batch_preparer_worker(redis_client, processor, vision_kwargs, system_prompt,
                     # Store file path for passthrough (Deletion handled by Capture Service now)
                     temp_files.append(video_path)
                     
-                    # ---------------------------------------------------------
-                    # [NEW] Context Injection from Redis
-                    # ---------------------------------------------------------
-                    context_history = ""
-                    try:
-                        # Fetch last 3 summaries from Channel_History
-                        # Key: channel_history:{stream_id}
-                        history_key = f"channel_history:{stream_id}"
-                        recent_logs = redis_client.lrange(history_key, 0, 2)
-                        if recent_logs:
-                            context_lines = []
-                            for log_bytes in reversed(recent_logs): # Oldest first
-                                if isinstance(log_bytes, bytes):
-                                    log_str = log_bytes.decode('utf-8')
-                                    context_lines.append(log_str)
-                            
-                            if context_lines:
-                                context_history = "\n[Recent Context]\n" + "\n".join(context_lines) + "\n"
-                    except Exception as e:
-                        print(f"Failed to fetch context: {e}")
-                    
-                    # Inject Context into User Prompt (Clarified)
-                    # We explicitly tell the model that context is historical and it must focus on the CURRENT video.
-                    current_user_prompt = f"""
-                                            Analyze the provided video clip.
-                                            {user_prompt}
-                                           """
+                    # Static instructions go before the video, so that the system prompt and
+                    # instructions form a prompt prefix shared by every request (prefix caching).
+                    instruction_prompt = f"Analyze the provided video clip.\n{user_prompt}\n"
                     conversation = create_conversation(
                         system_prompt=system_prompt,
-                        user_prompt=current_user_prompt,
+                        instruction_prompt=instruction_prompt,
                         videos=[video_path],
                         vision_kwargs=vision_kwargs,
                     )
@@ -384,7 +373,15 @@ def main():
             outputs = llm.generate(llm_inputs_batch, sampling_params=sampling_params)
             print(f"[Main] GPU Inference time: {time.time() - gen_start:.4f}s")
             
-            # Process outputs
+            # Prefix cache hit rate of this batch
+            prompt_tokens = sum(len(o.prompt_token_ids) for o in outputs if o.prompt_token_ids is not None)
+            cached_tokens = sum(o.num_cached_tokens or 0 for o in outputs)
+            if prompt_tokens:
+                print(f"[Main] Prefix cache: {cached_tokens}/{prompt_tokens} prompt tokens cached ({cached_tokens / prompt_tokens:.1%})")
+            
+            # Process outputs (published in a single pipelined round-trip)
+            pipe = output_redis.pipeline(transaction=False)
+            encoder = output_redis.connection_pool.get_encoder()
             for i, output in enumerate(outputs):
                 output_text = output.outputs[0].text
                 input_payload = original_payloads[i]
@@ -414,6 +411,7 @@ def main():
                 print("-----------------------")
                 
                 # Publish to Redis Stream
+                # (fields encoded here, so an event Redis rejects is skipped alone, not with the whole batch)
                 try:
                     event_data = {
                         "stream_id": stream_id,
@@ -423,9 +421,18 @@ def main():
                         "video_path": video_path,
                         "processed_at": time.time()
                     }
-                    output_redis.xadd(OUTPUT_STREAM_KEY, event_data, maxlen=1000)
+                    event_data = {key: encoder.encode(value) for key, value in event_data.items()}
                 except Exception as e:
                     print(f"Error publishing to Redis Stream: {e}")
+                    continue
+                pipe.xadd(OUTPUT_STREAM_KEY, event_data, maxlen=OUTPUT_STREAM_MAXLEN, approximate=OUTPUT_STREAM_APPROX_TRIM)
+            
+            publish_start = time.time()
+            try:
+                pipe.execute()
+            except Exception as e:
+                print(f"Error publishing to Redis Stream: {e}")
+            print(f"[Main] Published {len(outputs)} results in {time.time() - publish_start:.4f}s")
 
             # Cleanup
             # [MODIFIED] Do NOT delete temp files here. Retention is handled by Capture Service.
@@ -0,0 +1,357 @@
+"""Offline re-analysis of archived clips.
+
+Runs the main_qwen3.py pipeline (same model, config files and environment
+variables) over stored videos instead of the live queue:
+- inputs: video files, directories (searched recursively) and manifests
+  (.jsonl: one chunk payload per line, as pushed by the capture service;
+  any other file: one video path per line)
+- large batches closed on a visual token budget, prepared by a pool of decode workers
+- results appended to a JSONL file, which is also the checkpoint: running the same
+  command again skips the clips already in it (e.g. after an interruption)
+
+Never connects to Redis: the live queues and history are left untouched,
+so the clips are analysed without channel history.
+
+Example:
+    PROMPT_FILE=industrial_safety.yaml python src/inference/reanalyze.py \\
+        /videos/accident_clips manifest.jsonl --output reanalysis.jsonl
+"""
+
+import argparse
+import datetime
+import functools
+import json
+import os
+import pathlib
+import sys
+import threading
+import time
+
+# Set up path to import project utils
+project_root = pathlib.Path(__file__).parents[2].resolve()
+sys.path.append(str(project_root))
+
+from cosmos_reason1_utils.script import init_script
+init_script()
+
+from cosmos_reason1_utils.batching import ByteBudgetQueue, TokenBudget
+from cosmos_reason1_utils.pipeline import Pipeline
+from cosmos_reason1_utils.status import parse_safety_status, status_token_ids
+from cosmos_reason1_utils.vision import VisionConfig
+
+VIDEO_SUFFIXES = (".mp4", ".avi", ".mkv", ".mov")
+
+
+def payload_from_path(path):
+    """
+    Builds the chunk payload of a video file, taking the camera and start time from its name:
+    {stream_id}_{start}_{duration}.mp4 (capture chunks) or {stream_id}_{%Y%m%d_%H%M%S}_ACCIDENT.mp4
+    (accident clips). Falls back to the file name and modification time.
+    """
+    path = pathlib.Path(path)
+    try:
+        timestamp = path.stat().st_mtime
+    except OSError:
+        timestamp = 0.0
+    payload = {"stream_id": path.stem, "timestamp": timestamp, "video_path": str(path)}
+    parts = path.stem.rsplit("_", 3)
+    try:
+        if len(parts) == 4 and parts[3] == "ACCIDENT":
+            start = datetime.datetime.strptime(f"{parts[1]}_{parts[2]}", "%Y%m%d_%H%M%S")
+            payload.update(stream_id=parts[0], timestamp=start.timestamp())
+        else:
+            stream_id, start, duration = path.stem.rsplit("_", 2)
+            payload.update(stream_id=stream_id, timestamp=float(start), duration=float(duration))
+    except ValueError:
+        pass
+    return payload
+
+
+def read_manifest(path):
+    """
+    Reads a manifest: one JSON chunk payload or one video path per line.
+    Relative video paths are relative to the manifest.
+    """
+    payloads = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                payload = json.loads(line)
+                video_path = path.parent / payload["video_path"]
+                payloads.append({**payload_from_path(video_path), **payload, "video_path": str(video_path)})
+            else:
+                payloads.append(payload_from_path(path.parent / line))
+    return payloads
+
+
+def list_payloads(inputs):
+    """
+    Expands the inputs into chunk payloads, in order and without duplicates.
+    Missing videos are reported and skipped.
+    """
+    payloads = {}
+    for source in map(pathlib.Path, inputs):
+        if source.is_dir():
+            entries = [payload_from_path(path) for path in sorted(source.rglob("*"))
+                       if path.suffix.lower() in VIDEO_SUFFIXES]
+        elif source.suffix.lower() in VIDEO_SUFFIXES:
+            entries = [payload_from_path(source)]
+        else:
+            entries = read_manifest(source)
+        for payload in entries:
+            payload["video_path"] = os.path.abspath(payload["video_path"])
+            if not os.path.exists(payload["video_path"]):
+                print(f"[Input] Video file missing: {payload['video_path']}")
+                continue
+            payloads.setdefault(payload["video_path"], payload)
+    return list(payloads.values())
+
+
+def load_checkpoint(output_path):
+    """
+    Returns the video paths already in the results file.
+    Ends the file with a newline if the previous run stopped mid-record
+    (the partial record is ignored and its clip analysed again).
+    """
+    done = set()
+    if not output_path.exists():
+        return done
+    with open(output_path, "rb+") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["video_path"])
+            except (ValueError, KeyError):
+                continue
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    return done
+
+
+class Progress:
+    """
+    Tracks the batches in flight, so the run ends once the last one is written or dropped.
+    """
+    def __init__(self, total):
+        self.total = total
+        self.written = 0
+        self.start_time = time.time()
+        self.finished = threading.Event()
+        self._open = 0
+        self._source_done = False
+        self._lock = threading.Lock()
+
+    def open_batch(self):
+        with self._lock:
+            self._open += 1
+
+    def close_batch(self):
+        with self._lock:
+            self._open -= 1
+            self._check()
+
+    def finish_source(self):
+        with self._lock:
+            self._source_done = True
+            self._check()
+
+    def _check(self):
+        if self._source_done and self._open == 0:
+            self.finished.set()
+
+
+def tracked(fn, progress):
+    """
+    Wraps a stage function: a batch the stage drops (returns None for) or fails on is closed.
+    """
+    def run(batch):
+        result = None
+        try:
+            result = fn(batch)
+        finally:
+            if result is None:
+                progress.close_batch()
+        return result
+    return run
+
+
+def make_batches(service, payloads, processor, config, batch_tokens, batch_size, progress):
+    """
+    Source stage:
+    Groups the clips into batches on a visual token budget, at full resolution.
+    Clips without usable metadata are probed first (unreadable ones are skipped).
+    """
+    image_patch_size = processor.image_processor.patch_size if hasattr(processor, "image_processor") else 14
+    vision_config = VisionConfig.model_validate(config.vision_kwargs)
+    batch_data = []
+    budget = TokenBudget(batch_tokens, max_items=batch_size)
+
+    def make_batch():
+        progress.open_batch()
+        return {
+            "items": [{"payload": payload} for payload in batch_data],
+            "config": config,
+            "vision_level": "full",
+            "vision_kwargs": config.vision_kwargs,
+            "tokens": budget.tokens,
+        }
+
+    for payload in payloads:
+        if not all(payload.get(key) for key in ("width", "height", "fps", "frame_count")):
+            width, height, duration, fps = service.get_video_metadata(payload)
+            if not (width and height and fps and duration):
+                print(f"[Input] Unreadable video: {payload['video_path']}")
+                continue
+            payload.update(width=width, height=height, fps=fps, frame_count=round(duration * fps))
+            payload.setdefault("duration", duration)
+        item_tokens = service.estimate_item_tokens(payload, vision_config, image_patch_size)
+        if batch_data and not budget.fits(item_tokens):
+            yield make_batch()
+            batch_data = []
+            budget = TokenBudget(batch_tokens, max_items=batch_size)
+        batch_data.append(payload)
+        budget.add(item_tokens)
+    if batch_data:
+        yield make_batch()
+    progress.finish_source()
+
+
+def write_results(batch, output_file, output_lock, run_info, progress):
+    """
+    Write stage:
+    Appends the results of a batch to the results file and syncs it (checkpoint).
+    Once the file is closed (interrupted run), results are discarded: their clips are analysed on the next run.
+    """
+    with output_lock:
+        if output_file.closed:
+            return None
+        for item in batch["items"]:
+            payload = item["payload"]
+            record = {
+                "video_path": payload["video_path"],
+                "stream_id": payload.get("stream_id"),
+                "timestamp": payload.get("timestamp"),
+                "duration": payload.get("duration"),
+                "vlm_output": item["output_text"],
+                "safety_status": parse_safety_status(item["output_text"]),
+                **run_info,
+                "processed_at": time.time(),
+            }
+            if "status_probs" in item:
+                record["status_probs"] = item["status_probs"]
+            if "decided_by" in item:
+                record["decided_by"] = item["decided_by"]
+            output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output_file.flush()
+        os.fsync(output_file.fileno())
+
+    progress.written += len(batch["items"])
+    elapsed = time.time() - progress.start_time
+    print(f"[Write] {progress.written}/{progress.total} clips ({progress.written / elapsed:.2f} clips/s)")
+    return None
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument("inputs", nargs="+", help="Video files, directories or manifests")
+    args.add_argument("--output", "-o", type=pathlib.Path, required=True, help="Results (and checkpoint) JSONL file")
+    args.add_argument("--model", type=str, default=None, help="Model path (default: MODEL_PATH)")
+    args.add_argument("--prompt-file", type=str, default=None, help="Prompt config (default: PROMPT_FILE)")
+    args.add_argument("--batch-size", type=int, default=256, help="Maximum clips per batch")
+    args.add_argument("--batch-tokens", type=int, default=524288, help="Visual token budget per batch")
+    args.add_argument("--decode-workers", type=int, default=os.cpu_count() or 4, help="Decode workers")
+    args.add_argument("--template-workers", type=int, default=2, help="Template workers")
+    args = args.parse_args()
+
+    # main_qwen3 reads its configuration from the environment at import
+    if args.model:
+        os.environ["MODEL_PATH"] = args.model
+    if args.prompt_file:
+        os.environ["PROMPT_FILE"] = args.prompt_file
+    # Whole batches through LLM.generate; no quiet camera merging or latency-driven batching
+    os.environ["INFERENCE_MODE"] = "batch"
+    os.environ["QUIET_STRATEGY"] = "none"
+    os.environ["BATCH_LATENCY_TARGET"] = "0"
+    import main_qwen3 as service
+
+    payloads = list_payloads(args.inputs)
+    done = load_checkpoint(args.output)
+    todo = [payload for payload in payloads if payload["video_path"] not in done]
+    print(f"[Input] {len(payloads)} clips, {len(payloads) - len(todo)} already in {args.output}, {len(todo)} to analyse")
+    if not todo:
+        return
+
+    llm, escalation_llm, processor, _ = service.setup_model()
+    config = service.load_service_config(processor)
+    classify_params = status_ids = None
+    if service.OUTPUT_MODE == "classify" or service.CASCADE_MODE:
+        classify_params = service.make_classify_params()
+        status_ids = status_token_ids(processor.tokenizer)
+    run_info = {
+        "model": service.TRIAGE_MODEL_PATH if service.CASCADE_MODE else service.MODEL_PATH,
+        "prompt_file": service.PROMPT_FILE,
+        "output_mode": service.OUTPUT_MODE,
+    }
+
+    progress = Progress(len(todo))
+    output_file = open(args.output, "a", encoding="utf-8")
+    # Held while a batch is written, so the file is never closed mid-batch
+    output_lock = threading.Lock()
+    pipeline = Pipeline(service.metrics)
+    pipeline.add_stage(
+        "source",
+        functools.partial(make_batches, service, todo, processor, config, args.batch_tokens, args.batch_size, progress),
+    )
+    pipeline.add_stage(
+        "decode",
+        tracked(functools.partial(service.decode_batch, processor=processor), progress),
+        workers=args.decode_workers,
+        queue_size=2,
+    )
+    # Decoded batches count against the byte budget until generate is done with them
+    decoded_queue = ByteBudgetQueue(service.PREPARED_QUEUE_BYTES, max_items=2, sizeof=service.decoded_nbytes,
+                                    on_release=service.release_pooled if service.pinned_pool is not None else None)
+    pipeline.add_stage(
+        "template",
+        tracked(functools.partial(service.template_batch, redis_client=None, processor=processor), progress),
+        workers=args.template_workers,
+        input_queue=decoded_queue,
+        release_after="generate",
+    )
+    pipeline.add_stage(
+        "generate",
+        tracked(functools.partial(service.generate_batch, llm=llm, classify_params=classify_params,
+                                  status_ids=status_ids, escalation_llm=escalation_llm), progress),
+        queue_size=service.PREPARED_QUEUE_SIZE,
+    )
+    pipeline.add_stage(
+        "write",
+        tracked(functools.partial(write_results, output_file=output_file, output_lock=output_lock, run_info=run_info,
+                                  progress=progress),
+                progress),
+        queue_size=4,
+    )
+
+    # Unlike the service, generate runs in a worker thread: the main thread waits for the last batch
+    pipeline.start()
+    try:
+        progress.finished.wait()
+    except KeyboardInterrupt:
+        print("[Reanalyze] Interrupted: written results are kept, run the same command to resume.")
+    finally:
+        # The stage threads keep running until exit: later batches are discarded by write_results
+        with output_lock:
+            output_file.close()
+
+    elapsed = time.time() - progress.start_time
+    failed = len(todo) - progress.written
+    print(f"[Reanalyze] {progress.written} clips in {elapsed:.1f}s ({progress.written / elapsed:.2f} clips/s), "
+          f"{failed} not analysed (retried on the next run).")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,8 @@ REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 INPUT_STREAM_KEY = "vlm_inference_stream"
 NOTIFICATION_QUEUE = "notification_queue"
 ALERT_HISTORY_KEY = "Alert_History"
+# Marks chunks that already raised an alert (early status and final event share one alert)
+ALERT_SENT_TTL = 600
 VIDEO_DIR = "/videos/temp_video"
 ACCIDENT_DIR = "/videos/accident_clips"
 
@@ -149,6 +151,40 @@ def create_accident_clip(stream_id, event_ts):
         logger.error(f"FFmpeg failed: {e}")
         return None
 
+def claim_alert(r, stream_id, timestamp):
+    """
+    Returns True only for the first alert of a chunk.
+    Inference may publish an early "status" event before the "final" event of the same chunk.
+    """
+    return bool(r.set(f"alert_sent:{stream_id}:{timestamp}", 1, nx=True, ex=ALERT_SENT_TTL))
+
+def raise_alert(r, stream_id, timestamp, status, hazard_summary, vlm_output, history_key):
+    logger.info(f"🚨 DANGER/EXTREME detected on {stream_id}!")
+    
+    # Create Clip
+    clip_path = create_accident_clip(stream_id, timestamp)
+    
+    # Construct Event
+    event = {
+        "type": "ALERT",
+        "level": status,
+        "stream_id": stream_id,
+        "timestamp": timestamp,
+        "description": hazard_summary,
+        "video_clip": clip_path,
+        "full_analysis": vlm_output,
+        "context_logs": [x.decode('utf-8') for x in r.lrange(history_key, 0, 5)]
+    }
+    
+    event_json = json.dumps(event)
+    
+    # Publish to Notification Queue
+    r.rpush(NOTIFICATION_QUEUE, event_json)
+    
+    # Publish to Alert History (for Dashboard)
+    r.lpush(ALERT_HISTORY_KEY, event_json)
+    r.ltrim(ALERT_HISTORY_KEY, 0, 50)
+
 def main():
     logger.info("Logic Service Started")
     r = get_redis_client()
@@ -178,10 +214,21 @@ def main():
                         vlm_output = payload.get("vlm_output", "")
                         stream_id = payload.get("stream_id")
                         timestamp = float(payload.get("timestamp", 0))
+                        # "status": early Safety Status while inference is still decoding
+                        # "final": full output (default for producers without event_type)
+                        event_type = payload.get("event_type", "final")
+                        history_key = f"channel_history:{stream_id}"
                         
                         # 1. Parse Status
                         status = parse_safety_status(vlm_output)
-                        logger.info(f"Stream {stream_id} Status: {status}")
+                        logger.info(f"Stream {stream_id} Status: {status} ({event_type})")
+                        
+                        if event_type == "status":
+                            # Start clip building and alerting early; history is stored with the final event
+                            if status in ["DANGER", "EXTREME"] and claim_alert(r, stream_id, timestamp):
+                                raise_alert(r, stream_id, timestamp, status, f"Status: {status} (early)", vlm_output, history_key)
+                            r.xack(INPUT_STREAM_KEY, group_name, message_id)
+                            continue
                         
                         # 2. Store History (for Context)
                         # We store brief summary: "Time: Status - Hazard"
@@ -196,37 +243,15 @@ def main():
                         
                         log_entry = f"{time_str}: {hazard_summary}"
                         
-                        history_key = f"channel_history:{stream_id}"
                         r.lpush(history_key, log_entry)
                         r.ltrim(history_key, 0, 10) # Keep last 10 entries
                         
                         # 3. Danger Handling
                         if status in ["DANGER", "EXTREME"]:
-                            logger.info(f"🚨 DANGER/EXTREME detected on {stream_id}!")
-                            
-                            # Create Clip
-                            clip_path = create_accident_clip(stream_id, timestamp)
-                            
-                            # Construct Event
-                            event = {
-                                "type": "ALERT",
-                                "level": status,
-                                "stream_id": stream_id,
-                                "timestamp": timestamp,
-                                "description": hazard_summary,
-                                "video_clip": clip_path,
-                                "full_analysis": vlm_output,
-                                "context_logs": [x.decode('utf-8') for x in r.lrange(history_key, 0, 5)]
-                            }
-                            
-                            event_json = json.dumps(event)
-                            
-                            # Publish to Notification Queue
-                            r.rpush(NOTIFICATION_QUEUE, event_json)
-                            
-                            # Publish to Alert History (for Dashboard)
-                            r.lpush(ALERT_HISTORY_KEY, event_json)
-                            r.ltrim(ALERT_HISTORY_KEY, 0, 50)
+                            if claim_alert(r, stream_id, timestamp):
+                                raise_alert(r, stream_id, timestamp, status, hazard_summary, vlm_output, history_key)
+                            else:
+                                logger.info(f"Alert for {stream_id} at {timestamp} already raised from early status.")
                             
                         # Ack message
                         r.xack(INPUT_STREAM_KEY, group_name, message_id)